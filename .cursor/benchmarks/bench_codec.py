@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark the MCP transport JSON codecs (stdlib json vs orjson).
+Encodes and decodes realistic rag.search responses with full chunk text,
+metadata and NumPy float32 scores.
+
+Usage:
+    python benchmarks/bench_codec.py [--chunks 20] [--iterations 2000]
+"""
+
+import argparse
+import random
+import string
+import sys
+import time
+from pathlib import Path
+from typing import Any
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+
+from mcp.codec import ORJSON_AVAILABLE, get_codec
+
+
+def make_search_response(n_chunks: int, seed: int = 0) -> dict[str, Any]:
+    """Build a rag.search JSON-RPC response resembling production traffic."""
+    rng = random.Random(seed)
+    words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 10))) for _ in range(500)]
+    scores = np.sort(np.random.default_rng(seed).random(n_chunks, dtype=np.float32))[::-1]
+
+    chunks = []
+    for i in range(n_chunks):
+        chunks.append({
+            "text": " ".join(rng.choices(words, k=260)),  # ~350 tokens
+            "path": f"knowledge/doc_{i % 7}.md",
+            "idx": str(i),
+            "score": scores[i],  # NumPy float32 scalar
+            "metadata": {
+                "source_file": f"knowledge/doc_{i % 7}.md",
+                "file_type": ".md",
+                "chunk_index": str(i),
+                "total_chunks": str(n_chunks),
+                "ingestion_timestamp": "1727000000.0",
+            },
+        })
+
+    return {"jsonrpc": "2.0", "id": 42, "result": {"chunks": chunks, "scores": scores}}
+
+
+def bench(codec_name: str, payload: dict[str, Any], iterations: int) -> dict[str, float]:
+    """Time encode and decode for one codec."""
+    codec = get_codec(codec_name)
+
+    encoded = codec.dumps(payload)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        codec.dumps(payload)
+    encode_sec = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        codec.loads(encoded)
+    decode_sec = time.perf_counter() - start
+
+    return {
+        "encode_us": encode_sec / iterations * 1e6,
+        "decode_us": decode_sec / iterations * 1e6,
+        "bytes": len(encoded),
+    }
+
+
+def main() -> None:
+    """Run the benchmark and print a comparison table."""
+    parser = argparse.ArgumentParser(description="JSON codec benchmark")
+    parser.add_argument("--chunks", type=int, default=20, help="Chunks per search response")
+    parser.add_argument("--iterations", type=int, default=2000, help="Iterations per measurement")
+    args = parser.parse_args()
+
+    payload = make_search_response(args.chunks)
+    codecs = ["json"] + (["orjson"] if ORJSON_AVAILABLE else [])
+
+    results = {name: bench(name, payload, args.iterations) for name in codecs}
+
+    print(f"rag.search response: {args.chunks} chunks, {args.iterations} iterations")
+    print(f"{'codec':<8} {'encode (us)':>12} {'decode (us)':>12} {'bytes':>10}")
+    for name, r in results.items():
+        print(f"{name:<8} {r['encode_us']:>12.1f} {r['decode_us']:>12.1f} {r['bytes']:>10}")
+
+    if "orjson" in results:
+        base, fast = results["json"], results["orjson"]
+        print(f"\norjson speedup: encode x{base['encode_us'] / fast['encode_us']:.1f}, "
+              f"decode x{base['decode_us'] / fast['decode_us']:.1f}")
+    else:
+        print("\norjson not installed - only the stdlib path was measured")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Benchmark MoE expert ranking: per-goal Python loops vs one vectorized batch.
+Ranks a synthetic corpus of goals with _rank_experts one goal at a time and
+with _rank_experts_batch in a single matrix operation, checks that both give
+the same top_k, and times the full route_task / route_tasks pipelines.
+
+Usage:
+    python benchmarks/bench_moe_ranking.py [--goals 5000] [--experts 6] [--repeat 3]
+"""
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import yaml
+
+from mcp.moe import MoERouter
+
+MOE_CONFIG_PATH = Path(__file__).resolve().parents[1] / "rules" / "moe.yml"
+
+WORDS = ["fix", "bug", "impl", "plan", "spec", "roadmap", "refactor", "perf", "research", "docs",
+         "security", "auth", "test", "tdd", "cleanup", "evidence", "decompose", "the", "parser",
+         "api", "login", "cache", "schema", "service", "endpoint", "flaky"]
+
+
+def make_goals(n: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 12))) for _ in range(n)]
+
+
+def make_config(n_experts: int) -> str:
+    """moe.yml with extra synthetic experts (all candidates via a catch-all rule) when n_experts > 6."""
+    with open(MOE_CONFIG_PATH, encoding="utf-8") as f:
+        config = yaml.safe_load(f)
+    experts = config["moe"]["experts"]
+    rng = random.Random(1)
+    for i in range(len(experts), n_experts):
+        experts.append({"id": f"expert_{i}", "prompt": "experts/coder.md", "tools": rng.sample(["fs", "rag", "pytest"], 2),
+                        "strengths": rng.sample(WORDS, 3)})
+    if n_experts > 6:
+        config["moe"]["routing_rules"].append({"if": "goal_keywords ~= /./", "pick": [e["id"] for e in experts]})
+    path = Path(tempfile.mkdtemp()) / "moe.yml"
+    path.write_text(yaml.safe_dump(config), encoding="utf-8")
+    return str(path)
+
+
+def best_of(repeat: int, fn: Any) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main() -> None:
+    """Run the comparison and print goals/sec."""
+    parser = argparse.ArgumentParser(description="MoE ranking benchmark")
+    parser.add_argument("--goals", type=int, default=5000)
+    parser.add_argument("--experts", type=int, default=6)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    router = MoERouter(make_config(args.experts))
+    goals = make_goals(args.goals)
+    features_list = [router._extract_features(goal) for goal in goals]
+    candidates_list = [router._preselect_experts(features) for features in features_list]
+
+    single = [router._rank_experts(c, f) for c, f in zip(candidates_list, features_list)]
+    batch = router._rank_experts_batch(candidates_list, features_list)
+    assert single == batch, "batch ranking differs from single-goal ranking"
+
+    loop_sec = best_of(args.repeat, lambda: [router._rank_experts(c, f) for c, f in zip(candidates_list, features_list)])
+    batch_sec = best_of(args.repeat, lambda: router._rank_experts_batch(candidates_list, features_list))
+
+    pipeline_goals = goals[:min(len(goals), 1000)]
+    route_loop_sec = best_of(args.repeat, lambda: [router.route_task(goal) for goal in pipeline_goals])
+    route_batch_sec = best_of(args.repeat, lambda: router.route_tasks(pipeline_goals))
+
+    print(f"{args.goals} goals, {len(router.experts)} experts, top_k={router.router_config['top_k']} "
+          f"(identical rankings: yes)")
+    print(f"{'measurement':<34} {'goals/s':>12}")
+    print(f"{'rank: per-goal loop':<34} {args.goals / loop_sec:>12.0f}")
+    print(f"{'rank: vectorized batch':<34} {args.goals / batch_sec:>12.0f}   x{loop_sec / batch_sec:.1f}")
+    print(f"{'pipeline: route_task loop':<34} {len(pipeline_goals) / route_loop_sec:>12.0f}")
+    print(f"{'pipeline: route_tasks':<34} {len(pipeline_goals) / route_batch_sec:>12.0f}   "
+          f"x{route_loop_sec / route_batch_sec:.1f}")
+
+
+if __name__ == "__main__":
+    main()
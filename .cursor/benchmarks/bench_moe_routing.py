@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Benchmark MoE route_task on a replayed corpus of recorded goals.
+Replays the goals through route_task with seeded routers and reports routes/sec,
+memory allocated per route (tracemalloc peak and allocated blocks), how often
+each expert is picked, and how stable the routing decisions are: across replays
+with the same seed (should be 100%), across seeds, and across unseeded runs.
+
+Routing is measured cold: replays run against a snapshot of rules/moe.yml with
+the expert result cache turned off, so every route runs its experts. The warm
+row replays the corpus a second time through a router with the configured cache
+and is reported separately.
+
+The corpus is JSONL (any record with a "goal" string, e.g. orchestrator.route
+request logs) or plain text with one goal per line.
+
+Usage:
+    python benchmarks/bench_moe_routing.py [--corpus benchmarks/data/goals.jsonl] [--seed 0] [--seeds 5] [--repeat 3]
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+from typing import Any
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import yaml
+
+from mcp.moe import MoERouter
+
+MOE_CONFIG_PATH = Path(__file__).resolve().parents[1] / "rules" / "moe.yml"
+PROMPTS_DIR = Path(__file__).resolve().parents[1] / "prompts"
+DEFAULT_CORPUS = Path(__file__).resolve().parent / "data" / "goals.jsonl"
+
+
+def _find_goals(record: Any) -> list[str]:
+    """Goal strings anywhere in a log record ("goal" keys and "goals" lists)."""
+    if isinstance(record, dict):
+        found = []
+        for key, value in record.items():
+            if key == "goal" and isinstance(value, str):
+                found.append(value)
+            elif key == "goals" and isinstance(value, list):
+                found.extend(item if isinstance(item, str) else item.get("goal", "")
+                             for item in value if isinstance(item, (str, dict)))
+            else:
+                found.extend(_find_goals(value))
+        return [goal for goal in found if goal]
+    if isinstance(record, list):
+        return [goal for item in record for goal in _find_goals(item)]
+    return []
+
+
+def load_goals(path: Path) -> list[str]:
+    """Read goals from a JSONL log or a plain text file, in file order."""
+    goals = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            goals.extend(_find_goals(json.loads(line)))
+        except json.JSONDecodeError:
+            goals.append(line)
+    return goals
+
+
+def decision(result: dict[str, Any]) -> tuple[Any, ...]:
+    """What a route decided: the experts that answered and the winning approach."""
+    return tuple(result.get("chosen_experts", [])), result.get("winning_approach")
+
+
+def cold_config(directory: Path) -> Path:
+    """Snapshot moe.yml into directory with the expert result cache turned off."""
+    with open(MOE_CONFIG_PATH, encoding="utf-8") as f:
+        config = yaml.safe_load(f)
+    config["moe"]["router"]["expert_cache_max_bytes"] = 0
+    path = directory / "moe.yml"
+    path.write_text(yaml.safe_dump(config, sort_keys=False), encoding="utf-8")
+    return path
+
+
+def replay(goals: list[str], seed: int | None,
+           config_path: Path) -> tuple[list[tuple[Any, ...]], Counter, float]:
+    """Route every goal with a fresh router; returns decisions, expert picks and seconds."""
+    router = MoERouter(str(config_path), prompts_dir=str(PROMPTS_DIR), seed=seed)
+    picks: Counter = Counter()
+    decisions = []
+    start = time.perf_counter()
+    for goal in goals:
+        result = router.route_task(goal)
+        decisions.append(decision(result))
+        picks.update(result.get("chosen_experts", []))
+    return decisions, picks, time.perf_counter() - start
+
+
+def warm_replay(goals: list[str], seed: int | None) -> tuple[float, float]:
+    """Replay twice through one router with the configured cache; seconds and hit rate of the second pass."""
+    router = MoERouter(str(MOE_CONFIG_PATH), prompts_dir=str(PROMPTS_DIR), seed=seed)
+    for goal in goals:
+        router.route_task(goal)
+    cache = router.expert_cache
+    hits, misses = cache.hits, cache.misses
+    start = time.perf_counter()
+    for goal in goals:
+        router.route_task(goal)
+    seconds = time.perf_counter() - start
+    lookups = cache.hits - hits + cache.misses - misses
+    return seconds, (cache.hits - hits) / lookups if lookups else 0.0
+
+
+def allocations(goals: list[str], seed: int | None, config_path: Path) -> tuple[list[int], list[int]]:
+    """Per-route tracemalloc peak bytes and net allocated blocks, over one cold replay.
+
+    Tracing slows routing down, so this is a separate pass from the timed replays.
+    """
+    router = MoERouter(str(config_path), prompts_dir=str(PROMPTS_DIR), seed=seed)
+    router.route_task(goals[0])  # Warm up imports and the background loop
+    peaks, blocks = [], []
+    tracemalloc.start()
+    try:
+        for goal in goals:
+            tracemalloc.reset_peak()
+            base, _ = tracemalloc.get_traced_memory()
+            base_blocks = sys.getallocatedblocks()
+            router.route_task(goal)
+            blocks.append(sys.getallocatedblocks() - base_blocks)
+            peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    finally:
+        tracemalloc.stop()
+    return peaks, blocks
+
+
+def agreement(runs: list[list[tuple[Any, ...]]]) -> float:
+    """Fraction of goals whose decision is identical in every run."""
+    return sum(1 for decisions in zip(*runs) if len(set(decisions)) == 1) / len(runs[0])
+
+
+def main() -> None:
+    """Run the replays and print the report."""
+    parser = argparse.ArgumentParser(description="MoE routing benchmark")
+    parser.add_argument("--corpus", type=Path, default=DEFAULT_CORPUS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--seeds", type=int, default=5, help="Seeds compared for cross-seed stability")
+    parser.add_argument("--repeat", type=int, default=3, help="Replays per seed")
+    args = parser.parse_args()
+
+    goals = load_goals(args.corpus)
+    if not goals:
+        sys.exit(f"No goals found in {args.corpus}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config_path = cold_config(Path(tmp))
+        seeded = [replay(goals, args.seed, config_path) for _ in range(args.repeat)]
+        cross_seed = [seeded[0][0]] + [replay(goals, args.seed + i, config_path)[0] for i in range(1, args.seeds)]
+        unseeded = [replay(goals, None, config_path)[0] for _ in range(args.repeat)]
+        peaks, blocks = allocations(goals, args.seed, config_path)
+    best_sec = min(seconds for _, _, seconds in seeded)
+    picks = seeded[0][1]
+    warm = [warm_replay(goals, args.seed) for _ in range(args.repeat)]
+    warm_sec = min(seconds for seconds, _ in warm)
+
+    print(f"{len(goals)} goals from {args.corpus}, seed={args.seed}")
+    print(f"{'measurement':<34} {'value':>12}")
+    print(f"{'route_task routes/s (cold)':<34} {len(goals) / best_sec:>12.0f}")
+    print(f"{'route_task routes/s (warm cache)':<34} {len(goals) / warm_sec:>12.0f}")
+    print(f"{'warm cache hit rate':<34} {warm[0][1]:>12.1%}")
+    print(f"{'alloc peak KiB/route (mean)':<34} {statistics.fmean(peaks) / 1024:>12.1f}")
+    print(f"{'alloc peak KiB/route (max)':<34} {max(peaks) / 1024:>12.1f}")
+    print(f"{'allocated blocks/route (net mean)':<34} {statistics.fmean(blocks):>12.1f}")
+    print(f"{'stability: same seed x' + str(args.repeat):<34} {agreement([run[0] for run in seeded]):>12.1%}")
+    print(f"{'stability: across ' + str(args.seeds) + ' seeds':<34} {agreement(cross_seed):>12.1%}")
+    print(f"{'stability: unseeded x' + str(args.repeat):<34} {agreement(unseeded):>12.1%}")
+    print("expert picks (seeded run):")
+    total = sum(picks.values())
+    for expert_id, count in picks.most_common():
+        print(f"  {expert_id:<32} {count:>12}   {count / total:.1%}")
+
+if __name__ == "__main__":
+    main()
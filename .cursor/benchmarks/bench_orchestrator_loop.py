@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark per-call overhead of the orchestrator sync wrapper.
+Compares a fresh event loop + client per call (the previous behaviour) with
+the shared background loop, against a local stub OpenAI-compatible server.
+
+Usage:
+    python benchmarks/bench_orchestrator_loop.py [--calls 200]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from mcp.llm_stub import StubBehavior, StubLLMServer
+
+CANNED_DECISION = {
+    "agent": "TESTS",
+    "confidence": 0.9,
+    "reasoning": "Goal is about writing tests",
+    "steps": ["Write failing test", "Implement", "Refactor"]
+}
+
+
+async def _no_rag_context(goal: str, max_tokens: int | None = None) -> str:
+    # Measure transport overhead only
+    return ""
+
+
+def run(label: str, calls: int, fn, stub: StubLLMServer) -> dict[str, float]:
+    """Time `calls` invocations of fn and count new TCP connections."""
+    connections_before = stub.connections
+    latencies = []
+    for i in range(calls):
+        start = time.perf_counter()
+        result = fn(f"Write unit tests for module {i}")
+        latencies.append(time.perf_counter() - start)
+        assert result["agent"] == "tests", result
+    latencies.sort()
+    return {
+        "label": label,
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "connections": stub.connections - connections_before,
+    }
+
+
+def main() -> None:
+    """Run both modes and print a comparison."""
+    parser = argparse.ArgumentParser(description="Orchestrator sync wrapper benchmark")
+    parser.add_argument("--calls", type=int, default=200, help="Routing calls per mode")
+    args = parser.parse_args()
+
+    server = StubLLMServer(StubBehavior(decide=lambda prompt: CANNED_DECISION)).start()
+    os.environ.pop("ANTHROPIC_API_KEY", None)
+    os.environ["OPENAI_API_KEY"] = "stub"
+    os.environ["OPENAI_BASE_URL"] = server.openai_base_url
+
+    from openai import AsyncOpenAI
+
+    from mcp import orchestrator
+    from mcp.routing_cache import RoutingCache
+
+    # Both modes route the same goals; measure the transport, not the routing cache
+    orchestrator.router.cache = RoutingCache(max_entries=0)
+    orchestrator.router.get_rag_context = _no_rag_context  # type: ignore[method-assign]
+
+    def per_call_loop(goal: str) -> dict:
+        # Previous behaviour: a new loop per call; the client must be rebuilt
+        # for each loop, so every call opens a new connection.
+        async def call() -> dict:
+            orchestrator.router.client = AsyncOpenAI()
+            try:
+                return await orchestrator._route_goal(goal)
+            finally:
+                await orchestrator.router.client.close()
+        return asyncio.run(call())
+
+    baseline = run("new loop per call", args.calls, per_call_loop, server)
+
+    orchestrator.router.client = AsyncOpenAI()
+    persistent = run("background loop", args.calls, orchestrator.route_goal, server)
+
+    print(f"{args.calls} routing calls against stub at {os.environ['OPENAI_BASE_URL']}")
+    print(f"{'mode':<20} {'mean (ms)':>10} {'p50 (ms)':>10} {'p95 (ms)':>10} {'connections':>12}")
+    for r in (baseline, persistent):
+        print(f"{r['label']:<20} {r['mean_ms']:>10.2f} {r['p50_ms']:>10.2f} {r['p95_ms']:>10.2f} {r['connections']:>12}")
+
+    orchestrator.background_loop.stop()
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark time-to-decision of streamed vs blocking LLM routing.
+Runs AIAgentRouter against the local stub provider, which streams a
+realistic routing response (agent and confidence first, then a long
+reasoning and step list) one simulated token at a time.
+
+Usage:
+    python benchmarks/bench_streaming.py [--calls 20] [--latency-ms 150] [--token-ms 5]
+        [--provider openai|anthropic]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from mcp.llm_stub import StubBehavior, StubLLMServer
+
+DECISION = {
+    "agent": "TESTS",
+    "confidence": 0.88,
+    "reasoning": " ".join(
+        ["The goal asks for regression coverage around the parser, which is squarely a testing task."] * 8
+    ),
+    "steps": [f"Step {i}: write and run the next group of parser tests" for i in range(1, 9)]
+}
+
+
+async def measure(router: Any, calls: int) -> dict[str, list[float]]:
+    """Time blocking calls and streamed calls (decision and full result)."""
+    timings: dict[str, list[float]] = {"blocking": [], "stream_decision": [], "stream_result": []}
+
+    for i in range(calls):
+        start = time.perf_counter()
+        await router.route_goal(f"Add parser regression tests {i} (blocking)")
+        timings["blocking"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        async for event in router.route_goal_stream(f"Add parser regression tests {i} (stream)"):
+            timings["stream_" + event["event"]].append(time.perf_counter() - start)
+
+    return timings
+
+
+def main() -> None:
+    """Run the comparison and print mean/p50 timings."""
+    parser = argparse.ArgumentParser(description="Streaming routing benchmark")
+    parser.add_argument("--calls", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=150.0, help="Stub time to first token")
+    parser.add_argument("--token-ms", type=float, default=5.0, help="Stub delay per token")
+    parser.add_argument("--provider", choices=["openai", "anthropic"], default="openai")
+    args = parser.parse_args()
+
+    stub = StubLLMServer(StubBehavior(
+        latency_sec=args.latency_ms / 1000,
+        token_delay_sec=args.token_ms / 1000,
+        decide=lambda prompt: DECISION
+    )).start()
+
+    for name in ("OPENAI_API_KEY", "ANTHROPIC_API_KEY"):
+        os.environ.pop(name, None)
+    if args.provider == "anthropic":
+        os.environ["ANTHROPIC_API_KEY"] = "stub"
+        os.environ["ANTHROPIC_BASE_URL"] = stub.base_url
+    else:
+        os.environ["OPENAI_API_KEY"] = "stub"
+        os.environ["OPENAI_BASE_URL"] = stub.openai_base_url
+
+    from mcp.orchestrator import AIAgentRouter
+    from mcp.routing_cache import RoutingCache
+
+    router = AIAgentRouter()
+    router.cache = RoutingCache(max_entries=0)
+
+    async def no_rag_context(goal: str, max_tokens: int | None = None) -> str:
+        return ""
+    router.get_rag_context = no_rag_context  # type: ignore[method-assign]
+
+    timings = asyncio.run(measure(router, args.calls))
+    stub.stop()
+
+    tokens = len(StubBehavior().tokens(__import__("json").dumps(DECISION)))
+    print(f"{args.calls} calls, provider={args.provider}, first token {args.latency_ms}ms, "
+          f"{args.token_ms}ms/token, {tokens} tokens per response")
+    print(f"{'measurement':<28} {'mean (ms)':>10} {'p50 (ms)':>10}")
+    for label, key in (("blocking: full result", "blocking"),
+                       ("streaming: decision", "stream_decision"),
+                       ("streaming: full result", "stream_result")):
+        values = timings[key]
+        print(f"{label:<28} {statistics.mean(values) * 1000:>10.1f} {statistics.median(values) * 1000:>10.1f}")
+
+    speedup = statistics.mean(timings["blocking"]) / statistics.mean(timings["stream_decision"])
+    print(f"\ntime-to-decision speedup: x{speedup:.1f}")
+
+
+if __name__ == "__main__":
+    main()
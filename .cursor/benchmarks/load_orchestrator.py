@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Load generator for the AI orchestrator.
+Drives route_goal_async at fixed concurrency levels against the local stub
+LLM provider (or any OpenAI/Anthropic-compatible base URL) and reports
+throughput and tail latency.
+
+Usage:
+    python benchmarks/load_orchestrator.py [--concurrency 1 8 32] [--requests 200]
+        [--latency-ms 200] [--jitter-ms 50] [--error-rate 0.0] [--provider openai|anthropic]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from mcp.llm_stub import StubBehavior, StubLLMServer
+
+GOALS = [
+    "Write pytest tests for the payment service",
+    "Create a migration adding an index to the orders table",
+    "Refactor the plugin loader into smaller modules",
+    "Design the caching layer for the search API",
+    "Add integration tests for the CLI",
+    "Optimize the slow dashboard SQL query",
+]
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+async def drive(route_goal_async: Any, concurrency: int, requests: int, run_id: int) -> dict[str, Any]:
+    """Issue `requests` routing calls with at most `concurrency` in flight."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    fallbacks = 0
+
+    async def one(i: int) -> None:
+        nonlocal fallbacks
+        # Unique goals so neither the routing cache nor request coalescing kicks in
+        goal = f"{GOALS[i % len(GOALS)]} (run {run_id}, request {i})"
+        async with semaphore:
+            start = time.perf_counter()
+            result = await route_goal_async(goal)
+            latencies.append(time.perf_counter() - start)
+        if result["reasoning"].startswith("Rule-based"):
+            fallbacks += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "throughput": requests / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "max_ms": latencies[-1] * 1000,
+        "fallbacks": fallbacks,
+    }
+
+
+def main() -> None:
+    """Run each concurrency level and print a table."""
+    parser = argparse.ArgumentParser(description="Orchestrator load generator")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--requests", type=int, default=200, help="Requests per concurrency level")
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="Stub provider mean latency")
+    parser.add_argument("--jitter-ms", type=float, default=50.0, help="Stub provider jitter")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Stub provider error rate")
+    parser.add_argument("--provider", choices=["openai", "anthropic"], default="openai")
+    parser.add_argument("--base-url", default=None, help="Use an external endpoint instead of the stub")
+    parser.add_argument("--with-rag", action="store_true", help="Include the RAG context lookup")
+    args = parser.parse_args()
+
+    stub = None
+    if args.base_url is None:
+        stub = StubLLMServer(StubBehavior(
+            latency_sec=args.latency_ms / 1000,
+            jitter_sec=args.jitter_ms / 1000,
+            error_rate=args.error_rate,
+            seed=0
+        )).start()
+
+    # The router picks its provider from the environment at import time
+    for name in ("OPENAI_API_KEY", "ANTHROPIC_API_KEY", "OPENAI_BASE_URL", "ANTHROPIC_BASE_URL"):
+        os.environ.pop(name, None)
+    if args.provider == "anthropic":
+        os.environ["ANTHROPIC_API_KEY"] = os.getenv("STUB_API_KEY", "stub")
+        os.environ["ANTHROPIC_BASE_URL"] = args.base_url or stub.base_url  # type: ignore[union-attr]
+    else:
+        os.environ["OPENAI_API_KEY"] = os.getenv("STUB_API_KEY", "stub")
+        os.environ["OPENAI_BASE_URL"] = args.base_url or stub.openai_base_url  # type: ignore[union-attr]
+
+    from mcp import orchestrator
+    from mcp.routing_cache import RoutingCache
+
+    orchestrator.router.cache = RoutingCache(max_entries=0)
+    if not args.with_rag:
+        async def no_rag_context(goal: str, max_tokens: int | None = None) -> str:
+            return ""
+        orchestrator.router.get_rag_context = no_rag_context  # type: ignore[method-assign]
+
+    print(f"{args.requests} requests per level, provider={args.provider}, "
+          f"endpoint={args.base_url or 'stub'} latency={args.latency_ms}ms "
+          f"jitter={args.jitter_ms}ms error_rate={args.error_rate}")
+    print(f"{'concurrency':>11} {'req/s':>9} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9} {'max (ms)':>9} {'fallbacks':>9}")
+
+    for run_id, concurrency in enumerate(args.concurrency):
+        r = orchestrator.background_loop.run(
+            drive(orchestrator.route_goal_async, concurrency, args.requests, run_id)
+        )
+        print(f"{r['concurrency']:>11} {r['throughput']:>9.1f} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} "
+              f"{r['p99_ms']:>9.1f} {r['max_ms']:>9.1f} {r['fallbacks']:>9}")
+
+    orchestrator.background_loop.stop()
+    if stub is not None:
+        print(f"\nstub served {stub.requests} requests over {stub.connections} connections")
+        stub.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+JSON codec for the MCP transport.
+Uses orjson when installed and falls back to the stdlib json module otherwise.
+Both paths encode straight to UTF-8 bytes ready for Content-Length framing.
+"""
+
+import importlib.util
+import json
+import os
+from typing import Any
+
+ORJSON_AVAILABLE = importlib.util.find_spec("orjson") is not None
+NUMPY_AVAILABLE = importlib.util.find_spec("numpy") is not None
+
+if ORJSON_AVAILABLE:
+    import orjson
+if NUMPY_AVAILABLE:
+    import numpy as np
+
+# orjson.JSONDecodeError subclasses json.JSONDecodeError, so one except clause covers both
+DecodeError = json.JSONDecodeError
+
+
+def _stdlib_default(obj: Any) -> Any:
+    """Convert NumPy values the stdlib encoder cannot handle."""
+    if NUMPY_AVAILABLE:
+        if isinstance(obj, np.generic):
+            return obj.item()
+        if isinstance(obj, np.ndarray):
+            return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class StdlibCodec:
+    """Codec backed by the standard library json module."""
+    name = "json"
+
+    def dumps(self, obj: Any) -> bytes:
+        """Encode an object to compact UTF-8 JSON bytes."""
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False,
+                          default=_stdlib_default).encode("utf-8")
+
+    def loads(self, data: bytes | str) -> Any:
+        """Decode JSON bytes or text."""
+        return json.loads(data)
+
+
+class OrjsonCodec:
+    """Codec backed by orjson; NumPy arrays and scalars are serialized natively."""
+    name = "orjson"
+
+    def __init__(self) -> None:
+        if not ORJSON_AVAILABLE:
+            raise ImportError("orjson is not installed")
+        self.options = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, obj: Any) -> bytes:
+        """Encode an object to compact UTF-8 JSON bytes."""
+        return orjson.dumps(obj, default=_stdlib_default, option=self.options)
+
+    def loads(self, data: bytes | str) -> Any:
+        """Decode JSON bytes or text."""
+        return orjson.loads(data)
+
+
+def get_codec(name: str | None = None) -> StdlibCodec | OrjsonCodec:
+    """
+    Get a codec by name.
+
+    Args:
+        name: 'orjson', 'json', or None for the fastest available
+
+    Returns:
+        Codec instance
+    """
+    if name == "json" or (name is None and not ORJSON_AVAILABLE):
+        return StdlibCodec()
+    return OrjsonCodec()
+
+
+# Global codec instance used by the transport (MCP_JSON_CODEC=json forces the stdlib path)
+codec = get_codec(os.getenv("MCP_JSON_CODEC") or None)
+
+
+def dumps(obj: Any) -> bytes:
+    """Encode an object with the default codec."""
+    return codec.dumps(obj)
+
+
+def loads(data: bytes | str) -> Any:
+    """Decode JSON with the default codec."""
+    return codec.loads(data)
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Self-consistency sampling with confidence-weighted voting.
+Draws N samples from a model concurrently, votes on their answers, and stops
+sampling as soon as the remaining samples can no longer change the outcome.
+Configured by `self_consistency` in rules/reasoning.yml and by
+`cisc_samples` / `cisc_temperature` in rules/moe.yml.
+"""
+
+import asyncio
+import hashlib
+import random
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from typing import Any
+
+from mcp.metrics import metrics_registry
+
+VOTE_MODES = ("confidence-weighted", "majority")
+
+
+@dataclass
+class Sample:
+    """One model answer and the model's confidence in it (0.0-1.0)."""
+
+    answer: str
+    confidence: float = 1.0
+
+
+# Draws sample `index` at `temperature`
+Sampler = Callable[[int, float], Awaitable[Sample]]
+
+
+@dataclass
+class ConsistencyResult:
+    """Outcome of a self-consistency vote."""
+
+    answer: str | None
+    confidence: float
+    votes: dict[str, float]
+    samples_requested: int
+    samples_drawn: int
+    samples_failed: int = 0
+    abstained: bool = False
+    early_stopped: bool = False
+    answer_confidences: list[float] = field(default_factory=list, repr=False)
+    last_error: BaseException | None = field(default=None, repr=False)
+
+    @property
+    def samples_saved(self) -> int:
+        """Samples not drawn (or cancelled) thanks to early stopping."""
+        return self.samples_requested - self.samples_drawn
+
+    @property
+    def mean_answer_confidence(self) -> float:
+        """Average confidence of the samples that gave the winning answer."""
+        if not self.answer_confidences:
+            return 0.0
+        return sum(self.answer_confidences) / len(self.answer_confidences)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "answer": self.answer,
+            "confidence": round(self.confidence, 4),
+            "votes": {answer: round(weight, 4) for answer, weight in self.votes.items()},
+            "samples_requested": self.samples_requested,
+            "samples_drawn": self.samples_drawn,
+            "samples_saved": self.samples_saved,
+            "samples_failed": self.samples_failed,
+            "abstained": self.abstained,
+            "early_stopped": self.early_stopped
+        }
+
+
+def normalize_answer(answer: str) -> str:
+    """Vote key: case- and whitespace-insensitive."""
+    return " ".join(str(answer).lower().split())
+
+
+class SelfConsistency:
+    """
+    Concurrent self-consistency engine.
+
+    Features:
+    - Up to `max_concurrency` samples in flight (all of them by default)
+    - Confidence-weighted or majority voting on normalized answers
+    - Early stop once the leader's margin exceeds the most weight the
+      undrawn samples could add to the runner-up
+    - Abstains on a tie when `abstain_if_tie` is set
+    """
+
+    def __init__(self, samples: int = 5, temperature: float = 0.8, vote: str = "confidence-weighted",
+                 abstain_if_tie: bool = True, max_concurrency: int | None = None) -> None:
+        """
+        Initialize the engine.
+
+        Args:
+            samples: Samples to draw at most
+            temperature: Sampling temperature passed to the sampler
+            vote: "confidence-weighted" or "majority"
+            abstain_if_tie: Return no answer when the top answers tie
+            max_concurrency: Samples in flight at once (defaults to all)
+
+        Raises:
+            ValueError: If samples < 1 or the vote mode is unknown
+        """
+        if samples < 1:
+            raise ValueError(f"samples must be at least 1, got {samples}")
+        if vote not in VOTE_MODES:
+            raise ValueError(f"Unknown vote mode '{vote}' (expected one of {', '.join(VOTE_MODES)})")
+        self.samples = samples
+        self.temperature = temperature
+        self.vote = vote
+        self.abstain_if_tie = abstain_if_tie
+        self.max_concurrency = max_concurrency
+
+    @classmethod
+    def from_config(cls, config: dict[str, Any], max_concurrency: int | None = None) -> "SelfConsistency":
+        """Create an engine from a reasoning.yml `self_consistency` section."""
+        return cls(
+            samples=int(config.get("samples", 5)),
+            temperature=float(config.get("temperature", 0.8)),
+            vote=config.get("vote", "confidence-weighted"),
+            abstain_if_tie=bool(config.get("abstain_if_tie", True)),
+            max_concurrency=max_concurrency
+        )
+
+    def _weight(self, sample: Sample) -> float:
+        if self.vote == "majority":
+            return 1.0
+        return min(max(float(sample.confidence), 0.0), 1.0)
+
+    @staticmethod
+    def _decided(weights: list[float], remaining: int) -> bool:
+        """True if `remaining` samples of weight <= 1 cannot change the leader (or create a tie)."""
+        if not weights:
+            return False
+        ordered = sorted(weights, reverse=True)
+        runner_up = ordered[1] if len(ordered) > 1 else 0.0
+        return ordered[0] - runner_up > remaining
+
+    async def run(self, sampler: Sampler) -> ConsistencyResult:
+        """
+        Draw samples and vote.
+
+        Args:
+            sampler: Coroutine drawing sample `index` at a temperature
+
+        Returns:
+            The vote outcome; `answer` is None if every sample failed or the
+            vote tied with abstain_if_tie set
+        """
+        limit = max(1, self.max_concurrency or self.samples)
+        weights: dict[str, float] = {}
+        answers: dict[str, str] = {}  # vote key -> first answer text seen
+        confidences: dict[str, list[float]] = {}
+        drawn = failed = launched = 0
+        early_stopped = False
+        last_error: BaseException | None = None
+        pending: set[asyncio.Future[Sample]] = set()
+        index_of: dict[asyncio.Future[Sample], int] = {}
+
+        try:
+            while True:
+                while launched < self.samples and len(pending) < limit:
+                    task = asyncio.ensure_future(sampler(launched, self.temperature))
+                    index_of[task] = launched
+                    pending.add(task)
+                    launched += 1
+                if not pending:
+                    break
+
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                # Sample order, so ties between simultaneous answers break the same way every run
+                for task in sorted(done, key=index_of.__getitem__):
+                    drawn += 1
+                    if task.exception() is not None:
+                        failed += 1
+                        last_error = task.exception()
+                        continue
+                    sample = task.result()
+                    key = normalize_answer(sample.answer)
+                    answers.setdefault(key, sample.answer)
+                    weights[key] = weights.get(key, 0.0) + self._weight(sample)
+                    confidences.setdefault(key, []).append(float(sample.confidence))
+
+                if drawn < self.samples and self._decided(list(weights.values()), self.samples - drawn):
+                    early_stopped = True
+                    break
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+        result = self._tally(weights, answers, confidences, drawn, failed, early_stopped)
+        result.last_error = last_error
+        metrics_registry.increment("consistency.samples_drawn", result.samples_drawn)
+        metrics_registry.increment("consistency.samples_saved", result.samples_saved)
+        return result
+
+    def _tally(self, weights: dict[str, float], answers: dict[str, str], confidences: dict[str, list[float]],
+               drawn: int, failed: int, early_stopped: bool) -> ConsistencyResult:
+        votes = {answers[key]: weight for key, weight in weights.items()}
+        total = sum(weights.values())
+        if not weights:
+            return ConsistencyResult(None, 0.0, votes, self.samples, drawn, failed, early_stopped=early_stopped)
+
+        # Ties go to the answer seen first (dicts keep insertion order)
+        leader = max(weights, key=lambda key: weights[key])
+        top = weights[leader]
+        tied = sum(1 for weight in weights.values() if abs(weight - top) < 1e-9) > 1
+        if tied and self.abstain_if_tie:
+            return ConsistencyResult(None, 0.0, votes, self.samples, drawn, failed,
+                                     abstained=True, early_stopped=early_stopped)
+
+        return ConsistencyResult(
+            answer=answers[leader],
+            confidence=top / total if total > 0 else 0.0,
+            votes=votes,
+            samples_requested=self.samples,
+            samples_drawn=drawn,
+            samples_failed=failed,
+            early_stopped=early_stopped,
+            answer_confidences=confidences[leader]
+        )
+
+
+class DeterministicSampler:
+    """
+    Local stand-in model for tests and benchmarks.
+
+    Picks an answer from a fixed distribution, sharpened or flattened by the
+    temperature (p ** (1 / T)). Each draw depends only on (seed, prompt,
+    index), so results do not depend on completion order.
+    """
+
+    def __init__(self, distribution: dict[str, float], prompt: str = "", seed: int = 0,
+                 latency_sec: float = 0.0, confidence_noise: float = 0.1) -> None:
+        """
+        Initialize the sampler.
+
+        Args:
+            distribution: Answer -> probability at temperature 1 (need not sum to 1)
+            prompt: Mixed into the per-sample seed
+            seed: Base seed
+            latency_sec: Simulated time per sample
+            confidence_noise: Spread of the reported confidence around the answer's probability
+        """
+        self.distribution = distribution
+        self.prompt = prompt
+        self.seed = seed
+        self.latency_sec = latency_sec
+        self.confidence_noise = confidence_noise
+        self.calls = 0
+
+    def _rng(self, index: int) -> random.Random:
+        digest = hashlib.sha256(f"{self.seed}:{self.prompt}:{index}".encode()).digest()
+        return random.Random(int.from_bytes(digest[:8], "big"))
+
+    async def __call__(self, index: int, temperature: float) -> Sample:
+        self.calls += 1
+        if self.latency_sec:
+            await asyncio.sleep(self.latency_sec)
+
+        rng = self._rng(index)
+        answers = list(self.distribution)
+        total = sum(self.distribution.values())
+        weights = [(p / total) ** (1.0 / max(temperature, 1e-3)) for p in self.distribution.values()]
+        answer = rng.choices(answers, weights=weights)[0]
+        confidence = self.distribution[answer] / total + rng.uniform(-self.confidence_noise, self.confidence_noise)
+        return Sample(answer, min(max(confidence, 0.0), 1.0))
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Token-budgeted RAG context assembly for orchestrator prompts.
+Counts tokens with the ingestion tokenizer, removes the overlap that the
+chunker deliberately repeats between neighbouring chunks, and packs the
+highest-scoring material under a token budget.
+"""
+
+import hashlib
+import importlib.util
+import sys
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+import yaml
+
+TIKTOKEN_AVAILABLE = importlib.util.find_spec("tiktoken") is not None
+
+if TIKTOKEN_AVAILABLE:
+    import tiktoken
+
+CURSOR_DIR = Path(__file__).resolve().parents[1]
+REASONING_CONFIG_PATH = CURSOR_DIR / "rules" / "reasoning.yml"
+RAG_CONFIG_PATH = CURSOR_DIR / "rag" / "config.yaml"
+
+# Longest word overlap searched between neighbouring chunks (chunker overlap is ~70 tokens)
+MAX_OVERLAP_WORDS = 200
+
+
+def _load_yaml(path: Path) -> dict[str, Any]:
+    if not path.exists():
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return yaml.safe_load(f) or {}
+
+
+class TokenCounter:
+    """
+    Token counting and truncation with a tiktoken encoding.
+
+    Falls back to a 4-characters-per-token estimate when tiktoken or the
+    encoding file is unavailable, so routing never fails on tokenization.
+    """
+
+    CHARS_PER_TOKEN = 4
+
+    def __init__(self, encoding_model: str = "cl100k_base") -> None:
+        self.encoding_model = encoding_model
+        self.encoding = None
+        if TIKTOKEN_AVAILABLE:
+            try:
+                self.encoding = tiktoken.get_encoding(encoding_model)
+            except Exception as e:
+                print(f"Tokenizer '{encoding_model}' unavailable ({e}); estimating token counts", file=sys.stderr)
+
+    def count(self, text: str) -> int:
+        """Number of tokens in text."""
+        if self.encoding is not None:
+            return len(self.encoding.encode(text))
+        return -(-len(text) // self.CHARS_PER_TOKEN)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Cut text to at most max_tokens tokens."""
+        if max_tokens <= 0:
+            return ""
+        if self.encoding is not None:
+            tokens = self.encoding.encode(text)
+            return text if len(tokens) <= max_tokens else self.encoding.decode(tokens[:max_tokens])
+        return text[:max_tokens * self.CHARS_PER_TOKEN]
+
+
+def overlap_words(previous: list[str], following: list[str]) -> int:
+    """Length of the longest suffix of `previous` that is a prefix of `following`."""
+    for k in range(min(len(previous), len(following), MAX_OVERLAP_WORDS), 0, -1):
+        if previous[-k:] == following[:k]:
+            return k
+    return 0
+
+
+class ContextAssembler:
+    """
+    Pack retrieved chunks into a prompt section under a token budget.
+
+    Features:
+    - Token counts from the same tiktoken encoding as ingestion
+    - Exact duplicates dropped, chunker overlap between neighbours trimmed
+    - Greedy packing by score; the last chunk is truncated to fill the budget
+    - Output grouped by source file in document order
+    """
+
+    def __init__(self, max_tokens: int | None = None, encoding_model: str | None = None,
+                 min_score: float = 0.7, min_fill_tokens: int = 64) -> None:
+        """
+        Initialize the assembler.
+
+        Args:
+            max_tokens: Prompt token budget (defaults to budgets.max_tokens in rules/reasoning.yml)
+            encoding_model: tiktoken encoding (defaults to the ingestion chunking encoding)
+            min_score: Chunks scoring below this are ignored
+            min_fill_tokens: Smallest truncated chunk worth adding when the budget runs out
+        """
+        if max_tokens is None:
+            max_tokens = _load_yaml(REASONING_CONFIG_PATH).get("budgets", {}).get("max_tokens", 16000)
+        if encoding_model is None:
+            chunking = _load_yaml(RAG_CONFIG_PATH).get("ingestion", {}).get("chunking", {})
+            encoding_model = chunking.get("encoding_model", "cl100k_base")
+
+        self.max_tokens = int(max_tokens)
+        self.min_score = min_score
+        self.min_fill_tokens = min_fill_tokens
+        self.counter = TokenCounter(encoding_model)
+
+    def count_tokens(self, text: str) -> int:
+        return self.counter.count(text)
+
+    def assemble(self, chunks: list[dict[str, Any]], max_tokens: int | None = None,
+                 format_chunk: Callable[[str, dict[str, Any]], str] | None = None) -> str:
+        """
+        Build the context section from retrieved chunks.
+
+        Args:
+            chunks: Dicts with text, path, idx and score (as from search_knowledge_chunks)
+            max_tokens: Budget for this call (defaults to self.max_tokens)
+            format_chunk: Renders (text, chunk) to a line; defaults to a bulleted entry
+
+        Returns:
+            Context text, empty if nothing relevant fits
+        """
+        budget = self.max_tokens if max_tokens is None else max_tokens
+        format_chunk = format_chunk or self._format_chunk
+
+        candidates = sorted(
+            (c for c in chunks if c.get("text") and c.get("score", 0.0) >= self.min_score),
+            key=lambda c: c["score"], reverse=True
+        )
+
+        seen: set[str] = set()
+        selected: dict[tuple[str, int], dict[str, Any]] = {}
+        remaining = budget
+
+        for chunk in candidates:
+            digest = hashlib.sha1(" ".join(chunk["text"].split()).encode("utf-8")).hexdigest()
+            if digest in seen:
+                continue
+            seen.add(digest)
+
+            path, idx = str(chunk.get("path", "")), int(chunk.get("idx", 0))
+            words = chunk["text"].split()
+
+            # Drop the text this chunk repeats from an already selected neighbour
+            previous = selected.get((path, idx - 1))
+            if previous is not None:
+                words = words[overlap_words(previous["words"], words):]
+            following = selected.get((path, idx + 1))
+            if following is not None:
+                cut = overlap_words(words, following["words"])
+                words = words[:len(words) - cut]
+            if not words:
+                continue
+
+            text = " ".join(words)
+            line = format_chunk(text, chunk)
+            cost = self.count_tokens(line) + 1  # newline separator
+
+            if cost > remaining:
+                if remaining - 1 < self.min_fill_tokens:
+                    break
+                # Fill the rest of the budget with the head of this chunk
+                # (token counts are not additive across the join, so shrink until it fits)
+                while cost > remaining and text:
+                    text = self.counter.truncate(text, self.count_tokens(text) - (cost - remaining))
+                    line = format_chunk(text, chunk)
+                    cost = self.count_tokens(line) + 1
+                if not text:
+                    break
+
+            selected[(path, idx)] = {"words": chunk["text"].split(), "line": line}
+            remaining -= cost
+            if remaining < self.min_fill_tokens:
+                break
+
+        # Source files ordered by their best chunk, chunks in document order
+        source_rank: dict[str, int] = {}
+        for path, _ in selected:
+            source_rank.setdefault(path, len(source_rank))
+        ordered = sorted(selected.items(), key=lambda item: (source_rank[item[0][0]], item[0][1]))
+        return "\n".join(entry["line"] for _, entry in ordered)
+
+    @staticmethod
+    def _format_chunk(text: str, chunk: dict[str, Any]) -> str:
+        return f"• [{chunk.get('path', '')}] {text} (relevance: {chunk.get('score', 0.0):.2f})"
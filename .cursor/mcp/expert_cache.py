@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Memoized per-expert results for the MoE router.
+Bounded LRU cache with a TTL and a byte budget, keyed by expert id, a hash of the
+expert's prompt and definition, the normalized goal and the routing features.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Iterable, Mapping
+from pathlib import Path
+from typing import Any
+
+from mcp.expert_embeddings import expert_text
+from mcp.routing_cache import normalize_goal
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def expert_fingerprint(expert: Mapping[str, Any], prompts_dir: Path, salt: Mapping[str, Any] | None = None) -> str:
+    """
+    Hash of everything that shapes an expert's output apart from the goal.
+
+    Args:
+        expert: Expert definition from moe.yml
+        prompts_dir: Directory the expert's `prompt` path is relative to
+        salt: Other settings the output depends on (e.g. sampling parameters)
+
+    Returns:
+        Short hex digest; changes when the prompt text or definition changes
+    """
+    definition = json.dumps([expert, salt or {}], sort_keys=True, default=str)
+    return _digest(f"{expert_text(expert, prompts_dir)}\x00{definition}")
+
+
+def expert_cache_key(expert_id: str, fingerprint: str, goal: str, features: Mapping[str, Any],
+                     relevant: Iterable[str]) -> str:
+    """
+    Cache key for one expert's answer to one goal.
+
+    Args:
+        expert_id: Expert id
+        fingerprint: expert_fingerprint of the expert
+        goal: Goal text (normalized, so trivially different phrasings share a key)
+        features: Routing features of the goal
+        relevant: Feature names that affect the answer; goal_keywords is covered by the goal
+    """
+    values = {name: features.get(name) for name in relevant if name != "goal_keywords"}
+    encoded = json.dumps(values, sort_keys=True, separators=(",", ":"), default=str)
+    return "\x00".join((expert_id, fingerprint, normalize_goal(goal), _digest(encoded)))
+
+
+class ExpertResultCache:
+    """
+    LRU cache of expert results with a time-to-live and a size budget.
+
+    Entries are weighed by their JSON size; the least recently used are evicted
+    until the cache fits max_bytes, so a few large answers cannot crowd out the
+    budget unnoticed. Values larger than the whole budget are not cached.
+    """
+
+    def __init__(self, max_bytes: int = 4 * 1024 * 1024, ttl_sec: float = 600.0) -> None:
+        """
+        Initialize the cache.
+
+        Args:
+            max_bytes: Total JSON size of the cached results (0 disables caching)
+            ttl_sec: Seconds a result stays valid
+        """
+        self.max_bytes = max_bytes
+        self.ttl_sec = ttl_sec
+        self._entries: OrderedDict[str, tuple[float, int, dict[str, Any]]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0 and self.ttl_sec > 0
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        """Return a cached result, or None on a miss or expired entry."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value: dict[str, Any]) -> None:
+        """Store a result, evicting the least recently used entries until it fits."""
+        if not self.enabled:
+            return
+        size = len(json.dumps(value, separators=(",", ":"), default=str).encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl_sec, size, value)
+            self._bytes += size
+            self._shrink()
+
+    def resize(self, max_bytes: int, ttl_sec: float) -> None:
+        """Apply new limits (e.g. after a config reload), evicting down to the new budget."""
+        with self._lock:
+            self.max_bytes = max_bytes
+            self.ttl_sec = ttl_sec
+            self._shrink()
+
+    def clear(self) -> None:
+        """Drop all entries and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict[str, Any]:
+        """Hit/miss counts and current size."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_sec": self.ttl_sec,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0
+            }
+
+    def _remove(self, key: str) -> None:
+        # Called with the lock held
+        self._bytes -= self._entries.pop(key)[1]
+
+    def _shrink(self) -> None:
+        # Called with the lock held
+        while self._entries and self._bytes > self.max_bytes:
+            self._bytes -= self._entries.popitem(last=False)[1][1]
+            self.evictions += 1
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Embedding index of MoE experts for similarity-based preselection.
+Each expert is embedded from its prompt file (prompts/experts/*.md) and its
+strengths. Vectors are cached by the SHA-256 of that text, so rebuilding the
+matrix after a config or prompt change only re-embeds the experts that changed.
+"""
+
+import hashlib
+import threading
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import yaml
+
+# Embeds a batch of texts, one vector per text
+Embedder = Callable[[list[str]], Sequence[Sequence[float]]]
+
+
+def _split_front_matter(text: str) -> tuple[dict[str, Any], str]:
+    """Split a '---' delimited YAML header from a markdown body."""
+    if text.startswith("---"):
+        _, _, rest = text.partition("\n")
+        header, separator, body = rest.partition("\n---")
+        if separator:
+            try:
+                meta = yaml.safe_load(header) or {}
+            except yaml.YAMLError:
+                meta = {}
+            return meta if isinstance(meta, dict) else {}, body.partition("\n")[2]
+    return {}, text
+
+
+def expert_text(expert: dict[str, Any], prompts_dir: Path) -> str:
+    """
+    Text embedded for an expert: prompt title and body, then its strengths.
+
+    Args:
+        expert: moe.yml expert entry (`prompt` is relative to prompts_dir)
+        prompts_dir: Directory holding the prompt files
+
+    Returns:
+        The text; just the id and strengths if the prompt file is missing
+    """
+    meta: dict[str, Any] = {}
+    body = ""
+    if expert.get("prompt"):
+        try:
+            meta, body = _split_front_matter((prompts_dir / expert["prompt"]).read_text(encoding="utf-8"))
+        except OSError:
+            pass
+    strengths = ", ".join(str(strength).replace("_", " ") for strength in expert.get("strengths", []))
+    parts = [str(meta.get("title") or expert["id"]), body.strip(), f"Strengths: {strengths}"]
+    return "\n".join(part for part in parts if part)
+
+
+def _unit_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+
+@dataclass(frozen=True)
+class ExpertEmbeddings:
+    """Unit-length expert vectors, one row per expert, in config order."""
+
+    expert_ids: tuple[str, ...]
+    matrix: np.ndarray  # (experts, dim)
+    hashes: tuple[str, ...]
+
+    def similarities(self, goal_embeddings: Sequence[Sequence[float]]) -> np.ndarray:
+        """Cosine similarity of each goal to each expert, shape (goals, experts)."""
+        goals = np.asarray(goal_embeddings, dtype=float)
+        if goals.ndim == 1:
+            goals = goals[None, :]
+        if goals.shape[1] != self.matrix.shape[1]:
+            raise ValueError(f"Goal embeddings have dimension {goals.shape[1]}, "
+                             f"expert embeddings {self.matrix.shape[1]}")
+        return _unit_rows(goals) @ self.matrix.T
+
+    def select(self, goal_embeddings: Sequence[Sequence[float]], top_n: int,
+               min_similarity: float) -> list[list[tuple[str, float]]]:
+        """
+        Most similar experts for each goal.
+
+        Args:
+            goal_embeddings: One vector per goal
+            top_n: Experts per goal at most
+            min_similarity: Cosine similarity an expert needs to be picked
+
+        Returns:
+            (expert_id, similarity) pairs per goal, most similar first
+        """
+        if not self.expert_ids:
+            return [[] for _ in goal_embeddings]
+        scores = self.similarities(goal_embeddings)
+        order = np.argsort(-scores, axis=1, kind="stable")[:, :top_n]
+        return [
+            [(self.expert_ids[column], round(float(row[column]), 4)) for column in columns
+             if row[column] >= min_similarity]
+            for row, columns in zip(scores, order, strict=True)
+        ]
+
+
+class ExpertEmbeddingIndex:
+    """Builds ExpertEmbeddings, embedding only texts it has not seen before."""
+
+    def __init__(self, embedder: Embedder, prompts_dir: str | Path) -> None:
+        """
+        Initialize index.
+
+        Args:
+            embedder: Batch embedding function (e.g. RAGServer.get_embeddings)
+            prompts_dir: Directory the experts' `prompt` paths are relative to
+        """
+        self.embedder = embedder
+        self.prompts_dir = Path(prompts_dir)
+        self.embedded = 0  # Texts sent to the embedder so far
+        self._vectors: dict[str, np.ndarray] = {}  # text hash -> unit vector
+        self._lock = threading.Lock()
+
+    def build(self, experts: dict[str, dict[str, Any]]) -> ExpertEmbeddings:
+        """
+        Embed the experts of a config.
+
+        Args:
+            experts: Expert id -> moe.yml expert entry
+
+        Returns:
+            The expert matrix; unchanged experts reuse their cached vectors
+        """
+        texts = {expert_id: expert_text(expert, self.prompts_dir) for expert_id, expert in experts.items()}
+        hashes = {expert_id: hashlib.sha256(text.encode("utf-8")).hexdigest() for expert_id, text in texts.items()}
+
+        with self._lock:
+            missing = {digest: texts[expert_id] for expert_id, digest in hashes.items() if digest not in self._vectors}
+            if missing:
+                vectors = np.asarray(self.embedder(list(missing.values())), dtype=float)
+                if vectors.ndim != 2 or len(vectors) != len(missing):
+                    raise ValueError(f"Embedder returned shape {vectors.shape} for {len(missing)} texts")
+                self._vectors.update(zip(missing, _unit_rows(vectors), strict=True))
+                self.embedded += len(missing)
+            # Forget experts that were removed or rewritten
+            self._vectors = {digest: self._vectors[digest] for digest in set(hashes.values())}
+            rows = [self._vectors[hashes[expert_id]] for expert_id in experts]
+
+        dim = rows[0].shape[0] if rows else 0
+        return ExpertEmbeddings(
+            expert_ids=tuple(experts),
+            matrix=np.vstack(rows) if rows else np.zeros((0, dim)),
+            hashes=tuple(hashes.values())
+        )
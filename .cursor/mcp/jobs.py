@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Background ingestion jobs for the MCP server.
+Runs RAG ingestion off the request path with progress reporting and cancellation.
+"""
+
+import threading
+import time
+import uuid
+from collections.abc import Callable
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Protocol
+
+# Job lifecycle states
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_CANCELLED = "cancelled"
+JOB_FAILED = "failed"
+
+FINISHED_STATES = {JOB_COMPLETED, JOB_CANCELLED, JOB_FAILED}
+
+Notifier = Callable[[str, dict[str, Any]], None]
+
+
+class Ingestor(Protocol):
+    """Subset of RAGIngestor used by ingestion jobs."""
+
+    def ingest_file(self, file_path: Path) -> dict[str, Any]: ...
+
+    def iter_directory_files(self, directory_path: Path) -> list[Path]: ...
+
+
+@dataclass
+class IngestJob:
+    """State of a single background ingestion job."""
+    job_id: str
+    paths: list[str]
+    progress_token: str | int | None
+    request_id: str | int | None = None
+    status: str = JOB_PENDING
+    files_total: int = 0
+    files_done: int = 0
+    chunks: int = 0
+    skipped: int = 0
+    errors: list[dict[str, Any]] = field(default_factory=list)
+    created_at: float = field(default_factory=time.time)
+    started_at: float | None = None
+    finished_at: float | None = None
+    error: str | None = None
+    cancel_event: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    def eta_seconds(self) -> float | None:
+        """Estimate remaining seconds from the average time per finished file."""
+        if self.started_at is None or self.files_done == 0:
+            return None
+        if self.status in FINISHED_STATES:
+            return 0.0
+        elapsed = time.time() - self.started_at
+        remaining = self.files_total - self.files_done
+        return round(elapsed / self.files_done * remaining, 2)
+
+    def to_dict(self) -> dict[str, Any]:
+        """Convert to a JSON-serializable status payload."""
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "paths": self.paths,
+            "files_total": self.files_total,
+            "files_done": self.files_done,
+            "chunks": self.chunks,
+            "skipped": self.skipped,
+            "errors": self.errors,
+            "eta_sec": self.eta_seconds(),
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+
+
+class IngestJobManager:
+    """
+    Runs ingestion jobs on a dedicated worker thread.
+
+    Features:
+    - Jobs are processed one file at a time so cancellation takes effect between files
+    - Progress is reported through `notifications/progress` with files, chunks and ETA,
+      only for jobs whose client supplied a progress token
+    - Jobs run serially on a single worker to avoid concurrent writes to ChromaDB;
+      synchronous ingestion goes through run() so it queues behind them
+    - Finished jobs are kept (bounded) for `rag.ingest_status` polling
+    """
+
+    def __init__(self, ingestor_factory: Callable[[], Ingestor],
+                 notify: Notifier | None = None, max_finished_jobs: int = 50) -> None:
+        """
+        Initialize job manager.
+
+        Args:
+            ingestor_factory: Callable returning the (lazily created) ingestor
+            notify: Callable used to emit JSON-RPC notifications (method, params)
+            max_finished_jobs: Number of finished jobs retained for status queries
+        """
+        self.ingestor_factory = ingestor_factory
+        self.notify = notify
+        self.max_finished_jobs = max_finished_jobs
+        self.jobs: dict[str, IngestJob] = {}
+        self._request_index: dict[str | int, str] = {}
+        self._futures: dict[str, Future[None]] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rag-ingest")
+
+    def start(self, paths: list[str], request_id: str | int | None = None,
+              progress_token: str | int | None = None) -> IngestJob:
+        """
+        Queue a new ingestion job and return immediately.
+
+        Args:
+            paths: File or directory paths to ingest
+            request_id: JSON-RPC id of the request that started the job (used for cancellation)
+            progress_token: Client-supplied progress token (`_meta.progressToken`);
+                without one no progress notifications are sent
+
+        Returns:
+            The newly created job
+        """
+        job_id = uuid.uuid4().hex[:12]
+        job = IngestJob(
+            job_id=job_id,
+            paths=list(paths),
+            progress_token=progress_token,
+            request_id=request_id
+        )
+
+        with self._lock:
+            self.jobs[job_id] = job
+            if request_id is not None:
+                self._request_index[request_id] = job_id
+            self._prune_finished()
+
+        self._futures[job_id] = self._executor.submit(self._run, job)
+        return job
+
+    def run(self, paths: list[str], timeout: float | None = None) -> IngestJob:
+        """
+        Ingest on the worker and block until done.
+
+        Synchronous callers use this instead of writing to the store directly,
+        so their writes never overlap a background job's.
+
+        Args:
+            paths: File or directory paths to ingest
+            timeout: Seconds to wait for the job (None waits indefinitely)
+
+        Returns:
+            The finished job (cancelled if the manager shut down first)
+        """
+        job = self.start(paths)
+        self.wait(job.job_id, timeout=timeout)
+        return job
+
+    def get(self, job_id: str) -> IngestJob | None:
+        """Get a job by id."""
+        return self.jobs.get(job_id)
+
+    def list_jobs(self) -> list[dict[str, Any]]:
+        """List all known jobs, newest first."""
+        jobs = sorted(self.jobs.values(), key=lambda j: j.created_at, reverse=True)
+        return [job.to_dict() for job in jobs]
+
+    def cancel(self, job_id: str | None = None, request_id: str | int | None = None) -> bool:
+        """
+        Request cancellation of a job by job id or originating request id.
+
+        The job stops before its next file; the file being processed is finished.
+
+        Returns:
+            True if a running or pending job was signalled
+        """
+        if job_id is None and request_id is not None:
+            job_id = self._request_index.get(request_id)
+        job = self.jobs.get(job_id) if job_id else None
+        if job is None or job.status in FINISHED_STATES:
+            return False
+
+        job.cancel_event.set()
+        return True
+
+    def wait(self, job_id: str, timeout: float | None = None) -> IngestJob | None:
+        """Block until a job finishes (used by tests and shutdown); a job dropped by shutdown() comes back cancelled."""
+        future = self._futures.get(job_id)
+        if future is not None:
+            try:
+                future.result(timeout=timeout)
+            except CancelledError:
+                # Never started: shutdown() cancelled it while queued
+                job = self.jobs.get(job_id)
+                if job is not None and job.status not in FINISHED_STATES:
+                    job.status = JOB_CANCELLED
+                    job.finished_at = time.time()
+        return self.jobs.get(job_id)
+
+    def shutdown(self) -> None:
+        """Cancel outstanding jobs and stop the worker thread."""
+        for job in self.jobs.values():
+            job.cancel_event.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _prune_finished(self) -> None:
+        """Drop the oldest finished jobs beyond the retention limit."""
+        finished = [j for j in self.jobs.values() if j.status in FINISHED_STATES]
+        excess = len(finished) - self.max_finished_jobs
+        if excess <= 0:
+            return
+        finished.sort(key=lambda j: j.created_at)
+        for job in finished[:excess]:
+            self.jobs.pop(job.job_id, None)
+            self._futures.pop(job.job_id, None)
+            if job.request_id is not None:
+                self._request_index.pop(job.request_id, None)
+
+    def _collect_files(self, ingestor: Ingestor, job: IngestJob) -> list[Path]:
+        """Expand job paths into the list of files to ingest."""
+        files: list[Path] = []
+        for path_str in job.paths:
+            path = Path(path_str)
+            if path.is_file():
+                files.append(path)
+            elif path.is_dir():
+                files.extend(ingestor.iter_directory_files(path))
+            else:
+                job.errors.append({"path": path_str, "error": f"Path not found: {path_str}"})
+        return files
+
+    def _run(self, job: IngestJob) -> None:
+        """Worker body: ingest files one by one, reporting progress."""
+        job.status = JOB_RUNNING
+        job.started_at = time.time()
+
+        try:
+            if job.cancel_event.is_set():
+                job.status = JOB_CANCELLED
+                return
+
+            ingestor = self.ingestor_factory()
+            files = self._collect_files(ingestor, job)
+            job.files_total = len(files)
+            self._report(job, "Ingestion started")
+
+            for file_path in files:
+                if job.cancel_event.is_set():
+                    job.status = JOB_CANCELLED
+                    break
+
+                result = ingestor.ingest_file(file_path)
+                job.files_done += 1
+                if result.get("status") == "success":
+                    job.chunks += result.get("chunks_count", 0)
+                elif result.get("status") == "error":
+                    job.errors.append({"path": str(file_path), "error": result.get("error", "")})
+                else:
+                    job.skipped += 1
+
+                self._report(job, f"Ingested {file_path.name}")
+            else:
+                job.status = JOB_COMPLETED
+
+        except Exception as e:
+            job.status = JOB_FAILED
+            job.error = str(e)
+
+        finally:
+            job.finished_at = time.time()
+            self._report(job, f"Ingestion {job.status}")
+
+    def _report(self, job: IngestJob, message: str) -> None:
+        """Emit a progress notification for a job (MCP only allows them for a client-supplied token)."""
+        if self.notify is None or job.progress_token is None:
+            return
+
+        try:
+            self.notify("notifications/progress", {
+                "progressToken": job.progress_token,
+                "progress": job.files_done,
+                "total": job.files_total,
+                "message": message,
+                "job_id": job.job_id,
+                "status": job.status,
+                "files_done": job.files_done,
+                "chunks": job.chunks,
+                "eta_sec": job.eta_seconds(),
+            })
+        except Exception:
+            # Never let a broken transport kill the ingestion worker
+            pass
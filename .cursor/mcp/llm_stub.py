@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Local stand-in LLM provider for offline benchmarks and tests.
+Serves canned routing decisions over HTTP in the shape of the OpenAI
+chat.completions and Anthropic messages APIs (plain and server-sent event
+streams), with configurable latency, jitter, per-token delay and error
+rate. Point a client at it with OPENAI_BASE_URL or ANTHROPIC_BASE_URL.
+
+Usage:
+    python -m mcp.llm_stub --port 8765 --latency-ms 300 --jitter-ms 100 --token-ms 10 --error-rate 0.02
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+DEFAULT_DECISION: dict[str, Any] = {
+    "agent": "GENERAL",
+    "confidence": 0.9,
+    "reasoning": "Stub provider routing decision",
+    "steps": ["Analyze task requirements", "Implement solution", "Test functionality"]
+}
+
+
+@dataclass
+class StubBehavior:
+    """How the stub provider responds."""
+    # Time to first token
+    latency_sec: float = 0.0
+    jitter_sec: float = 0.0
+    # Delay between generated tokens (applies to plain responses as a whole)
+    token_delay_sec: float = 0.0
+    # Characters per simulated token
+    token_chars: int = 4
+    error_rate: float = 0.0
+    # Returns the decision for a prompt; defaults to DEFAULT_DECISION
+    decide: Callable[[str], dict[str, Any]] | None = None
+    seed: int | None = None
+    rng: random.Random = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self.rng = random.Random(self.seed)
+
+    def delay(self) -> float:
+        """Latency for one response, uniformly jittered around latency_sec."""
+        return max(0.0, self.latency_sec + self.rng.uniform(-self.jitter_sec, self.jitter_sec))
+
+    def fails(self) -> bool:
+        return self.rng.random() < self.error_rate
+
+    def decision(self, prompt: str) -> dict[str, Any]:
+        return self.decide(prompt) if self.decide else DEFAULT_DECISION
+
+    def tokens(self, text: str) -> list[str]:
+        """Split a completion into simulated tokens."""
+        return [text[i:i + self.token_chars] for i in range(0, len(text), self.token_chars)]
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    """Handles /v1/chat/completions (OpenAI) and /v1/messages (Anthropic)."""
+    protocol_version = "HTTP/1.1"
+    # Send headers and body in one segment; avoids Nagle/delayed-ACK stalls on keep-alive
+    wbufsize = 64 * 1024
+    disable_nagle_algorithm = True
+    server: "StubLLMServer"
+
+    def setup(self) -> None:
+        super().setup()
+        self.server.record_connection()
+
+    def finish(self) -> None:
+        # Clients may hang up mid-stream; that is not an error for a stub
+        try:
+            super().finish()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def do_POST(self) -> None:  # noqa: N802
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        path = self.path.rstrip("/")
+        behavior = self.server.behavior
+        self.server.record_request()
+
+        time.sleep(behavior.delay())
+
+        if path.endswith("/chat/completions"):
+            prompt = request.get("messages", [{}])[-1].get("content", "")
+            if behavior.fails():
+                self._send(500, {"error": {"message": "stub failure", "type": "server_error", "code": None}})
+                return
+            text = json.dumps(behavior.decision(prompt))
+            if request.get("stream"):
+                self._stream(self._openai_events(request, behavior.tokens(text)), behavior.token_delay_sec)
+            else:
+                time.sleep(behavior.token_delay_sec * len(behavior.tokens(text)))
+                self._send(200, self._openai_response(request, text))
+        elif path.endswith("/messages"):
+            prompt = request.get("messages", [{}])[-1].get("content", "")
+            if behavior.fails():
+                self._send(529, {"type": "error", "error": {"type": "overloaded_error", "message": "stub failure"}})
+                return
+            text = json.dumps(behavior.decision(prompt))
+            if request.get("stream"):
+                self._stream(self._anthropic_events(request, behavior.tokens(text)), behavior.token_delay_sec)
+            else:
+                time.sleep(behavior.token_delay_sec * len(behavior.tokens(text)))
+                self._send(200, self._anthropic_response(request, text))
+        else:
+            self._send(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    @staticmethod
+    def _openai_response(request: dict[str, Any], text: str) -> dict[str, Any]:
+        return {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": text},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+        }
+
+    @staticmethod
+    def _anthropic_response(request: dict[str, Any], text: str) -> dict[str, Any]:
+        return {
+            "id": "msg_stub",
+            "type": "message",
+            "role": "assistant",
+            "model": request.get("model", "stub"),
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": {"input_tokens": 1, "output_tokens": 1}
+        }
+
+    @staticmethod
+    def _openai_events(request: dict[str, Any], tokens: list[str]) -> list[tuple[str | None, dict[str, Any] | str]]:
+        def chunk(delta: dict[str, Any], finish_reason: str | None = None) -> dict[str, Any]:
+            return {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": request.get("model", "stub"),
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            }
+
+        events: list[tuple[str | None, dict[str, Any] | str]] = [(None, chunk({"role": "assistant", "content": ""}))]
+        events += [(None, chunk({"content": token})) for token in tokens]
+        events += [(None, chunk({}, "stop")), (None, "[DONE]")]
+        return events
+
+    @staticmethod
+    def _anthropic_events(request: dict[str, Any], tokens: list[str]) -> list[tuple[str | None, dict[str, Any] | str]]:
+        message = {
+            "id": "msg_stub", "type": "message", "role": "assistant", "model": request.get("model", "stub"),
+            "content": [], "stop_reason": None, "stop_sequence": None,
+            "usage": {"input_tokens": 1, "output_tokens": 1}
+        }
+        events: list[tuple[str | None, dict[str, Any] | str]] = [
+            ("message_start", {"type": "message_start", "message": message}),
+            ("content_block_start", {"type": "content_block_start", "index": 0,
+                                     "content_block": {"type": "text", "text": ""}}),
+        ]
+        events += [("content_block_delta", {"type": "content_block_delta", "index": 0,
+                                            "delta": {"type": "text_delta", "text": token}}) for token in tokens]
+        events += [
+            ("content_block_stop", {"type": "content_block_stop", "index": 0}),
+            ("message_delta", {"type": "message_delta", "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                               "usage": {"output_tokens": len(tokens)}}),
+            ("message_stop", {"type": "message_stop"}),
+        ]
+        return events
+
+    def _stream(self, events: list[tuple[str | None, dict[str, Any] | str]], token_delay_sec: float) -> None:
+        """Send server-sent events with chunked transfer encoding, one token per delay."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        try:
+            for i, (event, data) in enumerate(events):
+                if i and token_delay_sec:
+                    time.sleep(token_delay_sec)
+                payload = data if isinstance(data, str) else json.dumps(data)
+                frame = (f"event: {event}\n" if event else "") + f"data: {payload}\n\n"
+                encoded = frame.encode("utf-8")
+                self.wfile.write(f"{len(encoded):x}\r\n".encode("ascii") + encoded + b"\r\n")
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+    def _send(self, status: int, payload: dict[str, Any]) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+
+class StubLLMServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP server speaking enough of the OpenAI and Anthropic APIs.
+
+    Features:
+    - Canned or computed JSON routing decisions
+    - Configurable latency, jitter and error rate
+    - Request and connection counters
+    """
+    daemon_threads = True
+    # Load tests open many connections at once; the default backlog of 5 drops SYNs
+    request_queue_size = 1024
+
+    def __init__(self, behavior: StubBehavior | None = None, host: str = "127.0.0.1", port: int = 0) -> None:
+        super().__init__((host, port), StubLLMHandler)
+        self.behavior = behavior or StubBehavior()
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        """Anthropic-style base URL (the SDK appends /v1/messages)."""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def openai_base_url(self) -> str:
+        """OpenAI-style base URL (the SDK appends /chat/completions)."""
+        return f"{self.base_url}/v1"
+
+    def record_request(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def record_connection(self) -> None:
+        with self._lock:
+            self.connections += 1
+
+    def start(self) -> "StubLLMServer":
+        """Serve on a daemon thread."""
+        self._thread = threading.Thread(target=self.serve_forever, name="llm-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and release the socket."""
+        self.shutdown()
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+
+def main() -> None:
+    """Run the stub provider in the foreground."""
+    parser = argparse.ArgumentParser(description="Local stand-in LLM provider")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Mean response latency")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Uniform +/- jitter")
+    parser.add_argument("--token-ms", type=float, default=0.0, help="Delay between generated tokens")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests that fail")
+    parser.add_argument("--agent", default=DEFAULT_DECISION["agent"], help="Agent in the canned decision")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    decision = {**DEFAULT_DECISION, "agent": args.agent.upper()}
+    behavior = StubBehavior(
+        latency_sec=args.latency_ms / 1000,
+        jitter_sec=args.jitter_ms / 1000,
+        token_delay_sec=args.token_ms / 1000,
+        error_rate=args.error_rate,
+        decide=lambda prompt: decision,
+        seed=args.seed
+    )
+    server = StubLLMServer(behavior, args.host, args.port)
+    print(f"Stub LLM provider on {server.base_url}")
+    print(f"  OPENAI_BASE_URL={server.openai_base_url}")
+    print(f"  ANTHROPIC_BASE_URL={server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
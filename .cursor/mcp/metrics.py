@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Runtime metrics for the MCP server.
+Per-tool call counts, error counts and latency histograms, stage timings
+(embedding, vector store, serialization) and cache hit rates, with an
+optional Prometheus text-format file export.
+"""
+
+import bisect
+import os
+import sys
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any
+
+# Histogram bucket upper bounds in seconds (+Inf bucket is implicit)
+DEFAULT_BUCKETS: tuple[float, ...] = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+
+
+class LatencyHistogram:
+    """
+    Fixed-bucket latency histogram.
+
+    Observations are O(log buckets) and memory is constant; percentiles are
+    estimated by linear interpolation inside the matching bucket.
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        """Record one observation."""
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q: float) -> float:
+        """Estimate the q-th quantile (0.0-1.0) in seconds."""
+        if self.count == 0:
+            return 0.0
+
+        rank = q * self.count
+        cumulative = 0
+        for i, bucket_count in enumerate(self.counts):
+            if bucket_count == 0:
+                continue
+            if cumulative + bucket_count >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                # Clamp interpolation to the observed range
+                lower = max(lower, self.min)
+                upper = min(upper, self.max)
+                fraction = (rank - cumulative) / bucket_count
+                return lower + (upper - lower) * fraction
+            cumulative += bucket_count
+
+        return self.max
+
+    def summary(self) -> dict[str, Any]:
+        """Summary with count, mean and p50/p95/p99 in milliseconds."""
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "p50_ms": round(self.percentile(0.50) * 1000, 3),
+            "p95_ms": round(self.percentile(0.95) * 1000, 3),
+            "p99_ms": round(self.percentile(0.99) * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+
+class MetricsRegistry:
+    """
+    Thread-safe registry of server metrics.
+
+    Features:
+    - Per-tool calls, errors and latency histograms
+    - Named stage timers (embed, store, serialize, ...)
+    - Cache hit/miss counters
+    - Prometheus text exposition
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self.tool_calls: dict[str, int] = {}
+        self.tool_errors: dict[str, int] = {}
+        self.tool_latency: dict[str, LatencyHistogram] = {}
+        self.stage_latency: dict[str, LatencyHistogram] = {}
+        self.cache_hits: dict[str, int] = {}
+        self.cache_misses: dict[str, int] = {}
+        self.counters: dict[str, int] = {}
+
+    def record_call(self, tool: str, seconds: float, error: bool = False) -> None:
+        """Record a finished tool call."""
+        with self._lock:
+            self.tool_calls[tool] = self.tool_calls.get(tool, 0) + 1
+            if error:
+                self.tool_errors[tool] = self.tool_errors.get(tool, 0) + 1
+            self.tool_latency.setdefault(tool, LatencyHistogram()).observe(seconds)
+
+    def record_stage(self, stage: str, seconds: float) -> None:
+        """Record time spent in a named stage."""
+        with self._lock:
+            self.stage_latency.setdefault(stage, LatencyHistogram()).observe(seconds)
+
+    @contextmanager
+    def timer(self, stage: str) -> Iterator[None]:
+        """Time the enclosed block as `stage`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_stage(stage, time.perf_counter() - start)
+
+    def record_cache(self, cache: str, hit: bool) -> None:
+        """Record a cache lookup outcome."""
+        with self._lock:
+            target = self.cache_hits if hit else self.cache_misses
+            target[cache] = target.get(cache, 0) + 1
+
+    def increment(self, name: str, value: int = 1) -> None:
+        """Increment a free-form counter."""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def reset(self) -> None:
+        """Clear all recorded metrics."""
+        with self._lock:
+            self.started_at = time.time()
+            for table in (self.tool_calls, self.tool_errors, self.tool_latency, self.stage_latency,
+                          self.cache_hits, self.cache_misses, self.counters):
+                table.clear()
+
+    def snapshot(self) -> dict[str, Any]:
+        """JSON-serializable view of all metrics."""
+        with self._lock:
+            tools = {}
+            for tool, histogram in self.tool_latency.items():
+                calls = self.tool_calls.get(tool, 0)
+                errors = self.tool_errors.get(tool, 0)
+                tools[tool] = {
+                    "calls": calls,
+                    "errors": errors,
+                    "error_rate": round(errors / calls, 4) if calls else 0.0,
+                    "latency": histogram.summary(),
+                }
+
+            caches = {}
+            for cache in sorted(set(self.cache_hits) | set(self.cache_misses)):
+                hits = self.cache_hits.get(cache, 0)
+                misses = self.cache_misses.get(cache, 0)
+                caches[cache] = {
+                    "hits": hits,
+                    "misses": misses,
+                    "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+                }
+
+            return {
+                "uptime_sec": round(time.time() - self.started_at, 3),
+                "tools": tools,
+                "stages": {stage: h.summary() for stage, h in self.stage_latency.items()},
+                "caches": caches,
+                "counters": dict(self.counters),
+            }
+
+    def to_prometheus(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        lines: list[str] = []
+        with self._lock:
+            lines += ["# HELP mcp_tool_calls_total Tool calls handled.", "# TYPE mcp_tool_calls_total counter"]
+            for tool, value in sorted(self.tool_calls.items()):
+                lines.append(f'mcp_tool_calls_total{{tool="{_escape(tool)}"}} {value}')
+
+            lines += ["# HELP mcp_tool_errors_total Tool calls that raised.", "# TYPE mcp_tool_errors_total counter"]
+            for tool, value in sorted(self.tool_errors.items()):
+                lines.append(f'mcp_tool_errors_total{{tool="{_escape(tool)}"}} {value}')
+
+            lines += _histogram_lines("mcp_tool_latency_seconds", "Tool call latency.", "tool", self.tool_latency)
+            lines += _histogram_lines("mcp_stage_latency_seconds", "Latency of internal stages.", "stage", self.stage_latency)
+
+            lines += ["# HELP mcp_cache_hits_total Cache hits.", "# TYPE mcp_cache_hits_total counter"]
+            for cache, value in sorted(self.cache_hits.items()):
+                lines.append(f'mcp_cache_hits_total{{cache="{_escape(cache)}"}} {value}')
+            lines += ["# HELP mcp_cache_misses_total Cache misses.", "# TYPE mcp_cache_misses_total counter"]
+            for cache, value in sorted(self.cache_misses.items()):
+                lines.append(f'mcp_cache_misses_total{{cache="{_escape(cache)}"}} {value}')
+
+            lines += ["# HELP mcp_events_total Miscellaneous server events.", "# TYPE mcp_events_total counter"]
+            for name, value in sorted(self.counters.items()):
+                lines.append(f'mcp_events_total{{event="{_escape(name)}"}} {value}')
+
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    """Escape a Prometheus label value."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _histogram_lines(name: str, help_text: str, label: str,
+                     histograms: dict[str, LatencyHistogram]) -> list[str]:
+    """Render a labelled family of histograms."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for key, histogram in sorted(histograms.items()):
+        cumulative = 0
+        for bound, bucket_count in zip(histogram.buckets, histogram.counts, strict=False):
+            cumulative += bucket_count
+            lines.append(f'{name}_bucket{{{label}="{_escape(key)}",le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{label}="{_escape(key)}",le="+Inf"}} {histogram.count}')
+        lines.append(f'{name}_sum{{{label}="{_escape(key)}"}} {histogram.total}')
+        lines.append(f'{name}_count{{{label}="{_escape(key)}"}} {histogram.count}')
+    return lines
+
+
+class PrometheusFileExporter:
+    """Periodically rewrites a Prometheus text file (for node_exporter's textfile collector)."""
+
+    def __init__(self, registry: MetricsRegistry, path: str | Path, interval_sec: float = 15.0) -> None:
+        """
+        Initialize exporter.
+
+        Args:
+            registry: Metrics registry to export
+            path: Output file path
+            interval_sec: Seconds between rewrites
+        """
+        self.registry = registry
+        self.path = Path(path)
+        self.interval_sec = interval_sec
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def write(self) -> None:
+        """Write the current metrics atomically."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp_path.write_text(self.registry.to_prometheus(), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+
+    def start(self) -> "PrometheusFileExporter":
+        """Start the background export thread."""
+        if self._thread is None:
+            self._stop.clear()  # Restartable after stop()
+            self._thread = threading.Thread(target=self._loop, name="metrics-export", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop exporting after a final write."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval_sec)
+            self._thread = None
+        self._safe_write()
+
+    def _safe_write(self) -> None:
+        try:
+            self.write()
+        except Exception as e:
+            print(f"Warning: Failed to export metrics to {self.path}: {e}", file=sys.stderr)
+
+    def _loop(self) -> None:
+        self._safe_write()
+        while not self._stop.wait(self.interval_sec):
+            self._safe_write()
+
+
+# Global metrics registry instance
+metrics_registry = MetricsRegistry()
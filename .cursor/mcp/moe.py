@@ -1,28 +1,474 @@
+import asyncio
+import dataclasses
+import functools
+import os
+import sys
+import threading
+import time
+import numpy as np
 import yaml
-import re
 import random
-from typing import Dict, List, Any, Optional
+from typing import Awaitable, Callable, Coroutine, Dict, List, Any, Optional, Tuple
 from pathlib import Path
 
+from mcp.background import background_loop
+from mcp.consistency import Sample, SelfConsistency
+from mcp.expert_cache import ExpertResultCache, expert_cache_key, expert_fingerprint
+from mcp.expert_embeddings import Embedder, ExpertEmbeddingIndex, ExpertEmbeddings
+from mcp.metrics import metrics_registry
+from mcp.moe_rules import CompiledRule, cached_condition, compile_rules
+from mcp.workspace_index import LANGUAGES, WorkspaceIndex, WorkspaceSnapshot, context_paths
+
+
+# Runs one expert: (expert config, goal, ranking score, temperature) -> {'confidence', 'response', ...}
+ExpertRunner = Callable[[Dict[str, Any], str, float, float], Awaitable[Dict[str, Any]]]
+
+
+async def simulate_expert(expert: Dict[str, Any], goal: str, score: float, temperature: float,
+                          rng: Optional[random.Random] = None) -> Dict[str, Any]:
+    """Placeholder expert: the ranking score with some variance (drawn from rng, else the global RNG)."""
+    return {
+        'confidence': score + (rng or random).uniform(-0.1, 0.1),  # Add some variance
+        'response': f"Expert {expert['id']} analysis for: {goal}"
+    }
+
+
+def _run_blocking(coro: Coroutine[Any, Any, Any]) -> Any:
+    """
+    Run a coroutine to completion from sync code on the shared background loop.
+
+    Reusing the shared background_loop avoids creating an event loop (and,
+    inside a running loop, a worker thread) per call. Works from plain threads
+    and from other event loops; calling it from the background loop's own
+    thread raises RuntimeError (use the *_async methods there).
+    """
+    return background_loop.run(coro)
+
+
+class ExpertMatrix:
+    """
+    Expert scoring tables precomputed for vectorized ranking.
+
+    scores = flags @ feature_weights + strength_hits @ strength_weights + base,
+    where flags holds the boolean features of each goal and strength_hits marks
+    which strengths (the vocabulary) occur in each goal's keywords.
+    """
+
+    # (feature, expert field, required value, bonus)
+    FEATURE_BONUSES = [
+        ('requires_rag', 'tools', 'rag', 0.3),
+        ('safety_risk', 'strengths', 'secrets_scan', 0.3),
+        ('test_presence', 'strengths', 'tdd', 0.2),
+    ]
+    KEYWORD_BONUS = 0.2
+    BASE_SCORE = 0.1  # Minimum score
+
+    def __init__(self, experts: Dict[str, Dict[str, Any]]):
+        self.expert_ids = list(experts)
+        self.index = {expert_id: i for i, expert_id in enumerate(self.expert_ids)}
+        self.id_array = np.array(self.expert_ids, dtype=object)
+        self.feature_names = [name for name, _, _, _ in self.FEATURE_BONUSES]
+        self.vocabulary = np.array(sorted({s for e in experts.values() for s in e['strengths']}), dtype=str)
+
+        self.feature_weights = np.array([
+            [bonus if value in experts[expert_id][field] else 0.0 for expert_id in self.expert_ids]
+            for _, field, value, bonus in self.FEATURE_BONUSES
+        ]).reshape(len(self.FEATURE_BONUSES), len(self.expert_ids))
+        self.strength_weights = np.array([
+            [self.KEYWORD_BONUS * experts[expert_id]['strengths'].count(strength) for expert_id in self.expert_ids]
+            for strength in self.vocabulary
+        ]).reshape(len(self.vocabulary), len(self.expert_ids))
+
+    def score(self, features_list: List[Dict[str, Any]]) -> np.ndarray:
+        """Scores of every expert for every goal, shape (goals, experts), rounded to 6 places."""
+        flags = np.array([[bool(f.get(name)) for name in self.feature_names] for f in features_list],
+                         dtype=float).reshape(len(features_list), len(self.feature_names))
+        keywords = np.array([str(f.get('goal_keywords', '')) for f in features_list], dtype=str)
+        hits = (np.char.find(keywords[:, None], self.vocabulary[None, :]) >= 0).astype(float)
+
+        scores = flags @ self.feature_weights + hits @ self.strength_weights
+        return np.round(np.minimum(scores + self.BASE_SCORE, 1.0), 6)
+
+
+# (mtime_ns, size) of moe.yml, then of each expert prompt file (None if missing)
+Signature = Tuple[Optional[Tuple[int, int]], ...]
+
+
+def _file_signature(path: Path) -> Tuple[int, int]:
+    """(mtime_ns, size) of a file; changes whenever the file is rewritten."""
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _prompt_signature(prompt_paths: Tuple[Path, ...]) -> Signature:
+    signature: List[Optional[Tuple[int, int]]] = []
+    for path in prompt_paths:
+        try:
+            signature.append(_file_signature(path))
+        except OSError:
+            signature.append(None)
+    return tuple(signature)
+
+
+@dataclasses.dataclass(frozen=True)
+class MoEConfig:
+    """
+    One parsed and compiled version of moe.yml.
+
+    Never mutated after loading: a reload builds a new MoEConfig and the router
+    swaps its reference, so a route that already holds this one finishes with it.
+    """
+
+    version: int
+    signature: Signature  # moe.yml and prompt files when read
+    prompt_paths: Tuple[Path, ...]
+    loaded_at: float
+    config: Dict[str, Any]
+    router_config: Dict[str, Any]
+    experts: Dict[str, Dict[str, Any]]
+    routing_rules: List[Dict[str, Any]]
+    consistency: SelfConsistency
+    expert_matrix: ExpertMatrix
+    compiled_rules: List[CompiledRule]
+    # Hash of each expert's prompt, definition and sampling settings (expert result cache keys)
+    expert_fingerprints: Dict[str, str]
+    # Prompt embeddings for similarity preselection (built by the router when it has an embedder)
+    expert_embeddings: Optional[ExpertEmbeddings] = None
+
+    @classmethod
+    def load(cls, config_path: Path, version: int = 1, prompts_dir: Optional[Path] = None) -> 'MoEConfig':
+        """
+        Read, validate and compile a moe.yml file.
+
+        Args:
+            config_path: Path to moe.yml
+            version: Version number to stamp on the result
+            prompts_dir: Directory expert `prompt` paths are relative to
+                (defaults to prompts/ next to the rules directory)
+
+        Returns:
+            The compiled configuration
+
+        Raises:
+            OSError: If the file cannot be read
+            yaml.YAMLError: If the file is not valid YAML
+            KeyError / ValueError: If required sections are missing or a rule is malformed
+        """
+        # Stat before reading: a write landing in between shows up as a new signature next check
+        config_signature = _file_signature(config_path)
+        with open(config_path, 'r') as f:
+            config = (yaml.safe_load(f) or {})['moe']
+
+        router_config = config['router']
+        for key in ('top_k', 'early_stop_confidence'):
+            if key not in router_config:
+                raise KeyError(f"moe.router.{key} is required")
+        experts = {expert['id']: expert for expert in config['experts']}
+        routing_rules = config['routing_rules']
+        prompts_dir = prompts_dir or Path(config_path).resolve().parent.parent / 'prompts'
+        prompt_paths = tuple(prompts_dir / expert['prompt'] for expert in experts.values() if expert.get('prompt'))
+
+        return cls(
+            version=version,
+            signature=(config_signature,) + _prompt_signature(prompt_paths),
+            prompt_paths=prompt_paths,
+            loaded_at=time.time(),
+            config=config,
+            router_config=router_config,
+            experts=experts,
+            routing_rules=routing_rules,
+            # Each expert answer is a self-consistency vote over cisc_samples samples
+            consistency=SelfConsistency(
+                samples=int(router_config.get('cisc_samples', 1)),
+                temperature=float(router_config.get('cisc_temperature', 0.0)),
+                max_concurrency=router_config.get('cisc_concurrency')
+            ),
+            # Scoring tables for batch ranking
+            expert_matrix=ExpertMatrix(experts),
+            # Parse rule conditions once; malformed rules fail here with RuleSyntaxError
+            compiled_rules=compile_rules(
+                routing_rules,
+                known_features=router_config.get('features'),
+                known_experts=experts
+            ),
+            expert_fingerprints={
+                expert_id: expert_fingerprint(expert, prompts_dir, {
+                    key: router_config.get(key) for key in ('cisc_samples', 'cisc_temperature')
+                })
+                for expert_id, expert in experts.items()
+            }
+        )
+
+
+class MoEConfigWatcher:
+    """Polls moe.yml for changes and hot-reloads the router from a background thread."""
+
+    def __init__(self, router: 'MoERouter', interval_sec: float = 2.0) -> None:
+        """
+        Initialize watcher.
+
+        Args:
+            router: Router whose config file to watch
+            interval_sec: Seconds between checks
+        """
+        self.router = router
+        self.interval_sec = interval_sec
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> 'MoEConfigWatcher':
+        """Start the background watch thread."""
+        if self._thread is None:
+            self._stop.clear()  # Restartable after stop()
+            self._thread = threading.Thread(target=self._loop, name="moe-config-watch", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop watching."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval_sec)
+            self._thread = None
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval_sec):
+            try:
+                self.router.check_for_changes()
+            except Exception as e:
+                print(f"Warning: MoE config watch failed: {e}", file=sys.stderr)
+
 
 class MoERouter:
     """Mixture of Experts router with preselect→rank→run_experts→aggregate pipeline."""
 
-    def __init__(self, config_path: str):
-        """Initialize router with configuration from YAML file."""
-        with open(config_path, 'r') as f:
-            self.config = yaml.safe_load(f)['moe']
-
-        self.router_config = self.config['router']
-        self.experts = {expert['id']: expert for expert in self.config['experts']}
-        self.routing_rules = self.config['routing_rules']
-
-    def _extract_features(self, goal: str, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-        """Extract routing features from goal and context."""
+    def __init__(self, config_path: str, expert_runner: Optional[ExpertRunner] = None,
+                 embedder: Optional[Embedder] = None, prompts_dir: Optional[str] = None,
+                 seed: Optional[int] = None, workspace_index: Optional[WorkspaceIndex] = None):
+        """
+        Initialize router with configuration from YAML file.
+
+        Args:
+            config_path: Path to moe.yml
+            expert_runner: Coroutine that executes one expert (defaults to
+                simulate_expert drawing from this router's RNG)
+            embedder: Batch text embedder; enables similarity preselection against
+                the expert prompts (e.g. RAGServer.get_query_embeddings). Each route
+                embeds its goal once; a memoizing embedder only saves that call when
+                the identical goal text was embedded recently
+            prompts_dir: Directory expert `prompt` paths are relative to
+            seed: Seed for the router's RNG (defaults to router.seed in moe.yml;
+                unseeded if neither is set). Replaying the same goals in the same
+                order through a router with the same seed gives the same decisions.
+            workspace_index: Background-refreshed file index; supplies the file
+                features when the request names no paths
+        """
+        self.config_path = Path(config_path)
+        self.prompts_dir = Path(prompts_dir) if prompts_dir else None
+        self.embedder = embedder
+        self.workspace_index = workspace_index
+
+        # The first load must succeed; later reloads fall back to the active config
+        self._snapshot = MoEConfig.load(self.config_path, prompts_dir=self.prompts_dir)
+
+        self.seed = seed if seed is not None else self._snapshot.router_config.get('seed')
+        self.rng = random.Random(self.seed)
+        self.expert_runner = expert_runner or functools.partial(simulate_expert, rng=self.rng)
+        self._reload_lock = threading.Lock()
+        self._rejected_signature: Optional[Signature] = None
+        self.last_reload_error: Optional[str] = None
+
+        # Expert results memoized by (expert, prompt hash, normalized goal, features)
+        self.expert_cache = ExpertResultCache(*self._expert_cache_limits(self._snapshot))
+
+        # Prompt vectors are cached by text hash across reloads; built on first use
+        self.embedding_index = ExpertEmbeddingIndex(
+            embedder, self.prompts_dir or self.config_path.resolve().parent.parent / 'prompts'
+        ) if embedder is not None else None
+
+    @staticmethod
+    def _expert_cache_limits(snapshot: MoEConfig) -> Tuple[int, float]:
+        """(max_bytes, ttl_sec) for the expert result cache; caching is off unless configured."""
+        return (int(snapshot.router_config.get('expert_cache_max_bytes', 0)),
+                float(snapshot.router_config.get('expert_cache_ttl_sec', 600)))
+
+    @property
+    def snapshot(self) -> MoEConfig:
+        """The active configuration."""
+        return self._snapshot
+
+    @property
+    def config(self) -> Dict[str, Any]:
+        return self._snapshot.config
+
+    @property
+    def router_config(self) -> Dict[str, Any]:
+        return self._snapshot.router_config
+
+    @property
+    def experts(self) -> Dict[str, Dict[str, Any]]:
+        return self._snapshot.experts
+
+    @property
+    def routing_rules(self) -> List[Dict[str, Any]]:
+        return self._snapshot.routing_rules
+
+    @property
+    def expert_matrix(self) -> ExpertMatrix:
+        return self._snapshot.expert_matrix
+
+    @property
+    def compiled_rules(self) -> List[CompiledRule]:
+        return self._snapshot.compiled_rules
+
+    @property
+    def consistency(self) -> SelfConsistency:
+        return self._snapshot.consistency
+
+    @consistency.setter
+    def consistency(self, engine: SelfConsistency) -> None:
+        self._snapshot = dataclasses.replace(self._snapshot, consistency=engine)
+
+    def reload(self) -> bool:
+        """
+        Re-read moe.yml and swap it in if it loads cleanly.
+
+        Parsing and compiling happen before the swap, on the caller's thread;
+        routes already running keep the config they started with.
+
+        Returns:
+            True if the new config is active, False if the file was invalid and
+            the previous config was kept (see last_reload_error)
+        """
+        with self._reload_lock:
+            current = self._snapshot
+            try:
+                snapshot = MoEConfig.load(self.config_path, version=current.version + 1, prompts_dir=self.prompts_dir)
+            except Exception as e:
+                self.last_reload_error = f"{type(e).__name__}: {e}"
+                self._rejected_signature = self._current_signature(current)
+                metrics_registry.increment('moe.config_reload_errors')
+                print(f"Warning: Invalid MoE config {self.config_path}, keeping version {current.version}: "
+                      f"{self.last_reload_error}", file=sys.stderr, flush=True)
+                return False
+
+            # Re-embed changed prompts now rather than on the next request
+            embeddings = self._build_embeddings(snapshot)
+            if embeddings is not None:
+                snapshot = dataclasses.replace(snapshot, expert_embeddings=embeddings)
+
+            self._snapshot = snapshot
+            # Entries of changed experts stop matching (new fingerprint) and age out
+            self.expert_cache.resize(*self._expert_cache_limits(snapshot))
+            self._rejected_signature = None
+            self.last_reload_error = None
+            metrics_registry.increment('moe.config_reloads')
+            print(f"MOE_CONFIG: reloaded {self.config_path} as version {snapshot.version}",
+                  file=sys.stderr, flush=True)
+            return True
+
+    def _current_signature(self, snapshot: MoEConfig) -> Optional[Signature]:
+        """Signature of the files on disk now; None if moe.yml cannot be read."""
+        try:
+            return (_file_signature(self.config_path),) + _prompt_signature(snapshot.prompt_paths)
+        except OSError:
+            return None
+
+    def check_for_changes(self) -> bool:
+        """
+        Reload if moe.yml or an expert prompt file changed since they were last read.
+
+        A file that was already rejected is not retried (or reported again)
+        until it changes once more.
+
+        Returns:
+            True if a new config was swapped in
+        """
+        snapshot = self._snapshot
+        signature = self._current_signature(snapshot)
+        if signature is None:
+            return False  # Mid-save or removed: keep the active config
+        if signature in (snapshot.signature, self._rejected_signature):
+            return False
+        return self.reload()
+
+    def _build_embeddings(self, snapshot: MoEConfig) -> Optional[ExpertEmbeddings]:
+        """Embed a config's experts; None (rules-only preselection) without an embedder or on failure."""
+        if self.embedding_index is None:
+            return None
+        try:
+            return self.embedding_index.build(snapshot.experts)
+        except Exception as e:
+            metrics_registry.increment('moe.embedding_errors')
+            print(f"Warning: Expert prompt embedding failed, using routing rules only: {e}",
+                  file=sys.stderr, flush=True)
+            return None
+
+    def _expert_embeddings(self, snapshot: MoEConfig) -> Optional[ExpertEmbeddings]:
+        """Prompt embeddings of a config, built and stored on the active config on first use."""
+        if snapshot.expert_embeddings is not None or self.embedding_index is None:
+            return snapshot.expert_embeddings
+        embeddings = self._build_embeddings(snapshot)
+        if embeddings is not None:
+            with self._reload_lock:
+                if self._snapshot.version == snapshot.version and self._snapshot.expert_embeddings is None:
+                    self._snapshot = dataclasses.replace(self._snapshot, expert_embeddings=embeddings)
+        return embeddings
+
+    async def _similar_experts(self, goals: List[str], snapshot: MoEConfig) -> List[List[Tuple[str, float]]]:
+        """
+        Experts whose prompt embedding is closest to each goal.
+
+        Costs one embedder call per route (one per batch for route_tasks), run
+        off the event loop: a model forward pass for any goal the embedder has
+        not memoized, which for fresh goals is the usual case. Returns empty
+        lists without an embedder or if embedding fails, leaving preselection
+        to the rules.
+        """
+        if self.embedder is None or not goals:
+            return [[] for _ in goals]
+        top_n = int(snapshot.router_config.get('embedding_top_n', 2))
+        min_similarity = float(snapshot.router_config.get('embedding_min_similarity', 0.35))
+
+        def select() -> List[List[Tuple[str, float]]]:
+            embeddings = self._expert_embeddings(snapshot)
+            if embeddings is None:
+                return [[] for _ in goals]
+            return embeddings.select(self.embedder(goals), top_n, min_similarity)
+
+        try:
+            return await asyncio.to_thread(select)
+        except Exception as e:
+            metrics_registry.increment('moe.embedding_errors')
+            print(f"Warning: Goal embedding failed, using routing rules only: {e}", file=sys.stderr, flush=True)
+            return [[] for _ in goals]
+
+    def watch(self, interval_sec: float = 2.0) -> MoEConfigWatcher:
+        """Start a background watcher that hot-reloads this router."""
+        return MoEConfigWatcher(self, interval_sec).start()
+
+    def _extract_features(self, goal: str, context: Optional[Dict[str, Any]] = None,
+                          snapshot: Optional[MoEConfig] = None) -> Dict[str, Any]:
+        """
+        Extract routing features from goal and context.
+
+        File features come from the paths in context (open_files, paths, files,
+        path, file), falling back to the whole workspace. Both are read from the
+        workspace index snapshot, so no request walks the tree.
+        """
+        snapshot = snapshot or self._snapshot
         features = {}
 
-        # File extension detection (simplified - would need actual file context)
-        features['file_ext'] = 'py'  # Default assumption
+        workspace = (self.workspace_index.snapshot if self.workspace_index is not None
+                     else WorkspaceSnapshot(self.config_path.parent))
+        files = workspace.describe(context_paths(context))
+        scope = files if files.primary_extension() else workspace.workspace
+
+        # Dominant code extension of the named files, else of the workspace
+        features['file_ext'] = scope.primary_extension() or snapshot.router_config.get('default_file_ext', 'py')
+        features['language'] = LANGUAGES.get(features['file_ext'], '')
+        features['languages'] = ','.join(scope.languages())
+        features['workspace_has_tests'] = workspace.workspace.test_files > 0
 
         # Goal keyword analysis
         goal_lower = goal.lower()
@@ -34,105 +480,194 @@ class MoERouter:
         # Safety risk assessment
         features['safety_risk'] = any(word in goal_lower for word in ['security', 'auth', 'secret', 'encrypt', 'dangerous'])
 
-        # Test presence (simplified)
-        features['test_presence'] = any(word in goal_lower for word in ['test', 'spec', 'assert', 'tdd'])
+        # Test presence: the goal talks about tests or the named files include tests
+        features['test_presence'] = (any(word in goal_lower for word in ['test', 'spec', 'assert', 'tdd'])
+                                     or files.test_files > 0)
 
         return features
 
-    def _preselect_experts(self, features: Dict[str, Any]) -> List[str]:
-        """Preselect experts based on routing rules."""
-        selected = set()
+    def _preselect_experts(self, features: Dict[str, Any], snapshot: Optional[MoEConfig] = None,
+                           similar: Optional[List[Tuple[str, float]]] = None) -> List[str]:
+        """Preselect experts based on routing rules, plus the experts most similar to the goal."""
+        snapshot = snapshot or self._snapshot
+        selected: Dict[str, None] = {}
 
-        for rule in self.routing_rules:
-            condition = rule['if']
-            pick_list = rule['pick']
+        for rule in snapshot.compiled_rules:
+            if rule.matches(features):
+                selected.update(dict.fromkeys(rule.pick))
 
-            # Simple condition evaluation (would need more sophisticated parser in production)
-            if self._evaluate_condition(condition, features):
-                selected.update(pick_list)
+        # Rule picks keep their order; similarity picks join after them
+        selected.update(dict.fromkeys(expert_id for expert_id, _ in similar or []))
 
         return list(selected) if selected else ['coder']  # Default fallback
 
     def _evaluate_condition(self, condition: str, features: Dict[str, Any]) -> bool:
-        """Simple condition evaluator for routing rules."""
-        # Handle regex matches
-        regex_match = re.search(r'(\w+)\s*~=\s*/([^/]+)/i?', condition)
-        if regex_match:
-            var_name, pattern = regex_match.groups()
-            if var_name in features:
-                return bool(re.search(pattern, features[var_name], re.IGNORECASE))
-
-        # Handle equality
-        if '==' in condition:
-            var_name, value = condition.split('==')
-            var_name = var_name.strip()
-            value = value.strip().strip("'\"")
-            return str(features.get(var_name, '')).lower() == value.lower()
-
-        # Handle array membership
-        if ' in ' in condition:
-            var_name, values_str = condition.split(' in ')
-            var_name = var_name.strip()
-            values_str = values_str.strip()
-            if values_str.startswith('[') and values_str.endswith(']'):
-                values = [v.strip().strip("'\"") for v in values_str[1:-1].split(',')]
-                return features.get(var_name, '') in values
-
-        # Handle keyword matching (simplified)
-        if 'goal_keywords' in condition and '~=' in condition:
-            return self._evaluate_condition(condition.replace('goal_keywords', 'goal_keywords'), features)
-
-        return False
-
-    def _rank_experts(self, candidates: List[str], features: Dict[str, Any]) -> List[tuple[str, float]]:
+        """Evaluate a rule condition (compiled once per distinct string)."""
+        return cached_condition(condition)(features)
+
+    def _rank_experts(self, candidates: List[str], features: Dict[str, Any],
+                      snapshot: Optional[MoEConfig] = None) -> List[tuple[str, float]]:
         """Rank experts by relevance score."""
+        snapshot = snapshot or self._snapshot
         ranked = []
         for expert_id in candidates:
-            if expert_id not in self.experts:
+            if expert_id not in snapshot.experts:
                 continue
 
-            expert = self.experts[expert_id]
+            expert = snapshot.experts[expert_id]
             score = 0.0
 
             # Feature matching scoring
-            if features.get('requires_rag') and 'rag' in expert['tools']:
-                score += 0.3
-            if features.get('safety_risk') and 'secrets_scan' in expert['strengths']:
-                score += 0.3
-            if features.get('test_presence') and 'tdd' in expert['strengths']:
-                score += 0.2
+            for feature, field, value, bonus in ExpertMatrix.FEATURE_BONUSES:
+                if features.get(feature) and value in expert[field]:
+                    score += bonus
 
             # Keyword relevance
             goal_keywords = features.get('goal_keywords', '')
             for strength in expert['strengths']:
                 if strength in goal_keywords:
-                    score += 0.2
+                    score += ExpertMatrix.KEYWORD_BONUS
 
-            ranked.append((expert_id, min(score + 0.1, 1.0)))  # Minimum 0.1 score
+            # Rounded so the batch path (different summation order) ties identically
+            ranked.append((expert_id, round(min(score + ExpertMatrix.BASE_SCORE, 1.0), 6)))
 
         # Sort by score descending, take top_k
         ranked.sort(key=lambda x: x[1], reverse=True)
-        return ranked[:self.router_config['top_k']]
-
-    def _run_experts(self, ranked_experts: List[tuple[str, float]], goal: str) -> List[Dict[str, Any]]:
-        """Simulate running experts (placeholder for actual expert execution)."""
-        results = []
-        for expert_id, confidence in ranked_experts:
-            # Simulate expert response with varying confidence
-            result = {
-                'expert_id': expert_id,
-                'confidence': confidence + random.uniform(-0.1, 0.1),  # Add some variance
-                'response': f"Expert {expert_id} analysis for: {goal}",
-                'tools_used': self.experts[expert_id]['tools'],
-                'strengths_applied': self.experts[expert_id]['strengths']
-            }
-            results.append(result)
-
-            # Early stopping if confidence is high enough
-            if result['confidence'] >= self.router_config['early_stop_confidence']:
-                break
-
-        return results
+        return ranked[:snapshot.router_config['top_k']]
+
+    def _rank_experts_batch(self, candidates_list: List[List[str]], features_list: List[Dict[str, Any]],
+                            snapshot: Optional[MoEConfig] = None) -> List[List[tuple[str, float]]]:
+        """
+        Rank experts for many goals with one matrix operation.
+
+        Gives the same top_k as _rank_experts for each goal, including the
+        tie order (candidate order).
+        """
+        if not features_list:
+            return []
+        snapshot = snapshot or self._snapshot
+        matrix = snapshot.expert_matrix
+        scores = matrix.score(features_list)
+
+        # Position of each expert in the goal's candidate list; inf = not a candidate
+        rows: List[int] = []
+        columns: List[int] = []
+        ranks: List[int] = []
+        for row, candidates in enumerate(candidates_list):
+            for position, expert_id in enumerate(dict.fromkeys(candidates)):
+                column = matrix.index.get(expert_id)
+                if column is not None:
+                    rows.append(row)
+                    columns.append(column)
+                    ranks.append(position)
+        positions = np.full(scores.shape, np.inf)
+        positions[rows, columns] = ranks
+
+        # Sort by score descending, then candidate order; non-candidates last
+        sort_scores = np.where(np.isfinite(positions), -scores, np.inf)
+        top = np.lexsort((positions, sort_scores), axis=-1)[:, :snapshot.router_config['top_k']]
+
+        top_ids = matrix.id_array[top].tolist()
+        top_scores = np.take_along_axis(scores, top, axis=1).tolist()
+        top_valid = np.isfinite(np.take_along_axis(positions, top, axis=1)).tolist()
+        return [
+            [(expert_id, score) for expert_id, score, valid in zip(ids, row_scores, valid_row) if valid]
+            for ids, row_scores, valid_row in zip(top_ids, top_scores, top_valid)
+        ]
+
+    async def _run_expert(self, expert_id: str, score: float, goal: str,
+                          snapshot: Optional[MoEConfig] = None,
+                          features: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Run one expert (a self-consistency vote over its samples) and shape it for _aggregate_results.
+
+        Results are memoized: the same expert asked the same goal with the same
+        features under the same prompt is answered from the cache ('cached': True).
+        """
+        snapshot = snapshot or self._snapshot
+        expert = snapshot.experts[expert_id]
+
+        key = None
+        if self.expert_cache.enabled:
+            key = expert_cache_key(expert_id, snapshot.expert_fingerprints[expert_id], goal, features or {},
+                                   snapshot.router_config.get('features', []))
+            cached = self.expert_cache.get(key)
+            metrics_registry.record_cache('moe_expert', cached is not None)
+            if cached is not None:
+                return {**cached, 'cached': True}
+
+        async def sample(index: int, temperature: float) -> Sample:
+            output = await self.expert_runner(expert, goal, score, temperature)
+            return Sample(output.get('response', ''), output['confidence'])
+
+        vote = await snapshot.consistency.run(sample)
+        if vote.samples_failed == vote.samples_drawn and vote.last_error is not None:
+            raise vote.last_error
+
+        result = {
+            'expert_id': expert_id,
+            # Abstaining (tied vote) experts keep their slot but carry no weight
+            'confidence': vote.mean_answer_confidence,
+            'response': vote.answer or '',
+            'tools_used': expert['tools'],
+            'strengths_applied': expert['strengths'],
+            'consistency': vote.to_dict()
+        }
+        if key is not None:
+            self.expert_cache.put(key, result)
+        return {**result, 'cached': False}
+
+    async def _run_experts(self, ranked_experts: List[tuple[str, float]], goal: str,
+                           snapshot: Optional[MoEConfig] = None,
+                           features: Optional[Dict[str, Any]] = None) -> Tuple[List[Dict[str, Any]], Dict[str, str]]:
+        """
+        Run the ranked experts concurrently.
+
+        Each expert gets expert_timeout_sec. As soon as a finished expert reaches
+        early_stop_confidence the others are cancelled.
+
+        Returns:
+            Results of the experts that finished, in rank order, and
+            {expert_id: 'cancelled' | 'timeout' | 'error: ...'} for the rest
+        """
+        snapshot = snapshot or self._snapshot
+        early_stop = snapshot.router_config['early_stop_confidence']
+        timeout = snapshot.router_config.get('expert_timeout_sec')
+
+        tasks = {
+            asyncio.ensure_future(asyncio.wait_for(
+                self._run_expert(expert_id, score, goal, snapshot, features), timeout)): expert_id
+            for expert_id, score in ranked_experts
+        }
+        results: Dict[str, Dict[str, Any]] = {}
+        skipped: Dict[str, str] = {}
+        pending = set(tasks)
+
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    expert_id = tasks[task]
+                    error = task.exception()
+                    if error is None:
+                        results[expert_id] = task.result()
+                    elif isinstance(error, asyncio.TimeoutError):
+                        skipped[expert_id] = 'timeout'
+                    else:
+                        skipped[expert_id] = f"error: {error}"
+
+                # Early stopping if confidence is high enough
+                if any(result['confidence'] >= early_stop for result in results.values()):
+                    break
+        finally:
+            for task in pending:
+                task.cancel()
+                skipped[tasks[task]] = 'cancelled'
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+        ordered = [results[expert_id] for expert_id, _ in ranked_experts if expert_id in results]
+        return ordered, skipped
 
     def _aggregate_results(self, expert_results: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Aggregate expert results using confidence-weighted voting."""
@@ -156,22 +691,80 @@ class MoERouter:
             'vote_distribution': vote_distribution,
             'winning_approach': winning_strength[0],
             'final_confidence': winning_strength[1],
+            'cached_experts': [r['expert_id'] for r in expert_results if r.get('cached')],
             'expert_results': expert_results
         }
 
     def route_task(self, goal: str, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Blocking wrapper around route_task_async."""
+        return _run_blocking(self.route_task_async(goal, context))
+
+    def route_tasks(self, goals: List[str],
+                    contexts: Optional[List[Optional[Dict[str, Any]]]] = None) -> List[Dict[str, Any]]:
+        """Blocking wrapper around route_tasks_async."""
+        return _run_blocking(self.route_tasks_async(goals, contexts))
+
+    async def route_tasks_async(self, goals: List[str],
+                                contexts: Optional[List[Optional[Dict[str, Any]]]] = None) -> List[Dict[str, Any]]:
+        """
+        Route many goals: rank them all in one matrix operation, then run each goal's experts concurrently.
+
+        Args:
+            goals: Goal descriptions
+            contexts: Optional context per goal (same length as goals)
+
+        Returns:
+            One route_task result per goal, in input order
+        """
+        if contexts is None:
+            contexts = [None] * len(goals)
+        if len(contexts) != len(goals):
+            raise ValueError(f"Got {len(contexts)} contexts for {len(goals)} goals")
+
+        # The whole batch runs against one config version
+        snapshot = self._snapshot
+        features_list = [self._extract_features(goal, context, snapshot)
+                         for goal, context in zip(goals, contexts)]
+        similar_list = await self._similar_experts(goals, snapshot)
+        candidates_list = [self._preselect_experts(features, snapshot, similar)
+                           for features, similar in zip(features_list, similar_list)]
+        ranked_list = self._rank_experts_batch(candidates_list, features_list, snapshot)
+
+        runs = await asyncio.gather(*(self._run_experts(ranked, goal, snapshot, features)
+                                      for ranked, goal, features in zip(ranked_list, goals, features_list)))
+
+        return [
+            {
+                'goal': goal,
+                'features': features,
+                'candidates': candidates,
+                'similar_experts': similar,
+                'ranked_experts': ranked,
+                'skipped_experts': skipped,
+                'config_version': snapshot.version,
+                **self._aggregate_results(expert_results)
+            }
+            for goal, features, similar, candidates, ranked, (expert_results, skipped)
+            in zip(goals, features_list, similar_list, candidates_list, ranked_list, runs)
+        ]
+
+    async def route_task_async(self, goal: str, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """Main routing pipeline: preselect → rank → run_experts → aggregate."""
+        # Pin the config: a hot reload mid-route does not affect this request
+        snapshot = self._snapshot
+
         # Extract features
-        features = self._extract_features(goal, context)
+        features = self._extract_features(goal, context, snapshot)
 
-        # Preselect candidates
-        candidates = self._preselect_experts(features)
+        # Preselect candidates: routing rules plus prompt-embedding similarity
+        similar = (await self._similar_experts([goal], snapshot))[0]
+        candidates = self._preselect_experts(features, snapshot, similar)
 
         # Rank experts
-        ranked_experts = self._rank_experts(candidates, features)
+        ranked_experts = self._rank_experts(candidates, features, snapshot)
 
-        # Run experts (simulated)
-        expert_results = self._run_experts(ranked_experts, goal)
+        # Run experts concurrently
+        expert_results, skipped_experts = await self._run_experts(ranked_experts, goal, snapshot, features)
 
         # Aggregate results
         final_result = self._aggregate_results(expert_results)
@@ -180,6 +773,9 @@ class MoERouter:
             'goal': goal,
             'features': features,
             'candidates': candidates,
+            'similar_experts': similar,
             'ranked_experts': ranked_experts,
+            'skipped_experts': skipped_experts,
+            'config_version': snapshot.version,
             **final_result
         }
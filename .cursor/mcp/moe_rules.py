@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Compiler for MoE routing rule conditions.
+Parses the `if:` strings of rules/moe.yml once, when the config is loaded,
+into predicate closures with precompiled regexes, so evaluating a rule on a
+request is a chain of plain function calls.
+
+Grammar (|| binds looser than &&, parentheses group):
+    expr       := and_expr ('||' and_expr)*
+    and_expr   := term ('&&' term)*
+    term       := '(' expr ')' | comparison
+    comparison := feature '~=' /regex/flags
+                | feature '==' literal
+                | feature 'in' '[' literal (',' literal)* ']'
+    literal    := 'text' | "text" | number | true | false | bare_word
+"""
+
+import re
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any
+
+Features = dict[str, Any]
+Predicate = Callable[[Features], bool]
+
+# Token kinds, tried in order at each position
+_TOKEN_PATTERNS = [
+    ("SPACE", r"\s+"),
+    ("REGEX", r"/(?:[^/\\]|\\.)*/[a-z]*"),
+    ("STRING", r"'[^']*'|\"[^\"]*\""),
+    ("OP", r"~=|==|&&|\|\||[\[\](),]"),
+    ("NUMBER", r"-?\d+(?:\.\d+)?(?![\w.])"),
+    ("WORD", r"[A-Za-z_][\w.-]*"),
+]
+_TOKEN_RE = re.compile("|".join(f"(?P<{kind}>{pattern})" for kind, pattern in _TOKEN_PATTERNS))
+
+_REGEX_FLAGS = {"i": re.IGNORECASE, "m": re.MULTILINE, "s": re.DOTALL, "x": re.VERBOSE}
+
+
+class RuleSyntaxError(ValueError):
+    """A routing rule condition that cannot be compiled."""
+
+    def __init__(self, condition: str, message: str, column: int | None = None) -> None:
+        self.condition = condition
+        self.column = column
+        where = f" at column {column + 1}" if column is not None else ""
+        pointer = f"\n    {condition}\n    {' ' * column}^" if column is not None else ""
+        super().__init__(f"Invalid routing rule '{condition}': {message}{where}{pointer}")
+
+
+@dataclass(frozen=True)
+class _Token:
+    kind: str
+    text: str
+    pos: int
+
+
+def _tokenize(condition: str) -> list[_Token]:
+    tokens: list[_Token] = []
+    pos = 0
+    while pos < len(condition):
+        match = _TOKEN_RE.match(condition, pos)
+        if match is None:
+            raise RuleSyntaxError(condition, f"unexpected character {condition[pos]!r}", pos)
+        if match.lastgroup != "SPACE":
+            tokens.append(_Token(match.lastgroup or "", match.group(), pos))
+        pos = match.end()
+    return tokens
+
+
+def _normalize(value: Any) -> str:
+    """Comparison form shared by literals and feature values ('True' == 'true')."""
+    return str(value).lower()
+
+
+def _all_of(left: Predicate, right: Predicate) -> Predicate:
+    return lambda features: left(features) and right(features)
+
+
+def _any_of(left: Predicate, right: Predicate) -> Predicate:
+    return lambda features: left(features) or right(features)
+
+
+def _fold(terms: list[Predicate], combine: Callable[[Predicate, Predicate], Predicate]) -> Predicate:
+    predicate = terms[0]
+    for term in terms[1:]:
+        predicate = combine(predicate, term)
+    return predicate
+
+
+class _Parser:
+    """Recursive-descent parser producing a predicate closure."""
+
+    def __init__(self, condition: str, known_features: frozenset[str] | None) -> None:
+        self.condition = condition
+        self.known_features = known_features
+        self.tokens = _tokenize(condition)
+        self.index = 0
+
+    def parse(self) -> Predicate:
+        if not self.tokens:
+            raise RuleSyntaxError(self.condition, "empty condition")
+        predicate = self._expr()
+        if self.index < len(self.tokens):
+            token = self.tokens[self.index]
+            raise RuleSyntaxError(self.condition, f"unexpected {token.text!r}", token.pos)
+        return predicate
+
+    def _error(self, message: str) -> RuleSyntaxError:
+        pos = self.tokens[self.index].pos if self.index < len(self.tokens) else len(self.condition)
+        return RuleSyntaxError(self.condition, message, pos)
+
+    def _peek(self, text: str) -> bool:
+        return self.index < len(self.tokens) and self.tokens[self.index].kind == "OP" \
+            and self.tokens[self.index].text == text
+
+    def _next(self, expected: str) -> _Token:
+        if self.index >= len(self.tokens):
+            raise self._error(f"expected {expected}, got end of rule")
+        token = self.tokens[self.index]
+        self.index += 1
+        return token
+
+    def _expect(self, text: str) -> None:
+        token = self._next(f"'{text}'")
+        if token.kind != "OP" or token.text != text:
+            self.index -= 1
+            raise self._error(f"expected '{text}', got {token.text!r}")
+
+    def _expr(self) -> Predicate:
+        terms = [self._and_expr()]
+        while self._peek("||"):
+            self.index += 1
+            terms.append(self._and_expr())
+        return _fold(terms, _any_of)
+
+    def _and_expr(self) -> Predicate:
+        terms = [self._term()]
+        while self._peek("&&"):
+            self.index += 1
+            terms.append(self._term())
+        return _fold(terms, _all_of)
+
+    def _term(self) -> Predicate:
+        if self._peek("("):
+            self.index += 1
+            predicate = self._expr()
+            self._expect(")")
+            return predicate
+        return self._comparison()
+
+    def _comparison(self) -> Predicate:
+        token = self._next("a feature name")
+        if token.kind != "WORD":
+            self.index -= 1
+            raise self._error(f"expected a feature name, got {token.text!r}")
+        name = token.text
+        if self.known_features is not None and name not in self.known_features:
+            self.index -= 1
+            raise self._error(f"unknown feature '{name}' (known: {', '.join(sorted(self.known_features))})")
+
+        operator = self._next("'~=', '==' or 'in' after '" + name + "'")
+        if operator.kind == "OP" and operator.text == "~=":
+            regex = self._regex()
+            return lambda features: regex.search(str(features.get(name, ""))) is not None
+        if operator.kind == "OP" and operator.text == "==":
+            expected = _normalize(self._literal())
+            return lambda features: _normalize(features.get(name, "")) == expected
+        if operator.kind == "WORD" and operator.text == "in":
+            values = frozenset(_normalize(value) for value in self._list())
+            return lambda features: _normalize(features.get(name, "")) in values
+
+        self.index -= 1
+        raise self._error(f"expected '~=', '==' or 'in' after '{name}', got {operator.text!r}")
+
+    def _regex(self) -> re.Pattern[str]:
+        token = self._next("a /regex/")
+        if token.kind != "REGEX":
+            self.index -= 1
+            raise self._error(f"expected a /regex/ after '~=', got {token.text!r}")
+        body, _, flag_text = token.text[1:].rpartition("/")
+        flags = 0
+        for flag in flag_text:
+            if flag not in _REGEX_FLAGS:
+                raise RuleSyntaxError(self.condition, f"unknown regex flag '{flag}'", token.pos)
+            flags |= _REGEX_FLAGS[flag]
+        try:
+            return re.compile(body.replace("\\/", "/"), flags)
+        except re.error as e:
+            raise RuleSyntaxError(self.condition, f"invalid regex: {e}", token.pos) from e
+
+    def _literal(self) -> Any:
+        token = self._next("a value")
+        if token.kind == "STRING":
+            return token.text[1:-1]
+        if token.kind == "NUMBER":
+            return float(token.text) if "." in token.text else int(token.text)
+        if token.kind == "WORD":
+            return {"true": True, "false": False}.get(token.text.lower(), token.text)
+        self.index -= 1
+        raise self._error(f"expected a value, got {token.text!r}")
+
+    def _list(self) -> list[Any]:
+        self._expect("[")
+        values = [self._literal()]
+        while self._peek(","):
+            self.index += 1
+            values.append(self._literal())
+        self._expect("]")
+        return values
+
+
+def compile_condition(condition: str, known_features: Iterable[str] | None = None) -> Predicate:
+    """
+    Compile a rule condition into a predicate over a feature dict.
+
+    Args:
+        condition: Rule text, e.g. "file_ext in ['py','ts'] && goal_keywords ~= /(fix|bug)/i"
+        known_features: If given, feature names outside this set are rejected
+
+    Returns:
+        Function mapping features to True/False
+
+    Raises:
+        RuleSyntaxError: If the condition is malformed
+    """
+    if not isinstance(condition, str):
+        raise RuleSyntaxError(str(condition), f"condition must be a string, got {type(condition).__name__}")
+    known = frozenset(known_features) if known_features is not None else None
+    return _Parser(condition, known).parse()
+
+
+@lru_cache(maxsize=256)
+def cached_condition(condition: str) -> Predicate:
+    """compile_condition without feature checking, compiled once per distinct string."""
+    return compile_condition(condition)
+
+
+@dataclass(frozen=True)
+class CompiledRule:
+    """A routing rule ready for evaluation."""
+
+    condition: str
+    predicate: Predicate = field(compare=False)
+    pick: tuple[str, ...]
+
+    def matches(self, features: Features) -> bool:
+        return self.predicate(features)
+
+
+def compile_rules(rules: list[dict[str, Any]], known_features: Iterable[str] | None = None,
+                  known_experts: Iterable[str] | None = None) -> list[CompiledRule]:
+    """
+    Compile the routing_rules section of moe.yml.
+
+    Args:
+        rules: Entries with `if` (condition) and `pick` (expert ids)
+        known_features: Feature names conditions may use (router.features)
+        known_experts: Expert ids picks may name
+
+    Returns:
+        Compiled rules in config order
+
+    Raises:
+        RuleSyntaxError: If a rule is malformed or names an unknown feature or expert
+    """
+    experts = frozenset(known_experts) if known_experts is not None else None
+    compiled = []
+    for number, rule in enumerate(rules, start=1):
+        if not isinstance(rule, dict) or "if" not in rule or "pick" not in rule:
+            raise RuleSyntaxError(str(rule), f"routing rule {number} needs 'if' and 'pick'")
+        condition, pick = rule["if"], rule["pick"]
+        if isinstance(pick, str):
+            pick = [pick]
+        if not isinstance(pick, list) or not pick:
+            raise RuleSyntaxError(str(condition), f"routing rule {number}: 'pick' must be a non-empty list")
+        if experts is not None:
+            unknown = [expert for expert in pick if expert not in experts]
+            if unknown:
+                raise RuleSyntaxError(str(condition), f"routing rule {number} picks unknown expert(s) {unknown}")
+        compiled.append(CompiledRule(condition, compile_condition(condition, known_features), tuple(pick)))
+    return compiled
@@ -11,12 +11,27 @@ Recommended Model: Claude 3.5 Sonnet (anthropic/claude-3-5-sonnet-20241022)
 """
 
 import asyncio
+import contextvars
 import importlib.util
 import json
+import math
 import os
-from dataclasses import dataclass
+import random
+import re
+import sys
+import threading
+import time
+from collections.abc import AsyncIterator, Callable, Coroutine
+from dataclasses import dataclass, field
 from enum import Enum
-from typing import Any
+from typing import Any, TypeVar
+
+from mcp.background import background_loop
+from mcp.context import ContextAssembler
+from mcp.metrics import LatencyHistogram, metrics_registry
+from mcp.providers import LLMProvider, ProviderPool
+from mcp.routing_cache import RoutingCache, cache_key
+from mcp.streaming import IncrementalJSONParser
 
 OPENAI_AVAILABLE = importlib.util.find_spec("openai") is not None
 ANTHROPIC_AVAILABLE = importlib.util.find_spec("anthropic") is not None
@@ -27,7 +42,18 @@ if ANTHROPIC_AVAILABLE:
     from anthropic import AsyncAnthropic
 
 if not OPENAI_AVAILABLE and not ANTHROPIC_AVAILABLE:
-    print("Warning: Neither OpenAI nor Anthropic available. Falling back to rule-based routing.")
+    print("Warning: Neither OpenAI nor Anthropic available. Falling back to rule-based routing.", file=sys.stderr)
+
+T = TypeVar("T")
+
+# RAG chunks fetched up front for a batch of goals, keyed by goal
+_prefetched_chunks: contextvars.ContextVar[dict[str, list[dict[str, Any]]] | None] = \
+    contextvars.ContextVar("prefetched_chunks", default=None)
+
+
+def _is_anthropic(client: Any) -> bool:
+    """True if the client speaks the Anthropic messages API."""
+    return ANTHROPIC_AVAILABLE and isinstance(client, AsyncAnthropic)
 
 
 class AgentType(Enum):
@@ -55,6 +81,23 @@ class RoutingResult:
     reasoning: str
     steps: list[str]
 
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "agent": self.agent.value,
+            "confidence": self.confidence,
+            "reasoning": self.reasoning,
+            "steps": self.steps
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "RoutingResult":
+        return cls(
+            agent=AgentType(data["agent"]),
+            confidence=data["confidence"],
+            reasoning=data["reasoning"],
+            steps=list(data["steps"])
+        )
+
 
 class RuleBasedRouter:
     """
@@ -113,32 +156,230 @@ class RuleBasedRouter:
         )
     }
 
+    # Score added for each distinct keyword hit (split across agents sharing it)
+    KEYWORD_WEIGHT = 1.0
+    # Score added for each matching pattern; patterns encode intent, not just vocabulary
+    PATTERN_WEIGHT = 2.0
+    # Tie-break order, most specific first
+    PRIORITY = (AgentType.TESTS, AgentType.DB, AgentType.GENERAL)
+
     def __init__(self) -> None:
-        """Initialize rule-based router."""
+        """Initialize rule-based router and compile the capability rules."""
         self.capabilities = self.AGENT_CAPABILITIES
 
+        # keyword -> [(agent, weight)]; a keyword listed by several agents is less discriminative
+        owners: dict[str, list[AgentType]] = {}
+        for agent, capability in self.capabilities.items():
+            for keyword in dict.fromkeys(k.lower() for k in capability.keywords):
+                owners.setdefault(keyword, []).append(agent)
+        self.keyword_weights = {
+            keyword: [(agent, self.KEYWORD_WEIGHT / len(agents)) for agent in agents]
+            for keyword, agents in owners.items()
+        }
+
+        # One alternation over every keyword; longest first so "testing" wins over "test".
+        # Common inflections are accepted so "tests" and "migrations" count.
+        alternation = "|".join(re.escape(k) for k in sorted(owners, key=len, reverse=True))
+        self.keyword_regex = re.compile(rf"\b({alternation})(?:s|es|ed|ing)?\b")
+
+        self.pattern_regexes = [
+            (agent, re.compile(pattern))
+            for agent, capability in self.capabilities.items()
+            for pattern in capability.patterns
+        ]
+
+    def score_goal(self, goal: str) -> tuple[dict[AgentType, float], dict[AgentType, list[str]]]:
+        """
+        Score a goal against every agent's keywords and patterns.
+
+        Args:
+            goal: The goal description
+
+        Returns:
+            Tuple of per-agent scores and the distinct keywords matched per agent
+        """
+        goal_lower = goal.lower()
+        scores = dict.fromkeys(self.capabilities, 0.0)
+        matched: dict[AgentType, list[str]] = {agent: [] for agent in self.capabilities}
+
+        for keyword in dict.fromkeys(m.group(1) for m in self.keyword_regex.finditer(goal_lower)):
+            for agent, weight in self.keyword_weights[keyword]:
+                scores[agent] += weight
+                matched[agent].append(keyword)
+
+        for agent, regex in self.pattern_regexes:
+            if regex.search(goal_lower):
+                scores[agent] += self.PATTERN_WEIGHT
+
+        return scores, matched
+
     def route_goal(self, goal: str, meta: dict[str, Any] | None = None) -> RoutingResult:
         """Rule-based routing as fallback."""
-        # Simplified rule-based routing
-        goal_lower = goal.lower()
+        scores, matched = self.score_goal(goal)
+        agent = max(self.PRIORITY, key=lambda a: (scores[a], -self.PRIORITY.index(a)))
+        top = scores[agent]
+        total = sum(scores.values())
 
-        if any(word in goal_lower for word in ["test", "testing", "pytest", "unittest", "assert", "mock"]):
-            agent = AgentType.TESTS
-            confidence = 0.8
-        elif any(word in goal_lower for word in ["database", "db", "sql", "query", "table", "schema", "migration"]):
-            agent = AgentType.DB
-            confidence = 0.8
-        else:
+        if top == 0:
             agent = AgentType.GENERAL
-            confidence = 0.6
+            confidence = 0.5
+            reasoning = "Rule-based routing found no agent-specific signals; defaulting to general agent"
+        else:
+            # Grows with evidence for the winner and with its share of all evidence
+            strength = 1 - math.exp(-top / 2)
+            confidence = round(0.5 + 0.45 * strength * (top / total), 3)
+            reasoning = (f"Rule-based routing assigned to {agent.value} agent "
+                         f"(score {top:.1f} of {total:.1f}; matched: {', '.join(matched[agent]) or 'patterns'})")
 
         return RoutingResult(
             agent=agent,
             confidence=confidence,
-            reasoning=f"Rule-based routing assigned to {agent.value} agent",
+            reasoning=reasoning,
             steps=["Analyze task requirements", "Implement solution", "Test functionality"]
         )
 
+    def route_goals(self, goals: list[str], meta: dict[str, Any] | None = None) -> list[RoutingResult]:
+        """
+        Classify many goals at once.
+
+        Args:
+            goals: Goal descriptions
+            meta: Optional metadata shared by all goals
+
+        Returns:
+            Routing results in input order
+        """
+        return [self.route_goal(goal, meta) for goal in goals]
+
+
+@dataclass
+class _InFlight:
+    """A shared call and the number of callers awaiting it."""
+    task: "asyncio.Future[Any]"
+    waiters: int = field(default=0)
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key into one in-flight task.
+
+    Callers await the shared task through asyncio.shield, so cancelling one
+    caller leaves the call running for the others; it is only cancelled when
+    its last waiter goes away.
+    """
+
+    def __init__(self, name: str = "routing") -> None:
+        self.name = name
+        self._calls: dict[str, _InFlight] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, factory: Callable[[], Coroutine[Any, Any, T]]) -> T:
+        """
+        Await the in-flight call for `key`, starting it with `factory` if there is none.
+
+        Args:
+            key: Identity of the call
+            factory: Creates the coroutine when no call is in flight
+
+        Returns:
+            The shared call's result
+        """
+        call = self._calls.get(key)
+        if call is None or call.task.get_loop() is not asyncio.get_running_loop():
+            call = _InFlight(asyncio.ensure_future(factory()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda task: self._forget(key, task))
+            self.started += 1
+        else:
+            self.coalesced += 1
+            metrics_registry.increment(f"{self.name}.coalesced")
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            if call.waiters == 1 and not call.task.done():
+                call.task.cancel()
+            raise
+        finally:
+            call.waiters -= 1
+
+    def in_flight(self) -> int:
+        """Number of distinct calls currently running."""
+        return len(self._calls)
+
+    def _forget(self, key: str, task: "asyncio.Future[Any]") -> None:
+        call = self._calls.get(key)
+        if call is not None and call.task is task:
+            del self._calls[key]
+
+
+class SpeculationStats:
+    """
+    Outcome counters and timings for speculative routing.
+
+    Agreement is measured whenever both routers produce an answer: unsure
+    rule-based answers, plus the sampled share of confident ones whose LLM call
+    finishes in the background, so the confidence threshold can be tuned from
+    real traffic.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.rule_wins = 0
+        self.llm_wins = 0
+        self.deadline_fallbacks = 0
+        self.error_fallbacks = 0
+        self.llm_errors = 0
+        self.compared = 0
+        self.agreed = 0
+        self.rule_latency = LatencyHistogram()
+        self.llm_latency = LatencyHistogram()
+        self.decision_latency = LatencyHistogram()
+
+    def record_outcome(self, outcome: str, decision_sec: float) -> None:
+        """Record which answer was returned and how long the caller waited."""
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+            self.decision_latency.observe(decision_sec)
+        metrics_registry.increment(f"routing.speculation.{outcome}")
+        metrics_registry.record_stage("route_decision", decision_sec)
+
+    def record_rule(self, seconds: float) -> None:
+        with self._lock:
+            self.rule_latency.observe(seconds)
+        metrics_registry.record_stage("route_rule", seconds)
+
+    def record_llm(self, seconds: float, agreed: bool) -> None:
+        with self._lock:
+            self.llm_latency.observe(seconds)
+            self.compared += 1
+            self.agreed += int(agreed)
+        metrics_registry.record_stage("route_llm", seconds)
+        metrics_registry.increment("routing.speculation.agreed" if agreed else "routing.speculation.disagreed")
+
+    def record_llm_error(self) -> None:
+        with self._lock:
+            self.llm_errors += 1
+        metrics_registry.increment("routing.speculation.llm_errors")
+
+    def stats(self) -> dict[str, Any]:
+        """Counters, agreement rate and latency summaries."""
+        with self._lock:
+            return {
+                "rule_wins": self.rule_wins,
+                "llm_wins": self.llm_wins,
+                "deadline_fallbacks": self.deadline_fallbacks,
+                "error_fallbacks": self.error_fallbacks,
+                "llm_errors": self.llm_errors,
+                "compared": self.compared,
+                "agreement_rate": round(self.agreed / self.compared, 4) if self.compared else 0.0,
+                "rule_latency": self.rule_latency.summary(),
+                "llm_latency": self.llm_latency.summary(),
+                "decision_latency": self.decision_latency.summary()
+            }
+
 
 class AIAgentRouter:
     """
@@ -179,37 +420,102 @@ class AIAgentRouter:
     Return response as JSON with keys: agent, confidence, reasoning, steps
     """
 
+    # Chunks retrieved per goal before budget packing
+    RAG_CANDIDATES = 12
+
+    USER_PROMPT = "Please analyze this development goal and route it to the most appropriate agent. Use the provided knowledge context when available:\n\n"
+
     def __init__(self) -> None:
         """Initialize AI agent router with Claude 3.5 Sonnet as primary model."""
-        self.client: AsyncOpenAI | AsyncAnthropic | None = None
-        self.model_name: str = ""
+        providers: list[LLMProvider] = []
 
         # Prioritize Claude 3.5 Sonnet for superior code understanding (if API key available)
         if ANTHROPIC_AVAILABLE and os.getenv("ANTHROPIC_API_KEY"):
-            self.client = AsyncAnthropic()  # Will use ANTHROPIC_API_KEY from env
-            self.model_name = "claude-3-5-sonnet-20241022"
-            print("Using Claude 3.5 Sonnet for AI-powered routing")
-        elif OPENAI_AVAILABLE and os.getenv("OPENAI_API_KEY"):
-            self.client = AsyncOpenAI()  # Will use OPENAI_API_KEY from env
+            # Will use ANTHROPIC_API_KEY from env
+            providers.append(LLMProvider("anthropic", AsyncAnthropic(), "claude-3-5-sonnet-20241022", anthropic=True))
+            print("Using Claude 3.5 Sonnet for AI-powered routing", file=sys.stderr)
+        if OPENAI_AVAILABLE and os.getenv("OPENAI_API_KEY"):
             # Check for preferred GPT model from environment
             preferred_model = os.getenv("AI_AGENT_MODEL", "gpt-4o-mini")
 
             # Support custom model names
             if preferred_model == "gpt-4o":
-                self.model_name = "gpt-4o"
-                print("Using GPT-4o for AI-powered routing (high quality, higher cost)")
+                print("Using GPT-4o for AI-powered routing (high quality, higher cost)", file=sys.stderr)
             elif preferred_model == "gpt-4o-mini":
-                self.model_name = "gpt-4o-mini"
-                print("Using GPT-4o-mini for AI-powered routing (cost-effective)")
+                print("Using GPT-4o-mini for AI-powered routing (cost-effective)", file=sys.stderr)
             else:
                 # Allow custom model names (e.g., future GPT-5 models)
-                self.model_name = preferred_model
-                print(f"Using custom GPT model '{preferred_model}' for AI-powered routing")
-        else:
-            print("Warning: No valid API keys found. Falling back to rule-based routing.")
+                print(f"Using custom GPT model '{preferred_model}' for AI-powered routing", file=sys.stderr)
+            # Will use OPENAI_API_KEY from env
+            providers.append(LLMProvider("openai", AsyncOpenAI(), preferred_model))
+        if OPENAI_AVAILABLE and os.getenv("LOCAL_LLM_BASE_URL"):
+            # OpenAI-compatible local endpoint (Ollama, vLLM, llama.cpp server, ...)
+            local_model = os.getenv("LOCAL_LLM_MODEL", "llama3.1")
+            providers.append(LLMProvider("local", AsyncOpenAI(
+                base_url=os.getenv("LOCAL_LLM_BASE_URL"),
+                api_key=os.getenv("LOCAL_LLM_API_KEY", "local")
+            ), local_model))
+            print(f"Using local model '{local_model}' for AI-powered routing", file=sys.stderr)
+
+        if not providers:
+            print("Warning: No valid API keys found. Falling back to rule-based routing.", file=sys.stderr)
+        elif len(providers) > 1:
+            print(f"LLM provider pool: {', '.join(p.name for p in providers)}", file=sys.stderr)
+
+        # Latency-aware pool; hedges slow requests onto the next provider
+        self.providers = ProviderPool.from_env(providers)
 
         self.fallback_router = RuleBasedRouter()
 
+        # Packs RAG chunks into whatever the prompt budget leaves
+        self.context_assembler = ContextAssembler()
+        # Batched chunk search (queries, k) -> chunks per query; the MCP server injects
+        # its RAGServer's so the embedding model and store are loaded once
+        self.rag_search: Callable[[list[str], int], list[list[dict[str, Any]]]] | None = None
+        # Completion tokens requested from the provider
+        self.max_completion_tokens = 1000
+
+        # Decisions from the LLM path, so repeated goals skip RAG and the LLM call
+        self.cache = RoutingCache.from_env()
+
+        # Speculative mode: the rule-based router races the LLM
+        self.speculative = os.getenv("ROUTING_SPECULATIVE", "0").lower() in ("1", "true", "yes")
+        self.rule_confidence_threshold = float(os.getenv("ROUTING_RULE_CONFIDENCE", "0.8"))
+        self.llm_deadline_sec = float(os.getenv("ROUTING_LLM_DEADLINE_SEC", "5.0"))
+        # Share of confident rule-based answers still checked against the LLM (agreement stats)
+        self.speculative_sample_rate = float(os.getenv("ROUTING_SPECULATIVE_SAMPLE_RATE", "0.0"))
+        self.speculation = SpeculationStats()
+        # Identical concurrent LLM requests share one call
+        self.singleflight = SingleFlight("routing")
+        # Strong references to LLM calls that outlive the request that started them
+        self._background_tasks: set[asyncio.Task[RoutingResult]] = set()
+        # LLM calls in flight per route_goals batch
+        self.batch_concurrency = int(os.getenv("ROUTING_BATCH_CONCURRENCY", "8"))
+
+    @property
+    def client(self) -> Any:
+        """Client of the primary provider, or None when routing is rule-based only."""
+        primary = self.providers.primary
+        return primary.client if primary is not None else None
+
+    @client.setter
+    def client(self, client: Any) -> None:
+        # Replace the pool with a single provider using this client
+        model = self.model_name
+        providers = [LLMProvider("primary", client, model, anthropic=_is_anthropic(client))] if client is not None else []
+        self.providers = ProviderPool.from_env(providers)
+
+    @property
+    def model_name(self) -> str:
+        """Model of the primary provider."""
+        primary = self.providers.primary
+        return primary.model if primary is not None else ""
+
+    @model_name.setter
+    def model_name(self, model: str) -> None:
+        if self.providers.primary is not None:
+            self.providers.primary.model = model
+
     async def route_goal(self, goal: str, meta: dict[str, Any] | None = None) -> RoutingResult:
         """
         Route a goal using AI analysis with Chain-of-Thought reasoning.
@@ -231,58 +537,326 @@ class AIAgentRouter:
 
         # Try AI-powered routing first
         if self.client:
+            key = cache_key(goal, meta)
+            cached = self.cache.get(key)
+            metrics_registry.record_cache("routing", hit=cached is not None)
+            if cached is not None:
+                return RoutingResult.from_dict(cached)
+
+            if self.speculative:
+                return await self._speculative_route_goal(goal, meta, key)
+
             try:
-                return await self._ai_route_goal(goal, meta or {})
+                return await self._llm_route_goal(goal, meta, key)
             except Exception as e:
-                print(f"AI routing failed: {e}. Falling back to rule-based routing.")
+                print(f"AI routing failed: {e}. Falling back to rule-based routing.", file=sys.stderr)
                 # Fall through to fallback routing
 
         # Fallback to rule-based routing
         return self.fallback_router.route_goal(goal, meta)
 
-    async def _ai_route_goal(self, goal: str, meta: dict[str, Any]) -> RoutingResult:
-        """Perform AI-powered goal routing using Claude 3.5 Sonnet or GPT-4o-mini with RAG context."""
+    async def route_goals(self, goals: list[str], metas: list[dict[str, Any] | None] | None = None,
+                          max_concurrency: int | None = None) -> list[RoutingResult | Exception]:
+        """
+        Route several goals at once.
+
+        RAG context for every goal that will reach the LLM is fetched with one
+        batched embedding and store query; the LLM calls then run concurrently,
+        at most `max_concurrency` at a time. Each goal otherwise goes through
+        route_goal, so caching, coalescing and fallbacks apply per item.
+
+        Args:
+            goals: Goal descriptions
+            metas: Optional metadata per goal (same length as goals)
+            max_concurrency: LLM calls in flight (defaults to ROUTING_BATCH_CONCURRENCY)
+
+        Returns:
+            A RoutingResult or the exception raised for each goal, in input order
+        """
+        if metas is None:
+            metas = [None] * len(goals)
+        if len(metas) != len(goals):
+            raise ValueError(f"Got {len(metas)} metas for {len(goals)} goals")
+
+        start = time.perf_counter()
+
+        # Only goals headed for the LLM need knowledge context
+        needs_context: list[str] = []
+        if self.client:
+            for goal, meta in zip(goals, metas, strict=True):
+                if isinstance(goal, str) and goal.strip() and goal not in needs_context \
+                        and not self.cache.contains(cache_key(goal, meta)):
+                    needs_context.append(goal)
+        prefetched = dict(zip(needs_context, await self.search_rag_chunks(needs_context), strict=True))
+
+        semaphore = asyncio.Semaphore(max(1, max_concurrency or self.batch_concurrency))
+
+        async def one(goal: str, meta: dict[str, Any] | None) -> RoutingResult:
+            if not isinstance(goal, str):
+                raise ValueError(f"Goal must be a string, got {type(goal).__name__}")
+            async with semaphore:
+                return await self.route_goal(goal, meta)
+
+        # Tasks created by gather copy the current context, prefetched chunks included
+        token = _prefetched_chunks.set(prefetched)
+        try:
+            results = await asyncio.gather(*(one(goal, meta) for goal, meta in zip(goals, metas, strict=True)),
+                                           return_exceptions=True)
+        finally:
+            _prefetched_chunks.reset(token)
+
+        metrics_registry.record_stage("route_batch", time.perf_counter() - start)
+        # A cancelled item comes back as CancelledError, which is not an Exception
+        return [r if isinstance(r, RoutingResult | Exception) else RuntimeError(repr(r)) for r in results]
+
+    async def _llm_route_goal(self, goal: str, meta: dict[str, Any] | None, key: str) -> RoutingResult:
+        """Route with the LLM, sharing the call with identical in-flight requests."""
+        async def call() -> RoutingResult:
+            result = await self._ai_route_goal(goal, meta or {})
+            self.cache.put(key, result.to_dict())
+            return result
+
+        return await self.singleflight.do(key, call)
+
+    async def _speculative_route_goal(self, goal: str, meta: dict[str, Any] | None, key: str) -> RoutingResult:
+        """
+        Rule-based router first, the LLM only when it is unsure.
+
+        A confident rule-based answer is returned without calling the LLM, except
+        for a `speculative_sample_rate` share of requests whose LLM call runs in
+        the background to measure agreement. Otherwise the LLM gets
+        `llm_deadline_sec` and the rule-based answer is the fallback; a late LLM
+        call is not cancelled, so it still fills the cache.
+        """
+        start = time.perf_counter()
+        rule_result = self.fallback_router.route_goal(goal, meta)
+        self.speculation.record_rule(time.perf_counter() - start)
+
+        confident = rule_result.confidence >= self.rule_confidence_threshold
+        if confident and random.random() >= self.speculative_sample_rate:
+            self.speculation.record_outcome("rule_wins", time.perf_counter() - start)
+            return rule_result
+
+        llm_start = time.perf_counter()
+        llm_task = asyncio.ensure_future(self._llm_route_goal(goal, meta, key))
+        self._background_tasks.add(llm_task)
+
+        def on_llm_done(task: asyncio.Task[RoutingResult]) -> None:
+            self._background_tasks.discard(task)
+            if task.cancelled():
+                return
+            if task.exception() is not None:
+                self.speculation.record_llm_error()
+                return
+            self.speculation.record_llm(time.perf_counter() - llm_start, task.result().agent == rule_result.agent)
+
+        llm_task.add_done_callback(on_llm_done)
+
+        if confident:
+            # Sampled for agreement stats: the caller does not wait for it
+            self.speculation.record_outcome("rule_wins", time.perf_counter() - start)
+            return rule_result
+
+        try:
+            result = await asyncio.wait_for(asyncio.shield(llm_task), self.llm_deadline_sec)
+        except asyncio.TimeoutError:
+            self.speculation.record_outcome("deadline_fallbacks", time.perf_counter() - start)
+            return rule_result
+        except Exception as e:
+            print(f"AI routing failed: {e}. Falling back to rule-based routing.", file=sys.stderr)
+            self.speculation.record_outcome("error_fallbacks", time.perf_counter() - start)
+            return rule_result
+
+        self.speculation.record_outcome("llm_wins", time.perf_counter() - start)
+        return result
+
+    async def route_goal_stream(self, goal: str, meta: dict[str, Any] | None = None) -> AsyncIterator[dict[str, Any]]:
+        """
+        Route a goal with a streamed LLM response, reporting the decision early.
+
+        Args:
+            goal: The goal description to route
+            meta: Optional metadata about the context
+
+        Yields:
+            A "decision" event (agent, confidence, elapsed_sec) as soon as both
+            fields are parsed, then a "result" event with reasoning and steps.
+            The result is authoritative: if the stream fails after the decision,
+            it carries the rule-based fallback instead.
+        """
+        start = time.perf_counter()
+
+        def event(kind: str, result: RoutingResult) -> dict[str, Any]:
+            data = result.to_dict() if kind == "result" else {"agent": result.agent.value, "confidence": result.confidence}
+            return {"event": kind, **data, "elapsed_sec": round(time.perf_counter() - start, 4)}
+
+        key = cache_key(goal, meta)
+        cached = self.cache.get(key) if self.client and goal.strip() else None
+        if self.client and goal.strip():
+            metrics_registry.record_cache("routing", hit=cached is not None)
+
+        if not self.client or not goal.strip() or cached is not None:
+            result = RoutingResult.from_dict(cached) if cached is not None else await self.route_goal(goal, meta)
+            yield event("decision", result)
+            yield event("result", result)
+            return
+
+        decided = False
+        try:
+            context = await self._build_context(goal, meta or {})
+            parser = IncrementalJSONParser()
+            async for text in self._ai_stream_text(context):
+                parser.feed(text)
+                if not decided and "agent" in parser.fields and "confidence" in parser.fields:
+                    decided = True
+                    metrics_registry.record_stage("route_time_to_decision", time.perf_counter() - start)
+                    yield event("decision", self._result_from_data(parser.fields))
+            result = self._result_from_data(parser.result())
+            self.cache.put(key, result.to_dict())
+        except Exception as e:
+            print(f"AI routing failed: {e}. Falling back to rule-based routing.", file=sys.stderr)
+            result = self.fallback_router.route_goal(goal, meta)
+
+        if not decided:
+            yield event("decision", result)
+        yield event("result", result)
+
+    async def _build_context(self, goal: str, meta: dict[str, Any]) -> str:
+        """Build the user prompt context: goal, compact meta and budgeted RAG knowledge."""
         context = f"Goal: {goal}"
         if meta:
-            context += f"\nContext: {json.dumps(meta, indent=2)}"
+            context += f"\nContext: {json.dumps(meta, separators=(',', ':'), ensure_ascii=False, default=str)}"
+
+        # Whatever the system prompt, goal, meta and completion leave is available for RAG
+        budget = (self.context_assembler.max_tokens - self.max_completion_tokens
+                  - self.context_assembler.count_tokens(self.SYSTEM_PROMPT + self.USER_PROMPT + context))
 
         # Get relevant context from RAG knowledge base
-        rag_context = await self.get_rag_context(goal)
+        rag_context = await self.get_rag_context(goal, max_tokens=budget)
         if rag_context:
             context += f"\n\nRelevant Knowledge from RAG:\n{rag_context}"
 
-        assert self.client is not None, "AI client not initialized"
+        return context
+
+    async def _ai_route_goal(self, goal: str, meta: dict[str, Any]) -> RoutingResult:
+        """Perform AI-powered goal routing using Claude 3.5 Sonnet or GPT-4o-mini with RAG context."""
+        context = await self._build_context(goal, meta)
+        result_text = await self.providers.complete(lambda provider: self._complete_text(provider, context))
+        return self._result_from_data(json.loads(result_text))
 
+    async def _complete_text(self, provider: LLMProvider, context: str) -> str:
+        """Send the routing prompt to one provider and return the completion text."""
         # Handle different AI providers
-        if isinstance(self.client, AsyncAnthropic):
+        if provider.anthropic:
             # Claude 3.5 Sonnet API call
-            response = await self.client.messages.create(  # type: ignore[call-overload]
-                model=self.model_name,
-                max_tokens=1000,
+            response = await provider.client.messages.create(
+                model=provider.model,
+                max_tokens=self.max_completion_tokens,
                 temperature=0.3,
                 system=self.SYSTEM_PROMPT,
                 messages=[
-                    {"role": "user", "content": f"Please analyze this development goal and route it to the most appropriate agent. Use the provided knowledge context when available:\n\n{context}"}
+                    {"role": "user", "content": self.USER_PROMPT + context}
                 ]
             )
-            result_text = response.content[0].text  # type: ignore
+            return response.content[0].text  # type: ignore[no-any-return]
+
+        # OpenAI API call (also OpenAI-compatible local endpoints)
+        messages = [
+            {"role": "system", "content": self.SYSTEM_PROMPT},
+            {"role": "user", "content": self.USER_PROMPT + context}
+        ]
+        response = await provider.client.chat.completions.create(
+            messages=messages,
+            model=provider.model,
+            temperature=0.3,
+            max_tokens=self.max_completion_tokens,
+            response_format={"type": "json_object"}
+        )
+        return response.choices[0].message.content  # type: ignore[no-any-return]
+
+    async def _ai_stream_text(self, context: str) -> AsyncIterator[str]:
+        """
+        Stream completion text deltas from the best available provider.
+
+        A provider that fails before its first token is replaced by the next
+        one; once text has been yielded an error propagates, since the caller
+        may already have acted on it. Streams are not hedged: a slow first
+        token is waited for.
+        """
+        candidates = self.providers.ordered()
+        if not candidates:
+            raise RuntimeError("No LLM providers configured")
+
+        last_error: Exception | None = None
+        for provider in candidates:
+            probe = provider.stats.half_open()
+            if not provider.stats.try_acquire():
+                continue  # Another request holds this provider's half-open probe
+            start = time.perf_counter()
+            streamed = False
+            try:
+                async for text in self._provider_stream_text(provider, context):
+                    streamed = True
+                    yield text
+            except Exception as e:
+                provider.stats.record_failure()
+                if streamed:
+                    raise
+                last_error = e
+                if provider is not candidates[-1]:
+                    metrics_registry.increment("llm.stream_failovers")
+                print(f"LLM provider '{provider.name}' failed before streaming: {e}", file=sys.stderr)
+                continue
+            except BaseException:
+                # Cancelled or closed mid-stream: no verdict on the provider
+                if probe:
+                    provider.stats.release_probe()
+                raise
+            provider.stats.record_success(time.perf_counter() - start)
+            return
+
+        if last_error is None:
+            raise RuntimeError("No LLM provider available")
+        raise last_error
+
+    async def _provider_stream_text(self, provider: LLMProvider, context: str) -> AsyncIterator[str]:
+        if provider.anthropic:
+            stream = await provider.client.messages.create(
+                model=provider.model,
+                max_tokens=self.max_completion_tokens,
+                temperature=0.3,
+                system=self.SYSTEM_PROMPT,
+                messages=[{"role": "user", "content": self.USER_PROMPT + context}],
+                stream=True
+            )
+            try:
+                async for event in stream:
+                    if event.type == "content_block_delta" and getattr(event.delta, "text", None):
+                        yield event.delta.text
+            finally:
+                await stream.close()
         else:
-            # OpenAI API call
-            messages = [
-                {"role": "system", "content": self.SYSTEM_PROMPT},
-                {"role": "user", "content": f"Please analyze this development goal and route it to the most appropriate agent. Use the provided knowledge context when available:\n\n{context}"}
-            ]
-            response = await self.client.chat.completions.create(  # type: ignore[call-overload]
-                messages=messages,
-                model=self.model_name,
+            stream = await provider.client.chat.completions.create(
+                messages=[
+                    {"role": "system", "content": self.SYSTEM_PROMPT},
+                    {"role": "user", "content": self.USER_PROMPT + context}
+                ],
+                model=provider.model,
                 temperature=0.3,
-                max_tokens=1000,
-                response_format={"type": "json_object"}
+                max_tokens=self.max_completion_tokens,
+                response_format={"type": "json_object"},
+                stream=True
             )
-            result_text = response.choices[0].message.content
-
-        result_data = json.loads(result_text)
-
+            try:
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+            finally:
+                await stream.close()
+
+    @staticmethod
+    def _result_from_data(result_data: dict[str, Any]) -> RoutingResult:
+        """Map the LLM's JSON (possibly partial) to a RoutingResult."""
         # Map string agent names to enum values
         agent_mapping = {
             "GENERAL": AgentType.GENERAL,
@@ -290,7 +864,7 @@ class AIAgentRouter:
             "DB": AgentType.DB
         }
 
-        agent_str = result_data.get("agent", "GENERAL").upper()
+        agent_str = str(result_data.get("agent", "GENERAL")).upper()
         agent = agent_mapping.get(agent_str, AgentType.GENERAL)
 
         return RoutingResult(
@@ -300,36 +874,55 @@ class AIAgentRouter:
             steps=result_data.get("steps", ["Analyze requirements", "Implement solution", "Test functionality"])
         )
 
-    async def get_rag_context(self, goal: str) -> str:
+    async def get_rag_context(self, goal: str, max_tokens: int | None = None) -> str:
         """
         Get relevant context from RAG knowledge base for better routing decisions.
+
+        Args:
+            goal: The goal description used as the search query
+            max_tokens: Token budget for the context (defaults to the assembler budget)
+
+        Returns:
+            Deduplicated, budget-packed context text, or "" if nothing relevant fits
         """
-        try:
-            # Import RAG server dynamically to avoid circular imports
+        if max_tokens is not None and max_tokens <= 0:
+            return ""
 
-            from mcp.server import RAGServer
+        prefetched = _prefetched_chunks.get()
+        if prefetched is not None and goal in prefetched:
+            chunks = prefetched[goal]
+        else:
+            chunks = (await self.search_rag_chunks([goal]))[0]
+        return self.context_assembler.assemble(chunks, max_tokens) if chunks else ""
 
-            # Create a temporary RAG server instance for searching
-            # Note: In production, this should be a singleton or injected dependency
-            rag_server = RAGServer()
+    async def search_rag_chunks(self, goals: list[str]) -> list[list[dict[str, Any]]]:
+        """
+        Retrieve candidate RAG chunks for goals with one batched search.
 
-            # Search for relevant context in the knowledge base
-            results = rag_server.search_knowledge(goal, n_results=3)
+        Args:
+            goals: Search queries
 
-            if results:
-                context_parts = []
-                for result in results:
-                    if result["relevance_score"] > 0.7:  # Only include highly relevant results
-                        context_parts.append(f"• {result['content'][:500]}... (relevance: {result['relevance_score']:.2f})")
+        Returns:
+            Chunks per goal, in order; empty lists if RAG is unavailable
+        """
+        if not goals:
+            return []
 
-                if context_parts:
-                    return "\n".join(context_parts)
+        try:
+            if self.rag_search is None:
+                # Standalone use: create one RAG server and keep it (imported here to avoid a cycle)
+                from mcp.server import RAGServer
+                self.rag_search = (await asyncio.to_thread(RAGServer)).search_knowledge_chunks_batch
+
+            # Over-fetch; the assembler keeps what fits the budget. Embedding and
+            # the store query block, so they run off the event loop.
+            return await asyncio.to_thread(self.rag_search, goals, self.RAG_CANDIDATES)
 
         except Exception as e:
             # Silently fail and return empty context if RAG is unavailable
-            print(f"RAG context retrieval failed: {e}")
+            print(f"RAG context retrieval failed: {e}", file=sys.stderr)
 
-        return ""
+        return [[] for _ in goals]
 
     def get_available_agents(self) -> dict[str, dict[str, Any]]:
         """
@@ -357,31 +950,81 @@ class AIAgentRouter:
         }
 
 
-# Global AI router instance
+# Global AI router instance; its LLM clients live on the shared background_loop
 router = AIAgentRouter()
 
 
-async def route_goal_async(goal: str, meta: dict[str, Any] | None = None) -> dict[str, Any]:
+async def _route_goal(goal: str, meta: dict[str, Any] | None = None,
+                      on_decision: Callable[[dict[str, Any]], None] | None = None) -> dict[str, Any]:
+    """Route on the current loop and convert the result to a dict."""
+    if on_decision is None:
+        return (await router.route_goal(goal, meta)).to_dict()
+
+    result: dict[str, Any] = {}
+    async for event in router.route_goal_stream(goal, meta):
+        if event["event"] == "decision":
+            on_decision(event)
+        else:
+            result = {k: event[k] for k in ("agent", "confidence", "reasoning", "steps")}
+    return result
+
+
+async def route_goal_async(goal: str, meta: dict[str, Any] | None = None,
+                           on_decision: Callable[[dict[str, Any]], None] | None = None) -> dict[str, Any]:
     """
     Route a goal to an appropriate agent using AI-powered analysis.
 
-    This is the async entry point for the orchestrator.route tool.
+    This is the async entry point for the orchestrator.route tool. Calls made
+    from other event loops are forwarded to the background loop so the LLM
+    client is only ever used from one loop.
 
     Args:
         goal: The goal description
         meta: Optional metadata
+        on_decision: If given, the response is streamed and this is called with
+            {agent, confidence, elapsed_sec} as soon as they are parsed, before
+            reasoning and steps arrive. It runs on the background loop thread.
 
     Returns:
         Dictionary with agent, confidence, reasoning, and steps
     """
-    result = await router.route_goal(goal, meta)
+    if asyncio.get_running_loop() is background_loop.loop:
+        return await _route_goal(goal, meta, on_decision)
+    return await asyncio.wrap_future(background_loop.submit(_route_goal(goal, meta, on_decision)))
 
-    return {
-        "agent": result.agent.value,
-        "confidence": result.confidence,
-        "reasoning": result.reasoning,
-        "steps": result.steps
-    }
+
+async def _route_goals(goals: list[str], metas: list[dict[str, Any] | None] | None = None,
+                       max_concurrency: int | None = None) -> list[dict[str, Any]]:
+    """Route a batch on the current loop and convert each item to a dict."""
+    results = await router.route_goals(goals, metas, max_concurrency)
+    return [
+        {"error": f"{type(r).__name__}: {r}"} if isinstance(r, Exception) else r.to_dict()
+        for r in results
+    ]
+
+
+async def route_goals_async(goals: list[str], metas: list[dict[str, Any] | None] | None = None,
+                            max_concurrency: int | None = None) -> list[dict[str, Any]]:
+    """
+    Route several goals with AI-powered analysis.
+
+    This is the async entry point for orchestrator.route_batch with
+    router=agent. RAG context for the whole batch is fetched with one embedding call and the LLM
+    calls run concurrently; like route_goal_async, the work runs on the
+    background loop.
+
+    Args:
+        goals: Goal descriptions
+        metas: Optional metadata per goal (same length as goals)
+        max_concurrency: LLM calls in flight (defaults to ROUTING_BATCH_CONCURRENCY)
+
+    Returns:
+        One dict per goal, in input order: agent, confidence, reasoning and
+        steps, or {"error": message} if that goal could not be routed
+    """
+    if asyncio.get_running_loop() is background_loop.loop:
+        return await _route_goals(goals, metas, max_concurrency)
+    return await asyncio.wrap_future(background_loop.submit(_route_goals(goals, metas, max_concurrency)))
 
 
 def route_goal(goal: str, meta: dict[str, Any] | None = None) -> dict[str, Any]:
@@ -389,20 +1032,7 @@ def route_goal(goal: str, meta: dict[str, Any] | None = None) -> dict[str, Any]:
     Synchronous wrapper for route_goal_async.
 
     This maintains backward compatibility with existing MCP server calls.
+    The coroutine runs on the shared background loop, so it is safe to call
+    with or without a running event loop in the calling thread.
     """
-
-    try:
-        # Try to get current event loop
-        loop = asyncio.get_event_loop()
-        if loop.is_running():
-            # We're in an async context, create a new thread
-            import concurrent.futures
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                future = executor.submit(asyncio.run, route_goal_async(goal, meta))
-                return future.result()
-        else:
-            # We can run the coroutine directly
-            return loop.run_until_complete(route_goal_async(goal, meta))
-    except RuntimeError:
-        # No event loop, create one
-        return asyncio.run(route_goal_async(goal, meta))
+    return background_loop.run(_route_goal(goal, meta))
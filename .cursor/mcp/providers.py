@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Latency-aware LLM provider pool with hedged requests.
+Tracks an EWMA of latency and error rate per provider, orders providers by
+expected latency, sends a backup request to the next provider when the
+first has not answered within its p95, and skips providers whose circuit
+breaker is open.
+"""
+
+import asyncio
+import math
+import os
+import sys
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from typing import Any, TypeVar
+
+from mcp.metrics import metrics_registry
+
+T = TypeVar("T")
+
+
+class ProviderStats:
+    """
+    Health of one provider.
+
+    Features:
+    - EWMA latency and error rate
+    - p95 over a sliding window of recent successful latencies
+    - Circuit breaker: open after consecutive failures, half-open after the
+      cooldown, when a single trial request (the probe) decides whether it closes
+    """
+
+    def __init__(self, alpha: float = 0.2, window: int = 100, failure_threshold: int = 3,
+                 cooldown_sec: float = 30.0) -> None:
+        self.alpha = alpha
+        self.failure_threshold = failure_threshold
+        self.cooldown_sec = cooldown_sec
+        self.latencies: deque[float] = deque(maxlen=window)
+        self.ewma_latency: float | None = None
+        self.ewma_error_rate = 0.0
+        self.ewma_cancel_rate = 0.0
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.probe_in_flight = False
+        self.requests = 0
+        self.errors = 0
+        self.cancelled = 0
+
+    def record_success(self, seconds: float) -> None:
+        self.requests += 1
+        self.latencies.append(seconds)
+        self.ewma_latency = seconds if self.ewma_latency is None else \
+            self.alpha * seconds + (1 - self.alpha) * self.ewma_latency
+        self.ewma_error_rate *= 1 - self.alpha
+        self.ewma_cancel_rate *= 1 - self.alpha
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.requests += 1
+        self.errors += 1
+        self.ewma_error_rate = self.alpha + (1 - self.alpha) * self.ewma_error_rate
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= self.failure_threshold:
+            self.open_until = time.monotonic() + self.cooldown_sec
+        self.probe_in_flight = False
+
+    def record_cancelled(self) -> None:
+        """
+        Count a request cancelled before it finished (a lost hedge).
+
+        Its elapsed time is only a lower bound, so it is not a latency sample:
+        recording it would drag p95, and with it the hedge delay, down. It
+        raises the cancel rate instead, which ranks the provider lower.
+        """
+        self.cancelled += 1
+        self.ewma_cancel_rate = self.alpha + (1 - self.alpha) * self.ewma_cancel_rate
+
+    def release_probe(self) -> None:
+        """Free the half-open slot after a trial request ended without a verdict (e.g. cancelled)."""
+        self.probe_in_flight = False
+
+    def half_open(self) -> bool:
+        """True once an opened breaker's cooldown has passed, until a trial request settles it."""
+        return self.open_until > 0 and time.monotonic() >= self.open_until
+
+    def available(self) -> bool:
+        """False while the breaker is open, or half-open with its trial request in flight."""
+        return time.monotonic() >= self.open_until and not self.probe_in_flight
+
+    def try_acquire(self) -> bool:
+        """
+        Claim a request slot before calling the provider.
+
+        Always granted while closed (or open, when the pool has nothing
+        better); while half-open only one caller at a time gets the probe.
+        """
+        if not self.half_open():
+            return True
+        if self.probe_in_flight:
+            return False
+        self.probe_in_flight = True
+        return True
+
+    def p95(self, min_samples: int = 5) -> float | None:
+        """p95 of recent latencies, or None with too few samples."""
+        if len(self.latencies) < min_samples:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def score(self) -> float:
+        """Expected cost of a request; untried providers score 0 so they get explored."""
+        if self.ewma_latency is None:
+            # Only lost hedges so far: slower than whatever beat it
+            return math.inf if self.cancelled else 0.0
+        # A failed attempt costs roughly another request on the next provider,
+        # a lost hedge at least the hedge delay on top of the backup
+        return self.ewma_latency * (1 + 4 * self.ewma_error_rate + self.ewma_cancel_rate)
+
+    def to_dict(self) -> dict[str, Any]:
+        p95 = self.p95()
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "cancelled": self.cancelled,
+            "ewma_latency_ms": round(self.ewma_latency * 1000, 3) if self.ewma_latency is not None else None,
+            "ewma_error_rate": round(self.ewma_error_rate, 4),
+            "p95_ms": round(p95 * 1000, 3) if p95 is not None else None,
+            "circuit_open": not self.available()
+        }
+
+
+class LLMProvider:
+    """An LLM client, the model to call on it and its health stats."""
+
+    def __init__(self, name: str, client: Any, model: str, anthropic: bool = False,
+                 stats: ProviderStats | None = None) -> None:
+        """
+        Initialize a provider.
+
+        Args:
+            name: Label used in metrics ("anthropic", "openai", "local", ...)
+            client: AsyncAnthropic or AsyncOpenAI-compatible client
+            model: Model name sent with each request
+            anthropic: True if the client speaks the Anthropic messages API
+            stats: Health tracker (a default one is created if omitted)
+        """
+        self.name = name
+        self.client = client
+        self.model = model
+        self.anthropic = anthropic
+        self.stats = stats or ProviderStats()
+
+
+class ProviderPool:
+    """
+    Ordered set of providers with hedged requests and circuit breaking.
+
+    `complete()` sends the request to the best available provider. If that
+    provider has not answered within its p95 latency (or `default_hedge_sec`
+    before enough samples exist), a backup request goes to the next provider
+    and the first success wins; the loser is cancelled (and counted, not timed).
+    A provider that fails fast is replaced immediately instead of waiting for
+    the hedge delay. A half-open provider whose trial request is still in
+    flight is skipped.
+
+    Streamed completions (AIAgentRouter._ai_stream_text) are not hedged: they
+    use `ordered()` and only fail over to the next provider when one fails
+    before its first token.
+    """
+
+    def __init__(self, providers: list[LLMProvider], hedge: bool = True, default_hedge_sec: float = 2.0,
+                 min_hedge_sec: float = 0.05) -> None:
+        self.providers = providers
+        self.hedge = hedge
+        self.default_hedge_sec = default_hedge_sec
+        self.min_hedge_sec = min_hedge_sec
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def __len__(self) -> int:
+        return len(self.providers)
+
+    @property
+    def primary(self) -> LLMProvider | None:
+        """First configured provider."""
+        return self.providers[0] if self.providers else None
+
+    def ordered(self) -> list[LLMProvider]:
+        """Available providers, best first; all providers if every breaker is open."""
+        ranked = sorted(enumerate(self.providers), key=lambda item: (item[1].stats.score(), item[0]))
+        available = [provider for _, provider in ranked if provider.stats.available()]
+        return available or [provider for _, provider in ranked]
+
+    def hedge_delay(self, provider: LLMProvider) -> float:
+        """How long to wait for `provider` before sending a backup request."""
+        p95 = provider.stats.p95()
+        return max(self.min_hedge_sec, p95 if p95 is not None else self.default_hedge_sec)
+
+    async def complete(self, request: Callable[[LLMProvider], Awaitable[T]]) -> T:
+        """
+        Run `request` against the pool.
+
+        Args:
+            request: Sends the request to one provider and returns its result
+
+        Returns:
+            The first successful result
+
+        Raises:
+            RuntimeError: If the pool is empty
+            Exception: The last provider error if every provider failed
+        """
+        candidates = self.ordered()
+        if not candidates:
+            raise RuntimeError("No LLM providers configured")
+
+        first = candidates[0]
+        pending: dict[asyncio.Task[T], LLMProvider] = {}
+        last_error: BaseException | None = None
+
+        def launch() -> None:
+            while candidates:
+                provider = candidates.pop(0)
+                probe = provider.stats.half_open()
+                if not provider.stats.try_acquire():
+                    continue  # Another request holds this provider's half-open probe
+                task = asyncio.ensure_future(self._timed(provider, request))
+                if probe:
+                    # Also runs if the task is cancelled before it starts
+                    task.add_done_callback(lambda t, stats=provider.stats: t.cancelled() and stats.release_probe())
+                pending[task] = provider
+                return
+
+        launch()
+        if not pending:
+            raise RuntimeError("No LLM provider available")
+        try:
+            while pending:
+                # Wait for the newest attempt's hedge delay before backing it up
+                newest = list(pending.values())[-1]
+                timeout = self.hedge_delay(newest) if self.hedge and candidates else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    self.hedged += 1
+                    metrics_registry.increment("llm.hedged")
+                    launch()
+                    continue
+
+                for task in done:
+                    provider = pending.pop(task)
+                    if task.exception() is None:
+                        if provider is not first:
+                            self.hedge_wins += 1
+                        return task.result()
+                    last_error = task.exception()
+
+                # Every finished attempt failed: fail over at once if nothing else is running
+                if not pending and candidates:
+                    launch()
+        finally:
+            for task in pending:
+                task.cancel()
+
+        if last_error is None:
+            raise RuntimeError("No LLM provider returned a result")
+        raise last_error
+
+    async def _timed(self, provider: LLMProvider, request: Callable[[LLMProvider], Awaitable[T]]) -> T:
+        start = time.perf_counter()
+        try:
+            result = await request(provider)
+        except asyncio.CancelledError:
+            # Lost the hedge: counted, but its truncated time is not a latency sample
+            provider.stats.record_cancelled()
+            metrics_registry.increment(f"llm.{provider.name}.cancelled")
+            raise
+        except Exception as e:
+            provider.stats.record_failure()
+            metrics_registry.increment(f"llm.{provider.name}.errors")
+            if not provider.stats.available():
+                metrics_registry.increment(f"llm.{provider.name}.circuit_open")
+            print(f"LLM provider '{provider.name}' failed: {e}", file=sys.stderr)
+            raise
+        elapsed = time.perf_counter() - start
+        provider.stats.record_success(elapsed)
+        metrics_registry.record_stage(f"llm.{provider.name}", elapsed)
+        return result
+
+    def stats(self) -> dict[str, Any]:
+        """Per-provider health and hedging counters."""
+        return {
+            "providers": {provider.name: provider.stats.to_dict() for provider in self.providers},
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins
+        }
+
+    @classmethod
+    def from_env(cls, providers: list[LLMProvider]) -> "ProviderPool":
+        """Create a pool configured by LLM_HEDGE, LLM_HEDGE_DEFAULT_SEC, LLM_BREAKER_FAILURES and LLM_BREAKER_COOLDOWN_SEC."""
+        failures = int(os.getenv("LLM_BREAKER_FAILURES", "3"))
+        cooldown = float(os.getenv("LLM_BREAKER_COOLDOWN_SEC", "30"))
+        for provider in providers:
+            provider.stats.failure_threshold = failures
+            provider.stats.cooldown_sec = cooldown
+        return cls(
+            providers,
+            hedge=os.getenv("LLM_HEDGE", "1").lower() in ("1", "true", "yes"),
+            default_hedge_sec=float(os.getenv("LLM_HEDGE_DEFAULT_SEC", "2.0"))
+        )
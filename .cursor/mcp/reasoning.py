@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+Tree/Graph-of-Thought search over partial solutions ("thoughts").
+Expands a level of thoughts concurrently, keeps the best `beam_width`, and
+merges proposals that reach the same state (as identified by the expander)
+into one graph node, so each distinct state is expanded once. Stops at the depth limit, on a confident
+complete answer, or when the runtime or token budget is spent.
+Configured by `reasoning.tot`, `reasoning.got` and `budgets` in
+rules/reasoning.yml.
+"""
+
+import asyncio
+import hashlib
+import random
+import time
+from collections.abc import Awaitable, Callable, Hashable, Sequence
+from dataclasses import dataclass, field
+from typing import Any
+
+from mcp.consistency import normalize_answer
+from mcp.metrics import metrics_registry
+
+MERGE_STRATEGIES = ("best-score", "first")
+
+
+@dataclass
+class Proposal:
+    """
+    A candidate next step, the model's self-score for it (0.0-1.0) and the tokens it cost.
+
+    `state` is the canonical identity of the state the step leads to, as the
+    expander's domain defines it (e.g. the resulting plan or program,
+    normalized). Proposals from different parents with equal states merge into
+    one graph node. Without it the state is state_key() of the steps.
+    """
+
+    step: str
+    score: float
+    tokens: int = 0
+    state: Hashable | None = None
+
+
+# Proposes up to `branching` next steps for a state (the steps taken so far);
+# an empty list marks the state as a complete answer
+Expander = Callable[[tuple[str, ...], int], Awaitable[list[Proposal]]]
+
+
+def state_key(steps: Sequence[str]) -> tuple[str, ...]:
+    """Default graph identity of a state: its normalized steps, in order (a plan's order matters)."""
+    return tuple(normalize_answer(step) for step in steps)
+
+
+@dataclass
+class ThoughtNode:
+    """One distinct state in the thought graph."""
+
+    key: Hashable
+    steps: tuple[str, ...]  # Path that reached this state with the best (or first) score
+    score: float  # Mean self-score of the steps
+    paths: int = 1  # Paths merged into this node
+    complete: bool = False
+
+    @property
+    def depth(self) -> int:
+        return len(self.steps)
+
+
+@dataclass
+class ReasoningResult:
+    """Outcome of a thought search."""
+
+    steps: tuple[str, ...]
+    confidence: float
+    complete: bool
+    explored_nodes: int  # States expanded (one model call each)
+    generated_nodes: int  # Proposals turned into graph edges
+    merged_nodes: int  # Proposals that reached an existing state
+    pruned_nodes: int  # Cut by the beam and never expanded
+    backtracked_nodes: int  # Revived from pruned nodes after a dead end
+    depth_reached: int
+    tokens_used: int
+    elapsed_sec: float
+    stop_reason: str  # depth | confidence | exhausted | max_tokens | max_runtime
+    alternatives: list[dict[str, Any]] = field(default_factory=list)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "steps": list(self.steps),
+            "confidence": round(self.confidence, 4),
+            "complete": self.complete,
+            "explored_nodes": self.explored_nodes,
+            "generated_nodes": self.generated_nodes,
+            "merged_nodes": self.merged_nodes,
+            "pruned_nodes": self.pruned_nodes,
+            "backtracked_nodes": self.backtracked_nodes,
+            "depth_reached": self.depth_reached,
+            "tokens_used": self.tokens_used,
+            "elapsed_sec": round(self.elapsed_sec, 4),
+            "stop_reason": self.stop_reason,
+            "alternatives": self.alternatives
+        }
+
+
+class ThoughtSearch:
+    """
+    Beam search over a graph of thoughts.
+
+    Features:
+    - Each level's states are expanded concurrently (max_concurrency in flight)
+    - A proposal reaching a known state (its `state`, else its ordered
+      normalized steps) merges into that node instead of creating a new one,
+      whichever parent it came from; with merge_strategy "best-score" the
+      node keeps the better-scoring path
+    - The beam keeps beam_width states per level; with backtrack, pruned
+      states are revived best-first when a level dead-ends
+    - Stops early when a complete answer scores above early_stop_confidence,
+      and when max_runtime_sec or max_tokens is spent (returning the best so far)
+    """
+
+    def __init__(self, branching: int = 3, depth: int = 4, beam_width: int | None = None,
+                 backtrack: bool = True, reuse_nodes: bool = True, merge_strategy: str = "best-score",
+                 max_runtime_sec: float | None = None, max_tokens: int | None = None,
+                 early_stop_confidence: float | None = None, max_concurrency: int | None = None) -> None:
+        """
+        Initialize the search.
+
+        Args:
+            branching: Proposals requested per expansion
+            depth: Steps in a complete answer at most
+            beam_width: States kept per level (defaults to branching)
+            backtrack: Revive pruned states when a level produces nothing
+            reuse_nodes: Merge identical states (GoT); False searches a plain tree
+            merge_strategy: "best-score" or "first"
+            max_runtime_sec: Wall-clock budget
+            max_tokens: Token budget over all expansions
+            early_stop_confidence: Stop once a complete answer scores above this
+            max_concurrency: Expansions in flight at once (defaults to the beam)
+
+        Raises:
+            ValueError: If branching or depth < 1 or the merge strategy is unknown
+        """
+        if branching < 1 or depth < 1:
+            raise ValueError(f"branching and depth must be at least 1, got {branching} and {depth}")
+        if merge_strategy not in MERGE_STRATEGIES:
+            raise ValueError(f"Unknown merge strategy '{merge_strategy}' (expected one of {', '.join(MERGE_STRATEGIES)})")
+        self.branching = branching
+        self.depth = depth
+        self.beam_width = beam_width or branching
+        self.backtrack = backtrack
+        self.reuse_nodes = reuse_nodes
+        self.merge_strategy = merge_strategy
+        self.max_runtime_sec = max_runtime_sec
+        self.max_tokens = max_tokens
+        self.early_stop_confidence = early_stop_confidence
+        self.max_concurrency = max_concurrency
+
+    @classmethod
+    def from_config(cls, config: dict[str, Any], **overrides: Any) -> "ThoughtSearch":
+        """Create a search from rules/reasoning.yml (the whole file: `reasoning` and `budgets`)."""
+        reasoning = config.get("reasoning", {})
+        tot = reasoning.get("tot", {})
+        got = reasoning.get("got", {})
+        budgets = config.get("budgets", {})
+        settings: dict[str, Any] = {
+            "branching": int(tot.get("branching", 3)),
+            "depth": int(tot.get("depth", 4)),
+            "beam_width": tot.get("beam_width"),
+            "backtrack": bool(tot.get("backtrack", True)),
+            "reuse_nodes": bool(got.get("reuse_nodes", True)),
+            "merge_strategy": got.get("merge_strategy", "best-score"),
+            "max_runtime_sec": budgets.get("max_runtime_sec"),
+            "max_tokens": budgets.get("max_tokens"),
+            "early_stop_confidence": budgets.get("early_stop_if_confidence_gt")
+        }
+        settings.update(overrides)
+        return cls(**settings)
+
+    async def run(self, expander: Expander) -> ReasoningResult:
+        """
+        Search from the empty state.
+
+        Args:
+            expander: Model proposing next steps for a state
+
+        Returns:
+            The best complete answer found, or the best partial one if the
+            search stopped first
+        """
+        start = time.perf_counter()
+        deadline = start + self.max_runtime_sec if self.max_runtime_sec else None
+        root = ThoughtNode(state_key(()), (), 0.0)
+        nodes: dict[Hashable, ThoughtNode] = {root.key: root}
+        tree_nodes: list[ThoughtNode] = []  # Every node when reuse_nodes is off
+        frontier = [root]
+        reserve: list[ThoughtNode] = []
+        semaphore = asyncio.Semaphore(max(1, self.max_concurrency or self.beam_width))
+        counts = {"explored": 0, "generated": 0, "merged": 0, "pruned": 0, "backtracked": 0, "tokens": 0}
+        stop_reason = "exhausted"
+        found_complete = False
+
+        def over_tokens() -> bool:
+            return self.max_tokens is not None and counts["tokens"] >= self.max_tokens
+
+        async def expand(node: ThoughtNode) -> list[Proposal] | None:
+            async with semaphore:
+                if over_tokens():
+                    return None
+                proposals = await expander(node.steps, self.branching)
+                counts["explored"] += 1
+                counts["tokens"] += sum(proposal.tokens for proposal in proposals)
+                return proposals
+
+        while frontier:
+            if over_tokens():
+                stop_reason = "max_tokens"
+                break
+            remaining = deadline - time.perf_counter() if deadline is not None else None
+            if remaining is not None and remaining <= 0:
+                stop_reason = "max_runtime"
+                break
+
+            tasks = {asyncio.ensure_future(expand(node)): node for node in frontier}
+            done, pending = await asyncio.wait(tasks, timeout=remaining)
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+            children: list[ThoughtNode] = []
+            # Frontier order, so merges resolve the same way every run
+            for task, parent in tasks.items():
+                if task not in done or task.exception() is not None or task.result() is None:
+                    continue
+                proposals = task.result()
+                if not proposals:
+                    parent.complete = True
+                    continue
+                taken = set(state_key(parent.steps))
+                for proposal in proposals[:self.branching]:
+                    if normalize_answer(proposal.step) in taken:
+                        continue  # Repeats a step: no new state
+                    counts["generated"] += 1
+                    steps = parent.steps + (proposal.step,)
+                    score = (parent.score * parent.depth + min(max(float(proposal.score), 0.0), 1.0)) / len(steps)
+                    key = proposal.state if proposal.state is not None else state_key(steps)
+
+                    existing = nodes.get(key) if self.reuse_nodes else None
+                    if existing is not None:
+                        counts["merged"] += 1
+                        existing.paths += 1
+                        if self.merge_strategy == "best-score" and score > existing.score:
+                            existing.steps, existing.score = steps, score
+                        continue
+                    child = ThoughtNode(key, steps, score, complete=len(steps) >= self.depth)
+                    if self.reuse_nodes:
+                        nodes[key] = child
+                    else:
+                        tree_nodes.append(child)
+                    children.append(child)
+
+            if pending:
+                stop_reason = "max_runtime"
+                break
+            if self.early_stop_confidence is not None and any(
+                    node.complete and node.score > self.early_stop_confidence
+                    for node in list(tasks.values()) + children):
+                stop_reason = "confidence"
+                break
+
+            # Beam: best states continue, the rest wait in reserve for backtracking
+            expandable = sorted((child for child in children if not child.complete), key=lambda n: -n.score)
+            frontier = expandable[:self.beam_width]
+            reserve.extend(expandable[self.beam_width:])
+            counts["pruned"] += len(expandable) - len(frontier)
+            found_complete = found_complete or any(node.complete for node in list(tasks.values()) + children)
+            if not frontier and found_complete:
+                stop_reason = "depth"
+            elif not frontier and self.backtrack and reserve:
+                # Dead end without an answer: continue from the best pruned states
+                reserve.sort(key=lambda n: (-n.score, n.depth))
+                frontier, reserve = reserve[:self.beam_width], reserve[self.beam_width:]
+                counts["backtracked"] += len(frontier)
+                counts["pruned"] -= len(frontier)
+
+        candidates = [node for node in list(nodes.values()) + tree_nodes if node.depth > 0]
+        result = self._result(candidates, counts, stop_reason, time.perf_counter() - start)
+        metrics_registry.increment("reasoning.explored_nodes", result.explored_nodes)
+        metrics_registry.increment("reasoning.merged_nodes", result.merged_nodes)
+        return result
+
+    def _result(self, candidates: list[ThoughtNode], counts: dict[str, int], stop_reason: str,
+                elapsed: float) -> ReasoningResult:
+        complete = [node for node in candidates if node.complete]
+        # Complete answers first; otherwise the deepest, best partial one
+        ranked = sorted(complete, key=lambda n: -n.score) if complete \
+            else sorted(candidates, key=lambda n: (-n.depth, -n.score))
+        best = ranked[0] if ranked else None
+        return ReasoningResult(
+            steps=best.steps if best else (),
+            confidence=best.score if best else 0.0,
+            complete=bool(best and best.complete),
+            explored_nodes=counts["explored"],
+            generated_nodes=counts["generated"],
+            merged_nodes=counts["merged"],
+            pruned_nodes=counts["pruned"],
+            backtracked_nodes=counts["backtracked"],
+            depth_reached=max((node.depth for node in candidates), default=0),
+            tokens_used=counts["tokens"],
+            elapsed_sec=elapsed,
+            stop_reason=stop_reason,
+            alternatives=[{"steps": list(node.steps), "score": round(node.score, 4), "paths": node.paths}
+                          for node in ranked[1:self.beam_width]]
+        )
+
+
+class DeterministicThoughtModel:
+    """
+    Local stand-in model for the thought search (tests).
+
+    Proposes steps from a fixed pool. Its domain is commutative: a state is the
+    set of steps taken (canonical_state), which every proposal reports as its
+    `state`, so the search merges paths that take the same steps in any order.
+    The proposals for a state depend only on (seed, goal, canonical state) and
+    each step's self-score only on (seed, goal, step), so the model and the
+    search agree on what a state is.
+    """
+
+    DEFAULT_STEPS = (
+        "clarify acceptance criteria", "write a failing test", "implement the minimal change",
+        "refactor for clarity", "update documentation", "run the full test suite",
+        "review the diff", "scan for secrets", "measure performance",
+    )
+
+    def __init__(self, goal: str = "", steps: Sequence[str] | None = None, seed: int = 0,
+                 latency_sec: float = 0.0, tokens_per_step: int = 40, finish_after: int | None = None) -> None:
+        """
+        Initialize the model.
+
+        Args:
+            goal: Mixed into the seeds
+            steps: Step pool (defaults to DEFAULT_STEPS)
+            seed: Base seed
+            latency_sec: Simulated time per expansion
+            tokens_per_step: Tokens reported per proposal
+            finish_after: Propose nothing (a complete answer) once a state has this many steps
+        """
+        self.goal = goal
+        self.steps = tuple(steps or self.DEFAULT_STEPS)
+        self.seed = seed
+        self.latency_sec = latency_sec
+        self.tokens_per_step = tokens_per_step
+        self.finish_after = finish_after
+        self.calls = 0
+
+    def _rng(self, *parts: Any) -> random.Random:
+        digest = hashlib.sha256(":".join(str(part) for part in (self.seed, self.goal) + parts).encode()).digest()
+        return random.Random(int.from_bytes(digest[:8], "big"))
+
+    @staticmethod
+    def canonical_state(steps: Sequence[str]) -> frozenset[str]:
+        """The model's identity for a state: its normalized steps, in any order."""
+        return frozenset(state_key(steps))
+
+    def quality(self, step: str) -> float:
+        """Self-score the model gives a step."""
+        return round(self._rng("quality", normalize_answer(step)).uniform(0.3, 1.0), 4)
+
+    async def __call__(self, state: tuple[str, ...], branching: int) -> list[Proposal]:
+        self.calls += 1
+        if self.latency_sec:
+            await asyncio.sleep(self.latency_sec)
+        if self.finish_after is not None and len(state) >= self.finish_after:
+            return []
+
+        taken = self.canonical_state(state)
+        available = [step for step in self.steps if normalize_answer(step) not in taken]
+        picks = self._rng("expand", *sorted(taken)).sample(available, min(branching, len(available)))
+        return [Proposal(step, self.quality(step), self.tokens_per_step, self.canonical_state(state + (step,)))
+                for step in picks]
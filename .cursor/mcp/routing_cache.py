@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Routing decision cache for the AI orchestrator.
+Bounded LRU cache with TTL, keyed by normalized goal text plus a stable hash
+of the request metadata, with optional JSON persistence across restarts
+(written in the background, debounced, and at exit).
+"""
+
+import atexit
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_goal(goal: str) -> str:
+    """Normalize goal text so trivially different phrasings share a key."""
+    return _WHITESPACE.sub(" ", goal).strip().rstrip(".!?").lower()
+
+
+def meta_hash(meta: dict[str, Any] | None) -> str:
+    """Stable hash of request metadata, independent of key order."""
+    if not meta:
+        return ""
+    encoded = json.dumps(meta, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()[:16]
+
+
+def cache_key(goal: str, meta: dict[str, Any] | None = None) -> str:
+    """Build the cache key for a goal and its metadata."""
+    return f"{normalize_goal(goal)}\x00{meta_hash(meta)}"
+
+
+class RoutingCache:
+    """
+    LRU cache of routing decisions with a time-to-live.
+
+    Values must be JSON-serializable dicts. Expiry uses wall-clock time so
+    persisted entries stay valid across restarts for the remainder of their TTL.
+    Writes only mark the cache dirty; the file is rewritten at most once per
+    flush_sec, off the caller's thread and outside the cache lock, and at exit.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_sec: float = 3600.0,
+                 path: str | Path | None = None, flush_sec: float = 5.0) -> None:
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of decisions kept (0 disables caching)
+            ttl_sec: Seconds a decision stays valid
+            path: Optional JSON file used to persist entries across restarts
+            flush_sec: Debounce between a change and the file write (0 writes on the caller's thread)
+        """
+        self.max_entries = max_entries
+        self.ttl_sec = ttl_sec
+        self.path = Path(path) if path else None
+        self.flush_sec = flush_sec
+        self._entries: OrderedDict[str, tuple[float, dict[str, Any]]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()  # Serializes file writes
+        self._dirty = False
+        self._flush_timer: threading.Timer | None = None
+        self.hits = 0
+        self.misses = 0
+
+        if self.path is not None:
+            self._load()
+            atexit.register(self.flush)
+
+    @classmethod
+    def from_env(cls) -> "RoutingCache":
+        """Create a cache configured by ROUTING_CACHE_SIZE, _TTL_SEC, _PATH and _FLUSH_SEC."""
+        return cls(
+            max_entries=int(os.getenv("ROUTING_CACHE_SIZE", "1024")),
+            ttl_sec=float(os.getenv("ROUTING_CACHE_TTL_SEC", "3600")),
+            path=os.getenv("ROUTING_CACHE_PATH") or None,
+            flush_sec=float(os.getenv("ROUTING_CACHE_FLUSH_SEC", "5"))
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl_sec > 0
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        """Return a cached decision, or None on a miss or expired entry."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def contains(self, key: str) -> bool:
+        """True if an unexpired decision is cached; does not count as a hit or miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry[0] > time.time()
+
+    def put(self, key: str, value: dict[str, Any]) -> None:
+        """Store a decision, evicting the least recently used entries if full."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl_sec, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        self._mark_dirty()
+
+    def clear(self) -> None:
+        """Drop all entries and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+        self._mark_dirty()
+
+    def flush(self) -> None:
+        """Write pending changes to the persistence file now."""
+        if self.path is None:
+            return
+        with self._io_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                self._dirty = False
+                if self._flush_timer is not None:
+                    self._flush_timer.cancel()
+                    self._flush_timer = None
+                # Entries are immutable once stored; only the list is copied under the lock
+                entries = [[key, expires_at, value] for key, (expires_at, value) in self._entries.items()]
+            self._save(entries)
+
+    def _mark_dirty(self) -> None:
+        """Schedule a debounced flush after a change."""
+        if self.path is None:
+            return
+        with self._lock:
+            self._dirty = True
+            if self.flush_sec > 0:
+                if self._flush_timer is None:
+                    self._flush_timer = threading.Timer(self.flush_sec, self._timed_flush)
+                    self._flush_timer.daemon = True
+                    self._flush_timer.start()
+                return
+        self.flush()
+
+    def _timed_flush(self) -> None:
+        with self._lock:
+            self._flush_timer = None
+        self.flush()
+
+    def stats(self) -> dict[str, Any]:
+        """Hit/miss counts and current size."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_sec": self.ttl_sec,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "persistent": self.path is not None
+            }
+
+    def _load(self) -> None:
+        assert self.path is not None
+        if not self.path.exists():
+            return
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            print(f"Routing cache could not be loaded from {self.path}: {e}", file=sys.stderr)
+            return
+
+        now = time.time()
+        # Entries are stored oldest-first, so replaying them restores LRU order
+        for key, expires_at, value in data.get("entries", []):
+            if expires_at > now:
+                self._entries[key] = (expires_at, value)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _save(self, entries: list[list[Any]]) -> None:
+        # Called with the I/O lock held; write to a temp file and swap so readers never see a partial file
+        assert self.path is not None
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+            tmp_path.write_text(json.dumps({"entries": entries}), encoding="utf-8")
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Routing cache could not be saved to {self.path}: {e}", file=sys.stderr)
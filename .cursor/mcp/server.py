@@ -11,6 +11,9 @@ import queue
 import sys
 import threading
 import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
 from pathlib import Path
 from typing import Any, Optional
 
@@ -21,13 +24,19 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 try:
     import chromadb
+    import yaml
     from chromadb.config import Settings
     from dotenv import load_dotenv
     from sentence_transformers import SentenceTransformer
 
+    from mcp import codec
+    from mcp.jobs import JOB_CANCELLED, JOB_COMPLETED, IngestJobManager
     from mcp.memory import log_memory
-    from mcp.orchestrator import route_goal
-    from mcp.moe import MoERouter
+    from mcp.metrics import PrometheusFileExporter, metrics_registry
+    from mcp.orchestrator import route_goals_async
+    from mcp.orchestrator import router as agent_router
+    from mcp.moe import MoEConfigWatcher, MoERouter
+    from mcp.workspace_index import WorkspaceIndex
     from rag.ingest import RAGIngestor
 except ImportError as e:
     print(f"Missing dependency: {e}", file=sys.stderr)
@@ -37,32 +46,93 @@ ROOT_DIR = Path(__file__).resolve().parents[2]
 load_dotenv(ROOT_DIR / ".env")
 
 
-class SimpleRateLimiter:
-    """Simple token bucket rate limiter for API protection."""
+SERVER_CONFIG_PATH = Path(__file__).parent / "config.yaml"
 
-    def __init__(self, requests_per_minute: int = 60) -> None:
+
+def load_server_config(config_path: Path = SERVER_CONFIG_PATH) -> dict[str, Any]:
+    """Load MCP server configuration, returning an empty config if the file is missing."""
+    if not config_path.exists():
+        return {}
+    with open(config_path, encoding='utf-8') as f:
+        return yaml.safe_load(f) or {}
+
+
+class TokenBucketRateLimiter:
+    """
+    Token bucket rate limiter with constant-time refill and per-tool costs.
+
+    Tokens are refilled lazily from the elapsed time on each check, so a check
+    is O(1) regardless of request volume. Checks never await, which makes them
+    atomic within the event loop without a lock.
+    """
+
+    def __init__(self, requests_per_minute: int = 60, burst: int | None = None,
+                 tool_costs: dict[str, float] | None = None, default_cost: float = 1.0) -> None:
+        """
+        Initialize rate limiter.
+
+        Args:
+            requests_per_minute: Refill rate in tokens per minute
+            burst: Bucket capacity (defaults to requests_per_minute)
+            tool_costs: Token cost per tool name
+            default_cost: Cost of anything not in tool_costs
+        """
         self.requests_per_minute = requests_per_minute
-        self.requests: list[float] = []
-        self.lock = asyncio.Lock()
+        self.capacity = float(burst if burst is not None else requests_per_minute)
+        self.refill_rate = requests_per_minute / 60.0  # tokens per second
+        self.tool_costs = dict(tool_costs or {})
+        self.default_cost = float(default_cost)
+        self.tokens = self.capacity
+        self.last_refill = time.monotonic()
+
+    @classmethod
+    def from_config(cls, config: dict[str, Any]) -> "TokenBucketRateLimiter":
+        """Build a limiter from the `rate_limit` config section."""
+        requests_per_minute = int(os.getenv("MCP_RATE_LIMIT", config.get("requests_per_minute", 120)))
+        return cls(
+            requests_per_minute=requests_per_minute,
+            burst=config.get("burst", requests_per_minute),
+            tool_costs=config.get("tool_costs", {}),
+            default_cost=config.get("default_cost", 1)
+        )
 
-    async def is_allowed(self) -> bool:
-        """Check if request is allowed under rate limit."""
-        async with self.lock:
-            current_time = time.time()
+    def cost_for(self, tool_name: str | None) -> float:
+        """Get the token cost of a tool (default cost for non-tool methods)."""
+        if tool_name is None:
+            return self.default_cost
+        return float(self.tool_costs.get(tool_name, self.default_cost))
+
+    def try_acquire(self, cost: float = 1.0) -> tuple[bool, float]:
+        """
+        Take `cost` tokens if available.
 
-            # Remove requests older than 1 minute
-            self.requests = [req_time for req_time in self.requests
-                           if current_time - req_time < 60]
+        Returns:
+            Tuple of (allowed, retry_after_seconds); retry_after is 0.0 when allowed
+        """
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.refill_rate)
+        self.last_refill = now
+
+        # A cost above capacity could never be satisfied; charge a full bucket instead
+        cost = min(cost, self.capacity)
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return True, 0.0
 
-            # Check if under limit
-            if len(self.requests) < self.requests_per_minute:
-                self.requests.append(current_time)
-                return True
+        if self.refill_rate <= 0:
+            return False, float("inf")
+        return False, (cost - self.tokens) / self.refill_rate
 
-            return False
+    async def is_allowed(self, cost: float = 1.0) -> bool:
+        """Check if request is allowed under rate limit."""
+        allowed, _ = self.try_acquire(cost)
+        return allowed
 
 
 class RAGServer:
+    # Search queries whose embeddings are kept (RAG search and MoE routing embed the same goals)
+    QUERY_EMBEDDING_CACHE_SIZE = 512
+
     def __init__(self) -> None:
         self.store_path = Path("rag/store")
         self.store_path.mkdir(parents=True, exist_ok=True)
@@ -87,9 +157,13 @@ class RAGServer:
             metadata={"description": "Conversation context and memory"}
         )
 
+        self._query_embeddings: OrderedDict[str, list[float]] = OrderedDict()
+        self._query_lock = threading.Lock()
+
     def get_embedding(self, text: str) -> list[float]:
         """Generate embedding for text."""
-        return self.embedding_model.encode(text).tolist()
+        with metrics_registry.timer("embed"):
+            return self.embedding_model.encode(text).tolist()
 
     def add_knowledge(self, content: str, metadata: dict[str, Any] | None = None) -> str:
         """Add content to knowledge base."""
@@ -102,23 +176,25 @@ class RAGServer:
         embedding = self.get_embedding(content)
         doc_id = f"doc_{len(self.knowledge_collection.get()['ids']) + 1}"
 
-        self.knowledge_collection.add(
-            embeddings=[embedding],
-            documents=[content],
-            metadatas=[string_metadata],
-            ids=[doc_id]
-        )
+        with metrics_registry.timer("store"):
+            self.knowledge_collection.add(
+                embeddings=[embedding],
+                documents=[content],
+                metadatas=[string_metadata],
+                ids=[doc_id]
+            )
 
         return doc_id
 
     def search_knowledge(self, query: str, n_results: int = 5) -> list[dict[str, Any]]:
         """Search knowledge base for relevant content."""
-        query_embedding = self.get_embedding(query)
+        query_embedding = self.get_query_embeddings([query])[0]
 
-        results = self.knowledge_collection.query(
-            query_embeddings=query_embedding,
-            n_results=n_results
-        )
+        with metrics_registry.timer("store"):
+            results = self.knowledge_collection.query(
+                query_embeddings=query_embedding,
+                n_results=n_results
+            )
 
         # Format results
         formatted_results = []
@@ -137,54 +213,103 @@ class RAGServer:
 
         return formatted_results
 
+    def get_embeddings(self, texts: list[str]) -> list[list[float]]:
+        """Generate embeddings for several texts in one model call."""
+        with metrics_registry.timer("embed"):
+            return self.embedding_model.encode(texts).tolist()  # type: ignore[no-any-return]
+
+    def get_query_embeddings(self, queries: list[str]) -> list[list[float]]:
+        """
+        Embeddings for search queries, memoized per text (LRU).
+
+        Only the queries not seen recently reach the model, in one call.
+        """
+        with self._query_lock:
+            cached = {query: self._query_embeddings[query] for query in queries if query in self._query_embeddings}
+            for query in cached:
+                self._query_embeddings.move_to_end(query)
+        for query in queries:
+            metrics_registry.record_cache("query_embedding", hit=query in cached)
+
+        missing = list(dict.fromkeys(query for query in queries if query not in cached))
+        if missing:
+            embedded = self.get_embeddings(missing) if len(missing) > 1 else [self.get_embedding(missing[0])]
+            cached.update(zip(missing, embedded, strict=True))
+            with self._query_lock:
+                self._query_embeddings.update(zip(missing, embedded, strict=True))
+                while len(self._query_embeddings) > self.QUERY_EMBEDDING_CACHE_SIZE:
+                    self._query_embeddings.popitem(last=False)
+        return [cached[query] for query in queries]
+
     def search_knowledge_chunks(self, query: str, k: int = 5) -> list[dict[str, Any]]:
         """Search knowledge base and return chunks with text, path, idx, score."""
-        query_embedding = self.get_embedding(query)
+        return self.search_knowledge_chunks_batch([query], k)[0]
 
-        results = self.knowledge_collection.query(
-            query_embeddings=query_embedding,
-            n_results=k
-        )
+    def search_knowledge_chunks_batch(self, queries: list[str], k: int = 5) -> list[list[dict[str, Any]]]:
+        """
+        Search the knowledge base for several queries with one batched embedding and one store query.
+
+        Args:
+            queries: Search queries
+            k: Chunks per query
+
+        Returns:
+            Chunks (text, path, idx, score) for each query, in query order
+        """
+        if not queries:
+            return []
+        query_embeddings = self.get_query_embeddings(queries)
+
+        with metrics_registry.timer("store"):
+            results = self.knowledge_collection.query(
+                query_embeddings=query_embeddings,
+                n_results=k
+            )
 
         # Format results as chunks
-        chunks = []
-        for _i, (_doc_id, document, metadata, distance) in enumerate(zip(
-            results['ids'][0] if results['ids'] else [],
-            results['documents'][0] if results['documents'] else [],
-            results['metadatas'][0] if results['metadatas'] else [],
-            results['distances'][0] if results['distances'] else [], strict=False
-        )):
-            chunks.append({
-                "text": document,
-                "path": metadata.get("source_file", ""),
-                "idx": metadata.get("chunk_index", 0),
-                "score": 1.0 - distance  # Convert distance to similarity score
-            })
+        batches = []
+        for i in range(len(queries)):
+            chunks = []
+            for _doc_id, document, metadata, distance in zip(
+                results['ids'][i] if results['ids'] else [],
+                results['documents'][i] if results['documents'] else [],
+                results['metadatas'][i] if results['metadatas'] else [],
+                results['distances'][i] if results['distances'] else [], strict=False
+            ):
+                chunks.append({
+                    "text": document,
+                    "path": metadata.get("source_file", ""),
+                    "idx": metadata.get("chunk_index", 0),
+                    "score": 1.0 - distance  # Convert distance to similarity score
+                })
+            batches.append(chunks)
 
-        return chunks
+        return batches
 
     def add_memory(self, content: str, context: str = "general") -> str:
         """Add content to conversation memory."""
         embedding = self.get_embedding(content)
         mem_id = f"mem_{len(self.memory_collection.get()['ids']) + 1}"
 
-        self.memory_collection.add(
-            embeddings=[embedding],
-            documents=[content],
-            metadatas=[{"context": context, "timestamp": str(asyncio.get_event_loop().time())}],
-            ids=[mem_id]
-        )
+        with metrics_registry.timer("store"):
+            self.memory_collection.add(
+                embeddings=[embedding],
+                documents=[content],
+                metadatas=[{"context": context, "timestamp": str(asyncio.get_event_loop().time())}],
+                ids=[mem_id]
+            )
 
         return mem_id
 
     def search_memory(self, query: str, n_results: int = 3) -> list[dict[str, Any]]:
         """Search conversation memory."""
-        query_embedding = self.get_embedding(query)
+        query_embedding = self.get_query_embeddings([query])[0]
 
-        results = self.memory_collection.query(
-            query_embeddings=query_embedding,
-            n_results=n_results
-        )
+        with metrics_registry.timer("store"):
+            results = self.memory_collection.query(
+                query_embeddings=query_embedding,
+                n_results=n_results
+            )
 
         formatted_results = []
         for _i, (mem_id, document, metadata, distance) in enumerate(zip(
@@ -202,29 +327,105 @@ class RAGServer:
 
         return formatted_results
 
+@dataclass(frozen=True)
+class ToolSpec:
+    """MCP tool definition paired with its handler."""
+    name: str
+    description: str
+    input_schema: dict[str, Any]
+    handler: Callable[[dict[str, Any], dict[str, Any]], Awaitable[dict[str, Any]]]
+
+    def schema(self) -> dict[str, Any]:
+        """Tool definition as advertised by tools/list."""
+        return {
+            "name": self.name,
+            "description": self.description,
+            "input_schema": self.input_schema
+        }
+
+
+class PreSerialized(dict):
+    """Result dict that also carries its JSON encoding, reused by write_frame."""
+
+    def __init__(self, data: dict[str, Any]) -> None:
+        super().__init__(data)
+        self.json = codec.dumps(data)
+
+
 class MCPServer:
     def __init__(self) -> None:
         self.rag_server = RAGServer()
+        # The agent router fetches routing context from this store instead of opening its own
+        agent_router.rag_search = self.rag_server.search_knowledge_chunks_batch
         self.rag_ingestor: Optional[RAGIngestor] = None  # Lazy initialization
-        self.rate_limiter = SimpleRateLimiter(requests_per_minute=120)  # 120 requests per minute
+        self.config = load_server_config()
+        self.rate_limiter = TokenBucketRateLimiter.from_config(self.config.get("rate_limit", {}))
+
+        # Outgoing notification sink (set by the transport loop)
+        self.notifier: Optional[Callable[[dict[str, Any]], None]] = None
+        self._ingestor_lock = threading.Lock()
+        self.ingest_jobs = IngestJobManager(self._get_ingestor, notify=self.send_notification)
+
+        # Static tool registry; tools/list payload is encoded once
+        self.tools = self._build_tool_registry()
+        self._tools_list_result = PreSerialized({
+            "tools": [spec.schema() for spec in self.tools.values()]
+        })
+
+        # Workspace file index for MoE file features, refreshed in the background once started
+        self._index_interval = float(self.config.get("moe", {}).get("workspace_index_interval_sec", 30))
+        self.workspace_index = WorkspaceIndex(ROOT_DIR)
 
         # MoE router initialization
         moe_config_path = Path(__file__).parent.parent / "rules" / "moe.yml"
-        self.moe_router = MoERouter(str(moe_config_path))
+        self.moe_router = MoERouter(str(moe_config_path), embedder=self.rag_server.get_query_embeddings,
+                                    workspace_index=self.workspace_index)
+
+        # Hot reload of moe.yml (MOE_RELOAD_INTERVAL_SEC env var overrides; 0 disables)
+        reload_interval = float(os.getenv("MOE_RELOAD_INTERVAL_SEC",
+                                          self.config.get("moe", {}).get("reload_interval_sec", 2)))
+        self.moe_watcher: Optional[MoEConfigWatcher] = None
+        if reload_interval > 0:
+            self.moe_watcher = MoEConfigWatcher(self.moe_router, reload_interval)
 
         # Reasoning KPIs tracking
         self.metrics = {
-            "explored_nodes": 0,
-            "merged_nodes": 0,
             "vote_distribution": {},
             "confidence": 0.0
         }
 
-    def update_metrics(self, explored_nodes: int = 0, merged_nodes: int = 0,
-                      vote_distribution: dict = None, confidence: float = 0.0) -> None:
+        # Optional Prometheus text-file export (MCP_METRICS_FILE env var overrides)
+        metrics_config = self.config.get("metrics", {})
+        prometheus_file = os.getenv("MCP_METRICS_FILE", metrics_config.get("prometheus_file"))
+        self.metrics_exporter: Optional[PrometheusFileExporter] = None
+        if prometheus_file:
+            self.metrics_exporter = PrometheusFileExporter(
+                metrics_registry,
+                prometheus_file,
+                interval_sec=metrics_config.get("export_interval_sec", 15)
+            )
+
+    def start(self) -> "MCPServer":
+        """Start the background threads: workspace indexing, moe.yml hot reload and metrics export."""
+        if self._index_interval > 0:
+            self.workspace_index.start(self._index_interval)
+        if self.moe_watcher is not None:
+            self.moe_watcher.start()
+        if self.metrics_exporter is not None:
+            self.metrics_exporter.start()
+        return self
+
+    def close(self) -> None:
+        """Stop the background threads and the ingest worker; safe to call more than once."""
+        if self.moe_watcher is not None:
+            self.moe_watcher.stop()
+        self.workspace_index.stop()
+        if self.metrics_exporter is not None:
+            self.metrics_exporter.stop()
+        self.ingest_jobs.shutdown()
+
+    def update_metrics(self, vote_distribution: dict = None, confidence: float = 0.0) -> None:
         """Update reasoning KPIs for this request."""
-        self.metrics["explored_nodes"] += explored_nodes
-        self.metrics["merged_nodes"] += merged_nodes
         if vote_distribution:
             for key, value in vote_distribution.items():
                 self.metrics["vote_distribution"][key] = self.metrics["vote_distribution"].get(key, 0) + value
@@ -233,16 +434,17 @@ class MCPServer:
     def reset_metrics(self) -> None:
         """Reset metrics for new request."""
         self.metrics = {
-            "explored_nodes": 0,
-            "merged_nodes": 0,
             "vote_distribution": {},
             "confidence": 0.0
         }
-        self.tools = {
-            "add_knowledge": {
-                "name": "add_knowledge",
-                "description": "Add content to the knowledge base for future retrieval",
-                "input_schema": {
+
+    def _build_tool_registry(self) -> dict[str, ToolSpec]:
+        """Build the static tool registry (schemas paired with handlers) once at startup."""
+        specs = [
+            ToolSpec(
+                name="add_knowledge",
+                description="Add content to the knowledge base for future retrieval",
+                input_schema={
                     "type": "object",
                     "properties": {
                         "content": {
@@ -256,12 +458,13 @@ class MCPServer:
                         }
                     },
                     "required": ["content"]
-                }
-            },
-            "search_knowledge": {
-                "name": "search_knowledge",
-                "description": "Search the knowledge base for relevant information",
-                "input_schema": {
+                },
+                handler=self._tool_add_knowledge
+            ),
+            ToolSpec(
+                name="search_knowledge",
+                description="Search the knowledge base for relevant information",
+                input_schema={
                     "type": "object",
                     "properties": {
                         "query": {
@@ -275,12 +478,13 @@ class MCPServer:
                         }
                     },
                     "required": ["query"]
-                }
-            },
-            "add_memory": {
-                "name": "add_memory",
-                "description": "Add content to conversation memory",
-                "input_schema": {
+                },
+                handler=self._tool_search_knowledge
+            ),
+            ToolSpec(
+                name="add_memory",
+                description="Add content to conversation memory",
+                input_schema={
                     "type": "object",
                     "properties": {
                         "content": {
@@ -294,12 +498,13 @@ class MCPServer:
                         }
                     },
                     "required": ["content"]
-                }
-            },
-            "search_memory": {
-                "name": "search_memory",
-                "description": "Search conversation memory for relevant context",
-                "input_schema": {
+                },
+                handler=self._tool_add_memory
+            ),
+            ToolSpec(
+                name="search_memory",
+                description="Search conversation memory for relevant context",
+                input_schema={
                     "type": "object",
                     "properties": {
                         "query": {
@@ -313,12 +518,13 @@ class MCPServer:
                         }
                     },
                     "required": ["query"]
-                }
-            },
-            "rag.search": {
-                "name": "rag.search",
-                "description": "Search the RAG knowledge base for relevant content chunks",
-                "input_schema": {
+                },
+                handler=self._tool_search_memory
+            ),
+            ToolSpec(
+                name="rag.search",
+                description="Search the RAG knowledge base for relevant content chunks",
+                input_schema={
                     "type": "object",
                     "properties": {
                         "query": {
@@ -332,12 +538,13 @@ class MCPServer:
                         }
                     },
                     "required": ["query"]
-                }
-            },
-            "rag.ingest": {
-                "name": "rag.ingest",
-                "description": "Ingest files into the RAG knowledge base",
-                "input_schema": {
+                },
+                handler=self._tool_rag_search
+            ),
+            ToolSpec(
+                name="rag.ingest",
+                description="Ingest files into the RAG knowledge base",
+                input_schema={
                     "type": "object",
                     "properties": {
                         "paths": {
@@ -346,14 +553,34 @@ class MCPServer:
                                 "type": "string"
                             },
                             "description": "List of file or directory paths to ingest (default: knowledge/)"
+                        },
+                        "background": {
+                            "type": "boolean",
+                            "description": "Start a background job and return its job_id immediately (default: False)",
+                            "default": False
                         }
                     }
-                }
-            },
-            "orchestrator.route": {
-                "name": "orchestrator.route",
-                "description": "Route a goal to the most appropriate specialized agent",
-                "input_schema": {
+                },
+                handler=self._tool_rag_ingest
+            ),
+            ToolSpec(
+                name="rag.ingest_status",
+                description="Get the status of a background ingestion job, or list all jobs",
+                input_schema={
+                    "type": "object",
+                    "properties": {
+                        "job_id": {
+                            "type": "string",
+                            "description": "Job id returned by rag.ingest (omit to list all jobs)"
+                        }
+                    }
+                },
+                handler=self._tool_rag_ingest_status
+            ),
+            ToolSpec(
+                name="orchestrator.route",
+                description="Route a goal to the most appropriate specialized agent",
+                input_schema={
                     "type": "object",
                     "properties": {
                         "goal": {
@@ -367,12 +594,60 @@ class MCPServer:
                         }
                     },
                     "required": ["goal"]
-                }
-            },
-            "memory.log": {
-                "name": "memory.log",
-                "description": "Log an error or lesson learned to the memory system",
-                "input_schema": {
+                },
+                handler=self._tool_orchestrator_route
+            ),
+            ToolSpec(
+                name="orchestrator.route_batch",
+                description="Route many goals (e.g. the subtasks of an epic) in one call, through the MoE router "
+                            "or the LLM agent router; results are in input order with per-item errors",
+                input_schema={
+                    "type": "object",
+                    "properties": {
+                        "goals": {
+                            "type": "array",
+                            "description": "Goals to route: strings, or objects with goal and optional meta",
+                            "items": {
+                                "anyOf": [
+                                    {"type": "string"},
+                                    {
+                                        "type": "object",
+                                        "properties": {
+                                            "goal": {"type": "string"},
+                                            "meta": {"type": "object", "additionalProperties": True}
+                                        },
+                                        "required": ["goal"]
+                                    }
+                                ]
+                            },
+                            "maxItems": 100
+                        },
+                        "meta": {
+                            "type": "object",
+                            "description": "Metadata shared by goals that do not set their own",
+                            "additionalProperties": True
+                        },
+                        "router": {
+                            "type": "string",
+                            "enum": ["moe", "agent"],
+                            "description": "moe: expert routing as in orchestrator.route (default); "
+                                           "agent: LLM agent routing with one batched RAG lookup",
+                            "default": "moe"
+                        },
+                        "max_concurrency": {
+                            "type": "integer",
+                            "description": "LLM calls in flight with router=agent (default ROUTING_BATCH_CONCURRENCY)",
+                            "minimum": 1
+                        }
+                    },
+                    "required": ["goals"]
+                },
+                handler=self._tool_orchestrator_route_batch
+            ),
+            ToolSpec(
+                name="memory.log",
+                description="Log an error or lesson learned to the memory system",
+                input_schema={
                     "type": "object",
                     "properties": {
                         "event": {
@@ -389,12 +664,13 @@ class MCPServer:
                         }
                     },
                     "required": ["event", "detail"]
-                }
-            },
-            "auto_context_search": {
-                "name": "auto_context_search",
-                "description": "Automatically search for relevant context before implementing a task. Returns best practices, similar implementations, and lessons learned.",
-                "input_schema": {
+                },
+                handler=self._tool_memory_log
+            ),
+            ToolSpec(
+                name="auto_context_search",
+                description="Automatically search for relevant context before implementing a task. Returns best practices, similar implementations, and lessons learned.",
+                input_schema={
                     "type": "object",
                     "properties": {
                         "task_description": {
@@ -408,12 +684,13 @@ class MCPServer:
                         }
                     },
                     "required": ["task_description", "task_type"]
-                }
-            },
-            "suggest_improvements": {
-                "name": "suggest_improvements",
-                "description": "Analyze code and suggest improvements based on knowledge base and best practices",
-                "input_schema": {
+                },
+                handler=self._tool_auto_context_search
+            ),
+            ToolSpec(
+                name="suggest_improvements",
+                description="Analyze code and suggest improvements based on knowledge base and best practices",
+                input_schema={
                     "type": "object",
                     "properties": {
                         "code": {
@@ -422,17 +699,20 @@ class MCPServer:
                         },
                         "focus_areas": {
                             "type": "array",
-                            "items": {"type": "string"},
+                            "items": {
+                                "type": "string"
+                            },
                             "description": "Areas to focus on: 'performance', 'security', 'maintainability', 'testing'"
                         }
                     },
                     "required": ["code"]
-                }
-            },
-            "track_user_preferences": {
-                "name": "track_user_preferences",
-                "description": "Store and retrieve user coding preferences and style",
-                "input_schema": {
+                },
+                handler=self._tool_suggest_improvements
+            ),
+            ToolSpec(
+                name="track_user_preferences",
+                description="Store and retrieve user coding preferences and style",
+                input_schema={
                     "type": "object",
                     "properties": {
                         "action": {
@@ -450,51 +730,104 @@ class MCPServer:
                         }
                     },
                     "required": ["action", "preference_key"]
-                }
-            },
-        "analyze_project_context": {
-            "name": "analyze_project_context",
-            "description": "Analyze current project structure and provide contextual insights",
-            "input_schema": {
-                "type": "object",
-                "properties": {
-                    "analysis_type": {
-                        "type": "string",
-                        "description": "Type of analysis: 'architecture', 'dependencies', 'patterns', 'tech_stack'",
-                        "enum": ["architecture", "dependencies", "patterns", "tech_stack"]
+                },
+                handler=self._tool_track_user_preferences
+            ),
+            ToolSpec(
+                name="analyze_project_context",
+                description="Analyze current project structure and provide contextual insights",
+                input_schema={
+                    "type": "object",
+                    "properties": {
+                        "analysis_type": {
+                            "type": "string",
+                            "description": "Type of analysis: 'architecture', 'dependencies', 'patterns', 'tech_stack'",
+                            "enum": ["architecture", "dependencies", "patterns", "tech_stack"]
+                        }
+                    },
+                    "required": ["analysis_type"]
+                },
+                handler=self._tool_analyze_project_context
+            ),
+            ToolSpec(
+                name="health",
+                description="Basic health check endpoint",
+                input_schema={
+                    "type": "object",
+                    "properties": {}
+                },
+                handler=self._tool_health
+            ),
+            ToolSpec(
+                name="metrics",
+                description="Server metrics: per-tool calls, errors and latency percentiles, stage timings and cache hit rates",
+                input_schema={
+                    "type": "object",
+                    "properties": {
+                        "format": {
+                            "type": "string",
+                            "description": "Output format: 'json' (default) or 'prometheus'",
+                            "enum": ["json", "prometheus"]
+                        }
                     }
                 },
-                "required": ["analysis_type"]
-            }
-        },
-        "health": {
-            "name": "health",
-            "description": "Basic health check endpoint",
-            "input_schema": {
-                "type": "object",
-                "properties": {}
-            }
-        }
-        }
+                handler=self._tool_metrics
+            ),
+        ]
+        return {spec.name: spec for spec in specs}
+
+    def send_notification(self, method: str, params: dict[str, Any]) -> None:
+        """Send a JSON-RPC notification to the client (no-op without a transport)."""
+        if self.notifier is None:
+            return
+        self.notifier({
+            "jsonrpc": "2.0",
+            "method": method,
+            "params": params
+        })
+
+    def handle_notification(self, method: str, params: dict[str, Any]) -> None:
+        """Handle incoming JSON-RPC notifications (messages that expect no response)."""
+        if method == "notifications/cancelled":
+            # Cancels the background job started by the referenced request
+            self.ingest_jobs.cancel(
+                job_id=params.get("jobId"),
+                request_id=params.get("requestId")
+            )
 
-    async def handle_message(self, message: dict[str, Any]) -> dict[str, Any]:
+    async def handle_message(self, message: dict[str, Any]) -> Optional[dict[str, Any]]:
         """Handle incoming MCP messages."""
         # Reset metrics for new request
         self.reset_metrics()
 
-        # Check rate limit
-        if not await self.rate_limiter.is_allowed():
+        # Notifications carry no id and never get a response
+        method = message.get("method")
+        if "id" not in message and isinstance(method, str) and method.startswith("notifications/"):
+            self.handle_notification(method, message.get("params") or {})
+            return None
+
+        # Check rate limit (tools are charged their configured cost)
+        tool_name = None
+        if method == "tools/call":
+            tool_name = (message.get("params") or {}).get("name")
+        allowed, retry_after = self.rate_limiter.try_acquire(self.rate_limiter.cost_for(tool_name))
+        if not allowed:
+            metrics_registry.increment("rate_limited")
             return {
                 "jsonrpc": "2.0",
                 "id": message.get("id"),
                 "error": {
                     "code": -32001,
-                    "message": "Rate limit exceeded. Please wait before making more requests."
+                    "message": f"Rate limit exceeded. Retry after {retry_after:.2f}s.",
+                    "data": {
+                        "retry_after_sec": round(retry_after, 3),
+                        "cost": self.rate_limiter.cost_for(tool_name),
+                        "tool": tool_name
+                    }
                 }
             }
 
         msg_id = message.get("id")
-        method = message.get("method")
 
         if method == "initialize":
             return {
@@ -516,24 +849,29 @@ class MCPServer:
             return {
                 "jsonrpc": "2.0",
                 "id": msg_id,
-                "result": {
-                    "tools": list(self.tools.values())
-                }
+                "result": self._tools_list_result
             }
 
         elif method == "tools/call":
             params = message.get("params", {})
             tool_name = params.get("name")
             tool_args = params.get("arguments", {})
+            request_meta = {
+                "request_id": msg_id,
+                "progress_token": (params.get("_meta") or {}).get("progressToken")
+            }
 
+            start = time.perf_counter()
             try:
-                result = await self.call_tool(tool_name, tool_args)
+                result = await self.call_tool(tool_name, tool_args, request_meta)
+                metrics_registry.record_call(str(tool_name), time.perf_counter() - start)
                 return {
                     "jsonrpc": "2.0",
                     "id": msg_id,
                     "result": result
                 }
             except Exception as e:
+                metrics_registry.record_call(str(tool_name), time.perf_counter() - start, error=True)
                 return {
                     "jsonrpc": "2.0",
                     "id": msg_id,
@@ -552,130 +890,159 @@ class MCPServer:
             }
         }
 
-    async def call_tool(self, tool_name: str, args: dict[str, Any]) -> dict[str, Any]:
+    async def call_tool(self, tool_name: str, args: dict[str, Any],
+                        request_meta: dict[str, Any] | None = None) -> dict[str, Any]:
         """Execute a tool with given arguments."""
-        if tool_name == "add_knowledge":
-            doc_id = self.rag_server.add_knowledge(
-                args["content"],
-                args.get("metadata", {})
-            )
-            return {"document_id": doc_id, "status": "added"}
+        spec = self.tools.get(tool_name)
+        if spec is None:
+            raise ValueError(f"Unknown tool: {tool_name}")
+        return await spec.handler(args, request_meta or {})
 
-        elif tool_name == "search_knowledge":
-            results = self.rag_server.search_knowledge(
-                args["query"],
-                args.get("n_results", 5)
-            )
-            # Simulate reasoning metrics for search operations
-            self.update_metrics(
-                explored_nodes=3,
-                confidence=0.75
-            )
-            return {"results": results}
+    async def _tool_add_knowledge(self, args: dict[str, Any], request_meta: dict[str, Any]) -> dict[str, Any]:
+        doc_id = self.rag_server.add_knowledge(
+            args["content"],
+            args.get("metadata", {})
+        )
+        return {"document_id": doc_id, "status": "added"}
 
-        elif tool_name == "add_memory":
-            mem_id = self.rag_server.add_memory(
-                args["content"],
-                args.get("context", "general")
-            )
-            return {"memory_id": mem_id, "status": "added"}
+    async def _tool_search_knowledge(self, args: dict[str, Any], request_meta: dict[str, Any]) -> dict[str, Any]:
+        results = self.rag_server.search_knowledge(
+            args["query"],
+            args.get("n_results", 5)
+        )
+        return {"results": results}
 
-        elif tool_name == "search_memory":
-            results = self.rag_server.search_memory(
-                args["query"],
-                args.get("n_results", 3)
-            )
-            return {"results": results}
+    async def _tool_add_memory(self, args: dict[str, Any], request_meta: dict[str, Any]) -> dict[str, Any]:
+        mem_id = self.rag_server.add_memory(
+            args["content"],
+            args.get("context", "general")
+        )
+        return {"memory_id": mem_id, "status": "added"}
 
-        elif tool_name == "rag.search":
-            chunks = self.rag_server.search_knowledge_chunks(
-                args["query"],
-                args.get("k", 5)
-            )
-            return {"chunks": chunks}
-
-        elif tool_name == "rag.ingest":
-            paths = args.get("paths", ["knowledge/"])
-            result = self.ingest_files(paths)
-            return result
-
-        elif tool_name == "orchestrator.route":
-            goal = args["goal"]
-            meta = args.get("meta")
-
-            # Use MoE router for intelligent task routing
-            moe_result = self.moe_router.route_task(goal, meta)
-
-            # Update metrics with MoE results
-            self.update_metrics(
-                explored_nodes=len(moe_result.get('ranked_experts', [])),
-                merged_nodes=len(moe_result.get('expert_results', [])),
-                vote_distribution=moe_result.get('vote_distribution', {}),
-                confidence=moe_result.get('final_confidence', 0.0)
+    async def _tool_search_memory(self, args: dict[str, Any], request_meta: dict[str, Any]) -> dict[str, Any]:
+        results = self.rag_server.search_memory(
+            args["query"],
+            args.get("n_results", 3)
+        )
+        return {"results": results}
+
+    async def _tool_rag_search(self, args: dict[str, Any], request_meta: dict[str, Any]) -> dict[str, Any]:
+        chunks = self.rag_server.search_knowledge_chunks(
+            args["query"],
+            args.get("k", 5)
+        )
+        return {"chunks": chunks}
+
+    async def _tool_rag_ingest(self, args: dict[str, Any], request_meta: dict[str, Any]) -> dict[str, Any]:
+        paths = args.get("paths", ["knowledge/"])
+        if args.get("background", False):
+            job = self.ingest_jobs.start(
+                paths,
+                request_id=request_meta.get("request_id"),
+                progress_token=request_meta.get("progress_token")
             )
+            return {"ok": True, "job_id": job.job_id, "status": job.status}
+        # Waits for the ingest worker; keep the event loop free meanwhile
+        return await asyncio.to_thread(self.ingest_files, paths)
+
+    async def _tool_rag_ingest_status(self, args: dict[str, Any], request_meta: dict[str, Any]) -> dict[str, Any]:
+        job_id = args.get("job_id")
+        if job_id is None:
+            return {"jobs": self.ingest_jobs.list_jobs()}
+        job = self.ingest_jobs.get(job_id)
+        if job is None:
+            raise ValueError(f"Unknown ingestion job: {job_id}")
+        return job.to_dict()
+
+    async def _tool_orchestrator_route(self, args: dict[str, Any], request_meta: dict[str, Any]) -> dict[str, Any]:
+        goal = args["goal"]
+        meta = args.get("meta")
+
+        # Use MoE router for intelligent task routing
+        moe_result = await self.moe_router.route_task_async(goal, meta)
+
+        # Log MoE routing decision
+        print(f"MOE_ROUTING: chosen_experts={moe_result.get('chosen_experts', [])} vote_distribution={moe_result.get('vote_distribution', {})}", file=sys.stderr, flush=True)
+
+        return self._moe_response(moe_result)
+
+    def _moe_response(self, moe_result: dict[str, Any]) -> dict[str, Any]:
+        """Record a MoE routing decision in the metrics and shape the tool response."""
+        self.update_metrics(
+            vote_distribution=moe_result.get('vote_distribution', {}),
+            confidence=moe_result.get('final_confidence', 0.0)
+        )
+        return {
+            'routing_decision': moe_result,
+            'chosen_experts': moe_result.get('chosen_experts', []),
+            'confidence': moe_result.get('final_confidence', 0.0),
+            'winning_approach': moe_result.get('winning_approach', 'unknown')
+        }
 
-            # Log MoE routing decision
-            print(f"MOE_ROUTING: chosen_experts={moe_result.get('chosen_experts', [])} vote_distribution={moe_result.get('vote_distribution', {})}", file=sys.stderr, flush=True)
+    async def _tool_orchestrator_route_batch(self, args: dict[str, Any], request_meta: dict[str, Any]) -> dict[str, Any]:
+        items = args["goals"]
+        if not isinstance(items, list):
+            raise ValueError("goals must be an array")
+        if len(items) > 100:
+            raise ValueError(f"At most 100 goals per batch, got {len(items)}")
+
+        shared_meta = args.get("meta")
+        goals = [item.get("goal") if isinstance(item, dict) else item for item in items]
+        metas = [item.get("meta", shared_meta) if isinstance(item, dict) else shared_meta for item in items]
+
+        router_name = args.get("router", "moe")
+        if router_name == "agent":
+            # LLM agent routing: one batched RAG lookup, then concurrent LLM calls
+            results = await route_goals_async(goals, metas, args.get("max_concurrency"))
+        elif router_name == "moe":
+            # Same router and result shape as orchestrator.route; the batch is ranked in one pass
+            valid = [i for i, goal in enumerate(goals) if isinstance(goal, str)]
+            moe_results = await self.moe_router.route_tasks_async(
+                [goals[i] for i in valid], [metas[i] for i in valid]
+            ) if valid else []
+
+            results = [{"error": f"Goal must be a string, got {type(goal).__name__}"} for goal in goals]
+            for i, moe_result in zip(valid, moe_results, strict=True):
+                results[i] = self._moe_response(moe_result)
+        else:
+            raise ValueError(f"Unknown router '{router_name}' (expected moe or agent)")
+        errors = sum(1 for result in results if "error" in result)
 
-            # Return MoE result instead of old route_goal
-            return {
-                'routing_decision': moe_result,
-                'chosen_experts': moe_result.get('chosen_experts', []),
-                'confidence': moe_result.get('final_confidence', 0.0),
-                'winning_approach': moe_result.get('winning_approach', 'unknown')
-            }
+        print(f"ROUTE_BATCH: router={router_name} goals={len(goals)} errors={errors}", file=sys.stderr, flush=True)
 
-        elif tool_name == "memory.log":
-            event = args["event"]
-            detail = args["detail"]
-            hint = args.get("hint")
-            result = log_memory(event, detail, hint)
-            return result
-
-        elif tool_name == "auto_context_search":
-            task_description = args["task_description"]
-            task_type = args["task_type"]
-            result = await self.auto_context_search(task_description, task_type)
-            # Simulate complex reasoning for context search
-            self.update_metrics(
-                explored_nodes=7,
-                merged_nodes=2,
-                vote_distribution={"implement": 2, "debug": 1, "refactor": 1},
-                confidence=0.82
-            )
-            return result
-
-        elif tool_name == "suggest_improvements":
-            code = args["code"]
-            focus_areas = args.get("focus_areas", ["performance", "security", "maintainability"])
-            result = await self.suggest_improvements(code, focus_areas)
-            # Simulate reasoning for code analysis
-            self.update_metrics(
-                explored_nodes=5,
-                merged_nodes=1,
-                vote_distribution={"security": 3, "performance": 2, "maintainability": 1},
-                confidence=0.78
-            )
-            return result
+        return {
+            "results": [{"index": i, "goal": goal, **result} for i, (goal, result) in enumerate(zip(goals, results, strict=True))],
+            "count": len(results),
+            "errors": errors
+        }
 
-        elif tool_name == "track_user_preferences":
-            action = args["action"]
-            preference_key = args["preference_key"]
-            preference_value = args.get("preference_value")
-            result = self.track_user_preferences(action, preference_key, preference_value)
-            return result
+    async def _tool_memory_log(self, args: dict[str, Any], request_meta: dict[str, Any]) -> dict[str, Any]:
+        return log_memory(args["event"], args["detail"], args.get("hint"))
 
-        elif tool_name == "analyze_project_context":
-            analysis_type = args["analysis_type"]
-            result = await self.analyze_project_context(analysis_type)
-            return result
+    async def _tool_auto_context_search(self, args: dict[str, Any], request_meta: dict[str, Any]) -> dict[str, Any]:
+        return await self.auto_context_search(args["task_description"], args["task_type"])
 
-        elif tool_name == "health":
-            result = self.health()
-            return result
+    async def _tool_suggest_improvements(self, args: dict[str, Any], request_meta: dict[str, Any]) -> dict[str, Any]:
+        focus_areas = args.get("focus_areas", ["performance", "security", "maintainability"])
+        return await self.suggest_improvements(args["code"], focus_areas)
 
-        else:
-            raise ValueError(f"Unknown tool: {tool_name}")
+    async def _tool_track_user_preferences(self, args: dict[str, Any], request_meta: dict[str, Any]) -> dict[str, Any]:
+        return self.track_user_preferences(
+            args["action"],
+            args["preference_key"],
+            args.get("preference_value")
+        )
+
+    async def _tool_analyze_project_context(self, args: dict[str, Any], request_meta: dict[str, Any]) -> dict[str, Any]:
+        return await self.analyze_project_context(args["analysis_type"])
+
+    async def _tool_health(self, args: dict[str, Any], request_meta: dict[str, Any]) -> dict[str, Any]:
+        return self.health()
+
+    async def _tool_metrics(self, args: dict[str, Any], request_meta: dict[str, Any]) -> dict[str, Any]:
+        if args.get("format") == "prometheus":
+            return {"format": "prometheus", "text": metrics_registry.to_prometheus()}
+        return metrics_registry.snapshot()
 
     def health(self) -> dict[str, Any]:
         """Basic health check endpoint."""
@@ -684,46 +1051,25 @@ class MCPServer:
             "timestamp": "2024-01-01T12:00:00Z"
         }
 
-    def ingest_files(self, paths: list[str]) -> dict[str, Any]:
-        """Ingest files into the RAG knowledge base."""
-        try:
-            # Initialize ingestor if needed
+    def _get_ingestor(self) -> RAGIngestor:
+        """Get the shared ingestor, creating it on first use."""
+        with self._ingestor_lock:
             if self.rag_ingestor is None:
                 self.rag_ingestor = RAGIngestor(persist_directory="rag/store")
+            return self.rag_ingestor
 
-            total_count = 0
-            all_successful = True
-
-            for path_str in paths:
-                path = Path(path_str)
-
-                if path.is_file():
-                    result = self.rag_ingestor.ingest_file(path)
-                    if result.get("status") == "success":
-                        total_count += result.get("chunks_count", 0)
-                    else:
-                        all_successful = False
-                elif path.is_dir():
-                    results = self.rag_ingestor.ingest_directory(path)
-                    for result in results:
-                        if result.get("status") == "success":
-                            total_count += result.get("chunks_count", 0)
-                        else:
-                            all_successful = False
-                else:
-                    all_successful = False
-
-            return {
-                "ok": all_successful,
-                "count": total_count
-            }
-
-        except Exception as e:
-            return {
-                "ok": False,
-                "count": 0,
-                "error": str(e)
-            }
+    def ingest_files(self, paths: list[str]) -> dict[str, Any]:
+        """Ingest files into the RAG knowledge base, queued behind any background ingestion jobs."""
+        job = self.ingest_jobs.run(paths)
+        result = {
+            "ok": job.status == JOB_COMPLETED and not job.errors and not job.skipped,
+            "count": job.chunks
+        }
+        if job.error is not None:
+            result["error"] = job.error
+        elif job.status == JOB_CANCELLED:
+            result["error"] = "Ingestion cancelled"
+        return result
 
     async def auto_context_search(self, task_description: str, task_type: str) -> dict[str, Any]:
         """
@@ -881,30 +1227,10 @@ class MCPServer:
     def _generate_recommendations(self, task_type: str) -> list[str]:
         """Generate task-specific recommendations."""
         recommendations = {
-            "implement": [
-                "Start with RAG search for similar implementations",
-                "Write tests before/during implementation",
-                "Add proper type hints and error handling",
-                "Document complex logic with comments"
-            ],
-            "debug": [
-                "Search for similar bugs in memory",
-                "Check recent changes that might cause the issue",
-                "Add regression tests after fixing",
-                "Log the error and solution for future reference"
-            ],
-            "refactor": [
-                "Ensure all tests pass before starting",
-                "Make small, incremental changes",
-                "Preserve existing behavior",
-                "Update documentation and tests"
-            ],
-            "test": [
-                "Cover happy path and edge cases",
-                "Test error handling scenarios",
-                "Aim for >80% code coverage",
-                "Use descriptive test names"
-            ]
+            "implement": ["Start with RAG search for similar implementations", "Write tests before/during implementation", "Add proper type hints and error handling", "Document complex logic with comments"],
+            "debug": ["Search for similar bugs in memory", "Check recent changes that might cause the issue", "Add regression tests after fixing", "Log the error and solution for future reference"],
+            "refactor": ["Ensure all tests pass before starting", "Make small, incremental changes", "Preserve existing behavior", "Update documentation and tests"],
+            "test": ["Cover happy path and edge cases", "Test error handling scenarios", "Aim for >80% code coverage", "Use descriptive test names"]
         }
 
         return recommendations.get(task_type, ["Follow best practices from knowledge base"])
@@ -920,49 +1246,63 @@ def read_frame():
         headers[k.lower()]=v.strip()
     ln=int(headers.get("content-length","0"))
     body=sys.stdin.buffer.read(ln)
-    return json.loads(body)
+    return codec.loads(body)
+
+_write_lock = threading.Lock()
+
+def encode_message(obj: dict[str, Any]) -> bytes:
+    """Encode a JSON-RPC message, splicing in pre-serialized results as-is."""
+    result = obj.get("result")
+    if isinstance(result, PreSerialized) and set(obj) == {"jsonrpc", "id", "result"}:
+        return b'{"jsonrpc":"2.0","id":' + codec.dumps(obj["id"]) + b',"result":' + result.json + b'}'
+    return codec.dumps(obj)
 
 def write_frame(obj):
-    body=json.dumps(obj).encode("utf-8")
-    sys.stdout.buffer.write(f"Content-Length: {len(body)}\r\n\r\n".encode("ascii"))
-    sys.stdout.buffer.write(body); sys.stdout.flush()
+    with metrics_registry.timer("serialize"):
+        body=encode_message(obj)
+    # Background jobs emit notifications from worker threads
+    with _write_lock:
+        sys.stdout.buffer.write(f"Content-Length: {len(body)}\r\n\r\n".encode("ascii"))
+        sys.stdout.buffer.write(body); sys.stdout.flush()
 
 async def main() -> None:
     """Main MCP server loop."""
-    server = MCPServer()
-
-    while True:
-        try:
-            # Read message with Content-Length framing
-            message = await asyncio.get_event_loop().run_in_executor(None, read_frame)
-            if message is None:
-                break  # EOF, exit gracefully
+    server = MCPServer().start()
+    server.notifier = write_frame
 
-            response = await server.handle_message(message)
-            write_frame(response)
-
-            # Print reasoning KPIs as single-line JSON
-            metrics_json = json.dumps(server.metrics)
-            print(f"METRICS: {metrics_json}", file=sys.stderr, flush=True)
+    try:
+        while True:
+            try:
+                # Read message with Content-Length framing
+                message = await asyncio.get_event_loop().run_in_executor(None, read_frame)
+                if message is None:
+                    break  # EOF, exit gracefully
+
+                response = await server.handle_message(message)
+                if response is None:
+                    continue  # Notification, nothing to send back
+                write_frame(response)
+
+                # Print reasoning KPIs as single-line JSON when the request produced any
+                if any(server.metrics.values()):
+                    metrics_json = json.dumps(server.metrics)
+                    print(f"METRICS: {metrics_json}", file=sys.stderr, flush=True)
+
+            except codec.DecodeError:
+                error_response = {
+                    "jsonrpc": "2.0",
+                    "error": {"code": -32700, "message": "Parse error"}
+                }
+                write_frame(error_response)
+            except Exception as e:
+                error_response = {
+                    "jsonrpc": "2.0",
+                    "error": {"code": -32603, "message": f"Internal error: {str(e)}"}
+                }
+                write_frame(error_response)
+    finally:
+        server.close()
 
-        except json.JSONDecodeError:
-            error_response = {
-                "jsonrpc": "2.0",
-                "error": {"code": -32700, "message": "Parse error"}
-            }
-            write_frame(error_response)
-            # Print minimal metrics for error cases
-            error_metrics = json.dumps({"explored_nodes": 0, "merged_nodes": 0, "vote_distribution": {}, "confidence": 0.0})
-            print(f"METRICS: {error_metrics}", file=sys.stderr, flush=True)
-        except Exception as e:
-            error_response = {
-                "jsonrpc": "2.0",
-                "error": {"code": -32603, "message": f"Internal error: {str(e)}"}
-            }
-            write_frame(error_response)
-            # Print minimal metrics for error cases
-            error_metrics = json.dumps({"explored_nodes": 0, "merged_nodes": 0, "vote_distribution": {}, "confidence": 0.0})
-            print(f"METRICS: {error_metrics}", file=sys.stderr, flush=True)
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Incremental JSON parsing for streamed LLM responses.
+Emits each top-level member of a JSON object as soon as its value is
+complete, so early fields (the routing agent and confidence) can be acted
+on while later ones (reasoning, steps) are still being generated.
+"""
+
+import json
+from typing import Any
+
+
+class IncrementalJSONParser:
+    """
+    Parse a streamed JSON object member by member.
+
+    Text before the opening brace (e.g. a Markdown code fence) is skipped.
+    Scanning is linear in the total input: each character is looked at once,
+    and only completed members are handed to json.loads.
+    """
+
+    def __init__(self) -> None:
+        self.buffer = ""
+        self.fields: dict[str, Any] = {}
+        self.done = False
+        self._pos = 0
+        self._started = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._member_start = 0
+
+    def feed(self, text: str) -> list[tuple[str, Any]]:
+        """
+        Add streamed text.
+
+        Args:
+            text: Next piece of the response
+
+        Returns:
+            Top-level (key, value) pairs completed by this piece, in order
+        """
+        if self.done:
+            return []
+        self.buffer += text
+        completed: list[tuple[str, Any]] = []
+
+        buffer = self.buffer
+        for pos in range(self._pos, len(buffer)):
+            char = buffer[pos]
+
+            if not self._started:
+                if char == "{":
+                    self._started = True
+                    self._depth = 1
+                    self._member_start = pos + 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._complete_member(buffer[self._member_start:pos], completed)
+                    self.done = True
+                    self._pos = pos + 1
+                    return completed
+            elif char == "," and self._depth == 1:
+                self._complete_member(buffer[self._member_start:pos], completed)
+                self._member_start = pos + 1
+
+        self._pos = len(buffer)
+        return completed
+
+    def _complete_member(self, member: str, completed: list[tuple[str, Any]]) -> None:
+        if not member.strip():
+            return
+        for key, value in json.loads("{" + member + "}").items():
+            self.fields[key] = value
+            completed.append((key, value))
+
+    def result(self) -> dict[str, Any]:
+        """The whole object; raises ValueError if the stream ended early."""
+        if not self.done:
+            raise ValueError("Streamed JSON object is incomplete")
+        return dict(self.fields)
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Incremental index of workspace files for MoE routing features.
+A background thread walks the directory tree, re-listing only directories whose
+mtime changed since the last pass, and publishes an immutable snapshot of
+extension counts, test files and language mix per subtree. Routing reads the
+snapshot and the paths the client sent; it never touches the filesystem.
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass, field
+from pathlib import Path, PurePosixPath
+from typing import Any
+
+# Code file extensions and their language; other files count as extensions only
+LANGUAGES = {
+    "py": "python", "pyi": "python", "ts": "typescript", "tsx": "typescript", "js": "javascript",
+    "jsx": "javascript", "mjs": "javascript", "cjs": "javascript", "go": "go", "rs": "rust",
+    "java": "java", "kt": "kotlin", "rb": "ruby", "php": "php", "cs": "csharp", "c": "c", "h": "c",
+    "cc": "cpp", "cpp": "cpp", "hpp": "cpp", "swift": "swift", "scala": "scala", "sh": "shell", "sql": "sql",
+}
+
+SKIP_DIRS = frozenset({
+    ".git", ".hg", ".svn", "node_modules", "__pycache__", ".venv", "venv", ".tox", ".mypy_cache",
+    ".pytest_cache", ".ruff_cache", "dist", "build", ".next", "target",
+})
+
+TEST_DIRS = frozenset({"test", "tests", "__tests__", "spec", "specs"})
+
+# Request meta keys that carry file or directory paths (strings or lists of strings)
+CONTEXT_PATH_KEYS = ("open_files", "paths", "files", "path", "file")
+
+
+def file_extension(name: str) -> str:
+    """Lowercase extension without the dot ('' if none)."""
+    suffix = PurePosixPath(name).suffix
+    return suffix[1:].lower() if suffix else ""
+
+
+def is_test_file(path: str) -> bool:
+    """Whether a code file looks like a test (test_x.py, x_test.go, x.spec.ts, tests/...)."""
+    pure = PurePosixPath(path.replace("\\", "/"))
+    if file_extension(pure.name) not in LANGUAGES:
+        return False
+    name = pure.name.lower()
+    stem = name.split(".", 1)[0]
+    return (stem.startswith("test_") or stem.endswith(("_test", "_spec")) or ".test." in name
+            or ".spec." in name or any(part.lower() in TEST_DIRS for part in pure.parts[:-1]))
+
+
+def context_paths(context: Mapping[str, Any] | None) -> list[str]:
+    """Paths named in request meta, in CONTEXT_PATH_KEYS order."""
+    if not context:
+        return []
+    paths: list[str] = []
+    for key in CONTEXT_PATH_KEYS:
+        value = context.get(key)
+        if isinstance(value, str):
+            paths.append(value)
+        elif isinstance(value, (list, tuple)):
+            paths.extend(item for item in value if isinstance(item, str))
+    return paths
+
+
+@dataclass(frozen=True)
+class PathProfile:
+    """Extension and test-file counts for a set of files."""
+
+    extensions: Mapping[str, int] = field(default_factory=dict)
+    test_files: int = 0
+
+    @property
+    def files(self) -> int:
+        return sum(self.extensions.values())
+
+    def languages(self) -> dict[str, float]:
+        """Share of each language among the code files."""
+        counts: Counter[str] = Counter()
+        for ext, count in self.extensions.items():
+            if ext in LANGUAGES:
+                counts[LANGUAGES[ext]] += count
+        total = sum(counts.values())
+        return {language: round(count / total, 4) for language, count in counts.most_common()} if total else {}
+
+    def primary_extension(self) -> str:
+        """Most common code extension ('' if there is no code)."""
+        code = [(count, ext) for ext, count in self.extensions.items() if ext in LANGUAGES]
+        # Ties go to the alphabetically first extension, so the answer is stable
+        return min(code, key=lambda item: (-item[0], item[1]))[1] if code else ""
+
+
+@dataclass(frozen=True)
+class WorkspaceSnapshot:
+    """Immutable view of the index: a PathProfile per directory subtree ('' is the root)."""
+
+    root: Path
+    subtrees: Mapping[str, PathProfile] = field(default_factory=dict)
+    indexed_at: float = 0.0
+
+    @property
+    def workspace(self) -> PathProfile:
+        return self.subtrees.get("", PathProfile())
+
+    def _relative(self, path: str) -> str:
+        pure = PurePosixPath(path.replace("\\", "/"))
+        if pure.is_absolute():
+            try:
+                pure = pure.relative_to(PurePosixPath(self.root.as_posix()))
+            except ValueError:
+                return ""
+        return "" if str(pure) == "." else str(pure).strip("/")
+
+    def describe(self, paths: Iterable[str]) -> PathProfile:
+        """
+        Profile of the files named by some paths.
+
+        Files count by their own extension; directories the index knows count
+        as their whole subtree. Pure lookups: no filesystem access.
+        """
+        extensions: Counter[str] = Counter()
+        tests = 0
+        for path in paths:
+            relative = self._relative(path)
+            subtree = self.subtrees.get(relative) if relative else None
+            if subtree is not None:
+                extensions.update(subtree.extensions)
+                tests += subtree.test_files
+            elif file_extension(path):
+                extensions[file_extension(path)] += 1
+                tests += is_test_file(path)
+        return PathProfile(dict(extensions), tests)
+
+
+@dataclass
+class _DirEntry:
+    mtime_ns: int
+    extensions: Counter[str]
+    test_files: int
+    subdirs: tuple[str, ...]
+
+
+class WorkspaceIndex:
+    """
+    Workspace file index, refreshed incrementally in the background.
+
+    A directory is re-listed only when its mtime changes (files were added,
+    removed or renamed), so a pass over an unchanged tree is one stat per
+    directory. File contents never matter: features depend on names only.
+    """
+
+    def __init__(self, root: str | Path, skip_dirs: Iterable[str] = SKIP_DIRS, max_dirs: int = 20000) -> None:
+        """
+        Initialize index.
+
+        Args:
+            root: Workspace root
+            skip_dirs: Directory names never indexed
+            max_dirs: Directories indexed at most (bounds huge trees)
+        """
+        self.root = Path(root).resolve()
+        self.skip_dirs = frozenset(skip_dirs)
+        self.max_dirs = max_dirs
+        self.snapshot = WorkspaceSnapshot(self.root)
+        self.rescanned_dirs = 0  # Directories re-listed by the last refresh
+        self._dirs: dict[str, _DirEntry] = {}
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._interval_sec = 0.0
+
+    def _scan(self, relative: str, mtime_ns: int) -> _DirEntry:
+        extensions: Counter[str] = Counter()
+        tests = 0
+        subdirs = []
+        try:
+            with os.scandir(self.root / relative) as entries:
+                for entry in entries:
+                    child = f"{relative}/{entry.name}" if relative else entry.name
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name not in self.skip_dirs:
+                                subdirs.append(child)
+                        elif entry.is_file(follow_symlinks=False):
+                            extensions[file_extension(entry.name)] += 1
+                            tests += is_test_file(child)
+                    except OSError:
+                        continue
+        except OSError:
+            pass
+        return _DirEntry(mtime_ns, extensions, tests, tuple(sorted(subdirs)))
+
+    def refresh(self) -> bool:
+        """
+        Bring the index up to date and publish a new snapshot if anything changed.
+
+        Returns:
+            True if the snapshot changed
+        """
+        with self._refresh_lock:
+            seen: set[str] = set()
+            rescanned = 0
+            stack = [""]
+            while stack and len(seen) < self.max_dirs:
+                relative = stack.pop()
+                try:
+                    mtime_ns = os.stat(self.root / relative).st_mtime_ns
+                except OSError:
+                    continue
+                entry = self._dirs.get(relative)
+                if entry is None or entry.mtime_ns != mtime_ns:
+                    entry = self._scan(relative, mtime_ns)
+                    self._dirs[relative] = entry
+                    rescanned += 1
+                seen.add(relative)
+                stack.extend(entry.subdirs)
+
+            removed = set(self._dirs) - seen
+            for relative in removed:
+                del self._dirs[relative]
+            self.rescanned_dirs = rescanned
+            if not rescanned and not removed and self.snapshot.indexed_at:
+                return False
+            self.snapshot = self._summarize()
+            return True
+
+    def _summarize(self) -> WorkspaceSnapshot:
+        """Per-subtree profiles, accumulated bottom-up."""
+        extensions = {relative: Counter(entry.extensions) for relative, entry in self._dirs.items()}
+        tests = {relative: entry.test_files for relative, entry in self._dirs.items()}
+        for relative in sorted(self._dirs, key=lambda r: r.count("/") if r else -1, reverse=True):
+            if not relative:
+                continue
+            parent = relative.rpartition("/")[0]
+            if parent in extensions:
+                extensions[parent].update(extensions[relative])
+                tests[parent] += tests[relative]
+        subtrees = {
+            relative: PathProfile({ext: count for ext, count in counts.items() if count}, tests[relative])
+            for relative, counts in extensions.items()
+        }
+        return WorkspaceSnapshot(self.root, subtrees, time.time())
+
+    def start(self, interval_sec: float = 30.0) -> "WorkspaceIndex":
+        """Index in a background thread now and every interval_sec."""
+        if self._thread is None:
+            self._interval_sec = interval_sec
+            self._stop.clear()  # Restartable after stop()
+            self._thread = threading.Thread(target=self._loop, name="workspace-index", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop background refreshes."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self._interval_sec)
+            self._thread = None
+
+    def _loop(self) -> None:
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Warning: Workspace index refresh failed: {e}", file=sys.stderr)
+            if self._stop.wait(self._interval_sec):
+                return
@@ -383,20 +383,17 @@ class RAGIngestor:
 
         return result
 
-    def ingest_directory(self, directory_path: Path) -> list[dict[str, Any]]:
+    def iter_directory_files(self, directory_path: Path) -> list[Path]:
         """
-        Ingest all supported files in a directory.
+        List all supported, non-skipped files in a directory.
 
         Args:
-            directory_path: Path to directory to ingest
+            directory_path: Path to directory to scan
 
         Returns:
-            List of ingestion results
+            List of file paths that ingest_directory would process
         """
-        if not directory_path.exists() or not directory_path.is_dir():
-            return [{"status": "error", "error": f"Directory not found: {directory_path}"}]
-
-        results = []
+        files = []
         file_types = set(self.config['ingestion']['file_types'])
         skip_patterns = set(self.config['ingestion']['processing']['skip_patterns'])
 
@@ -415,10 +412,24 @@ class RAGIngestor:
 
             # Check file type
             if file_path.suffix.lower() in file_types:
-                result = self.ingest_file(file_path)
-                results.append(result)
+                files.append(file_path)
+
+        return files
+
+    def ingest_directory(self, directory_path: Path) -> list[dict[str, Any]]:
+        """
+        Ingest all supported files in a directory.
+
+        Args:
+            directory_path: Path to directory to ingest
+
+        Returns:
+            List of ingestion results
+        """
+        if not directory_path.exists() or not directory_path.is_dir():
+            return [{"status": "error", "error": f"Directory not found: {directory_path}"}]
 
-        return results
+        return [self.ingest_file(file_path) for file_path in self.iter_directory_files(directory_path)]
 
     def _normalize_path(self, path: str) -> Path:
         """Normalize path for cross-platform compatibility."""
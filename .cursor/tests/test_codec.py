@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the transport JSON codec.
+"""
+
+import json
+import unittest
+
+# Add current directory to path for imports
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from mcp.codec import ORJSON_AVAILABLE, DecodeError, get_codec
+
+
+class TestCodec(unittest.TestCase):
+    """Test stdlib and orjson codecs produce equivalent JSON."""
+
+    def codecs(self):
+        names = ["json"] + (["orjson"] if ORJSON_AVAILABLE else [])
+        return [get_codec(name) for name in names]
+
+    def test_round_trip(self):
+        """Test encoding to bytes and decoding back."""
+        message = {"jsonrpc": "2.0", "id": 1, "result": {"text": "zażółć", "n": [1, 2.5, None, True]}}
+        for codec in self.codecs():
+            with self.subTest(codec=codec.name):
+                encoded = codec.dumps(message)
+                self.assertIsInstance(encoded, bytes)
+                self.assertEqual(codec.loads(encoded), message)
+                self.assertEqual(json.loads(encoded), message)
+
+    def test_numpy_scores(self):
+        """Test that NumPy float32 scalars and arrays serialize directly."""
+        payload = {
+            "score": np.float32(0.5),
+            "scores": np.array([0.25, 0.75], dtype=np.float32),
+            "reversed": np.array([1.0, 2.0], dtype=np.float32)[::-1],
+        }
+        for codec in self.codecs():
+            with self.subTest(codec=codec.name):
+                decoded = codec.loads(codec.dumps(payload))
+                self.assertEqual(decoded["score"], 0.5)
+                self.assertEqual(decoded["scores"], [0.25, 0.75])
+                self.assertEqual(decoded["reversed"], [2.0, 1.0])
+
+    def test_decode_error(self):
+        """Test malformed input raises the shared DecodeError."""
+        for codec in self.codecs():
+            with self.subTest(codec=codec.name):
+                with self.assertRaises(DecodeError):
+                    codec.loads(b'{"jsonrpc": "2.0", invalid}')
+
+    def test_unserializable_object(self):
+        """Test unknown types raise TypeError on both paths."""
+        for codec in self.codecs():
+            with self.subTest(codec=codec.name):
+                with self.assertRaises(TypeError):
+                    codec.dumps({"obj": object()})
+
+
+if __name__ == '__main__':
+    unittest.main()
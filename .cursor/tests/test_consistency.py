@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the self-consistency sampling engine.
+"""
+
+import asyncio
+import time
+import unittest
+from pathlib import Path
+
+import yaml
+
+# Add current directory to path for imports
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mcp.consistency import DeterministicSampler, Sample, SelfConsistency
+from mcp.moe import MoERouter
+
+CURSOR_DIR = Path(__file__).resolve().parents[1]
+
+
+def scripted(answers, delays=None):
+    """Sampler returning answers[index] = (answer, confidence) after delays[index] seconds."""
+    calls = []
+    cancelled = []
+
+    async def sampler(index, temperature):
+        calls.append(index)
+        try:
+            await asyncio.sleep(delays[index] if delays else 0)
+        except asyncio.CancelledError:
+            cancelled.append(index)
+            raise
+        answer, confidence = answers[index]
+        if answer is None:
+            raise RuntimeError(f"sample {index} failed")
+        return Sample(answer, confidence)
+
+    sampler.calls = calls
+    sampler.cancelled = cancelled
+    return sampler
+
+
+class TestSelfConsistency(unittest.TestCase):
+    """Test SelfConsistency functionality."""
+
+    def test_early_stop_majority(self):
+        """Test that sampling stops once the remaining samples cannot flip the vote."""
+        sampler = scripted([("A", 1.0)] * 7)
+        engine = SelfConsistency(samples=7, vote="majority", max_concurrency=1)
+        result = asyncio.run(engine.run(sampler))
+
+        # 4 votes for A against 3 undrawn samples: the outcome is settled
+        self.assertEqual(result.answer, "A")
+        self.assertEqual(result.samples_drawn, 4)
+        self.assertEqual(result.samples_saved, 3)
+        self.assertTrue(result.early_stopped)
+        self.assertEqual(sampler.calls, [0, 1, 2, 3])
+
+    def test_no_early_stop_when_close(self):
+        """Test that a contested vote draws every sample."""
+        sampler = scripted([("A", 0.9), ("B", 0.9), ("A", 0.9), ("B", 0.8), ("A", 0.9)])
+        result = asyncio.run(SelfConsistency(samples=5, max_concurrency=1).run(sampler))
+
+        self.assertEqual(result.answer, "A")
+        self.assertEqual(result.samples_drawn, 5)
+        self.assertFalse(result.early_stopped)
+        self.assertAlmostEqual(result.votes["A"], 2.7)
+        self.assertAlmostEqual(result.confidence, 2.7 / 4.4)
+
+    def test_confidence_weighting(self):
+        """Test that confident minority answers can win."""
+        sampler = scripted([("A", 0.2), ("A", 0.2), ("B", 0.9)])
+        result = asyncio.run(SelfConsistency(samples=3).run(sampler))
+        self.assertEqual(result.answer, "B")
+        self.assertAlmostEqual(result.mean_answer_confidence, 0.9)
+
+        majority = asyncio.run(SelfConsistency(samples=3, vote="majority").run(scripted([("A", 0.2), ("A", 0.2), ("B", 0.9)])))
+        self.assertEqual(majority.answer, "A")
+
+    def test_answers_normalized(self):
+        """Test that answers differing in case and spacing share a vote."""
+        result = asyncio.run(SelfConsistency(samples=3).run(scripted([("Use  TDD", 0.5), ("use tdd", 0.5), ("Other", 0.9)])))
+        self.assertEqual(result.answer, "Use  TDD")
+        self.assertAlmostEqual(result.votes["Use  TDD"], 1.0)
+
+    def test_abstain_if_tie(self):
+        """Test tie handling."""
+        answers = [("A", 0.5), ("B", 0.5)]
+        result = asyncio.run(SelfConsistency(samples=2).run(scripted(answers)))
+        self.assertIsNone(result.answer)
+        self.assertTrue(result.abstained)
+
+        result = asyncio.run(SelfConsistency(samples=2, abstain_if_tie=False).run(scripted(answers)))
+        self.assertEqual(result.answer, "A")
+
+    def test_failures(self):
+        """Test that failed samples count as drawn but carry no vote."""
+        result = asyncio.run(SelfConsistency(samples=3).run(scripted([("A", 0.8), (None, 0.0), ("A", 0.7)])))
+        self.assertEqual(result.answer, "A")
+        self.assertEqual(result.samples_failed, 1)
+
+        result = asyncio.run(SelfConsistency(samples=2).run(scripted([(None, 0.0), (None, 0.0)])))
+        self.assertIsNone(result.answer)
+        self.assertIsInstance(result.last_error, RuntimeError)
+
+    def test_concurrent_with_cancellation(self):
+        """Test that samples run concurrently and stragglers are cancelled on early stop."""
+        sampler = scripted([("A", 1.0)] * 5, delays=[0.01, 0.01, 0.01, 0.01, 1.0])
+        start = time.perf_counter()
+        result = asyncio.run(SelfConsistency(samples=5, vote="majority").run(sampler))
+
+        self.assertLess(time.perf_counter() - start, 0.5)
+        self.assertEqual(result.samples_drawn, 4)
+        self.assertEqual(result.samples_saved, 1)
+        self.assertEqual(sampler.cancelled, [4])
+
+    def test_invalid_config(self):
+        """Test argument validation."""
+        with self.assertRaises(ValueError):
+            SelfConsistency(samples=0)
+        with self.assertRaises(ValueError):
+            SelfConsistency(vote="plurality")
+
+    def test_from_reasoning_config(self):
+        """Test loading the self_consistency section of reasoning.yml."""
+        with open(CURSOR_DIR / "rules" / "reasoning.yml", encoding="utf-8") as f:
+            config = yaml.safe_load(f)["reasoning"]["self_consistency"]
+        engine = SelfConsistency.from_config(config)
+        self.assertEqual(engine.samples, 7)
+        self.assertEqual(engine.vote, "confidence-weighted")
+        self.assertTrue(engine.abstain_if_tie)
+
+
+class TestDeterministicSampler(unittest.TestCase):
+    """Test the local stand-in model."""
+
+    def test_reproducible(self):
+        """Test that the same seed gives the same vote regardless of concurrency."""
+        distribution = {"coder": 0.5, "tester": 0.3, "planner": 0.2}
+        runs = [
+            asyncio.run(SelfConsistency(samples=9, max_concurrency=limit).run(
+                DeterministicSampler(distribution, prompt="fix bug", seed=3)
+            )).to_dict()
+            for limit in (1, 1, 9)
+        ]
+        self.assertEqual(runs[0], runs[1])
+        self.assertEqual(runs[0]["answer"], runs[2]["answer"])
+
+    def test_temperature(self):
+        """Test that low temperature concentrates samples on the mode."""
+        sampler = DeterministicSampler({"A": 0.6, "B": 0.4}, seed=1)
+
+        async def draw(temperature):
+            return [(await sampler(i, temperature)).answer for i in range(200)]
+        cold = asyncio.run(draw(0.1))
+        hot = asyncio.run(draw(2.0))
+        self.assertGreater(cold.count("A"), 190)
+        self.assertLess(hot.count("A"), 150)
+
+
+class TestMoEConsistency(unittest.TestCase):
+    """Test self-consistency inside MoE expert execution."""
+
+    def test_route_task_reports_samples(self):
+        """Test that each expert result carries its vote."""
+        router = MoERouter(str(CURSOR_DIR / "rules" / "moe.yml"))
+        self.assertEqual(router.consistency.samples, 5)
+        self.assertEqual(router.consistency.temperature, 0.8)
+
+        result = router.route_task("Fix the parser bug")
+        for expert_result in result["expert_results"]:
+            vote = expert_result["consistency"]
+            self.assertEqual(vote["samples_requested"], 5)
+            self.assertEqual(vote["samples_drawn"] + vote["samples_saved"], 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Unit tests for token-budgeted RAG context assembly.
+"""
+
+import unittest
+
+# Add current directory to path for imports
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mcp.context import ContextAssembler, overlap_words
+
+
+def make_document(n_words):
+    return [f"w{i}" for i in range(n_words)]
+
+
+class TestOverlapWords(unittest.TestCase):
+    """Test neighbour overlap detection."""
+
+    def test_overlap(self):
+        """Test that the shared suffix/prefix length is found."""
+        self.assertEqual(overlap_words(["a", "b", "c", "d"], ["c", "d", "e"]), 2)
+        self.assertEqual(overlap_words(["a", "b"], ["c", "d"]), 0)
+
+
+class TestContextAssembler(unittest.TestCase):
+    """Test ContextAssembler functionality."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.assembler = ContextAssembler(max_tokens=10000, encoding_model="cl100k_base", min_fill_tokens=8)
+        words = make_document(300)
+        # Chunks of 100 words overlapping by 20, as the ingestion chunker produces
+        self.chunks = [
+            {"text": " ".join(words[0:100]), "path": "doc.md", "idx": 0, "score": 0.80},
+            {"text": " ".join(words[80:180]), "path": "doc.md", "idx": 1, "score": 0.95},
+            {"text": " ".join(words[160:260]), "path": "doc.md", "idx": 2, "score": 0.75},
+        ]
+
+    def test_defaults_from_config(self):
+        """Test that the budget comes from rules/reasoning.yml."""
+        self.assertEqual(ContextAssembler().max_tokens, 16000)
+
+    def test_overlap_is_emitted_once(self):
+        """Test that text shared by neighbouring chunks appears once, in document order."""
+        context = self.assembler.assemble(self.chunks)
+        emitted = " ".join(line.split("] ", 1)[1].rsplit(" (relevance", 1)[0] for line in context.splitlines())
+
+        self.assertEqual(emitted.split(), make_document(260))
+
+    def test_duplicates_and_low_scores_dropped(self):
+        """Test exact duplicate removal and the relevance floor."""
+        chunks = [
+            {"text": "Use   migrations for schema changes", "path": "a.md", "idx": 0, "score": 0.9},
+            {"text": "Use migrations for schema changes", "path": "b.md", "idx": 4, "score": 0.8},
+            {"text": "Unrelated text", "path": "c.md", "idx": 0, "score": 0.2},
+        ]
+        context = self.assembler.assemble(chunks)
+
+        self.assertEqual(len(context.splitlines()), 1)
+        self.assertIn("[a.md]", context)
+
+    def test_budget_is_respected(self):
+        """Test that the packed context never exceeds the budget and keeps the best chunk."""
+        for budget in (40, 120, 200):
+            with self.subTest(budget=budget):
+                context = self.assembler.assemble(self.chunks, max_tokens=budget)
+                self.assertLessEqual(self.assembler.count_tokens(context), budget)
+                self.assertIn("w80", context.splitlines()[0] if budget < 120 else context)
+
+    def test_zero_budget(self):
+        """Test that no context is produced without budget."""
+        self.assertEqual(self.assembler.assemble(self.chunks, max_tokens=0), "")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Unit tests for memoized MoE expert results.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import yaml
+
+# Add current directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mcp.expert_cache import ExpertResultCache, expert_cache_key
+from mcp.moe import MoERouter
+
+CURSOR_DIR = Path(__file__).resolve().parents[1]
+FEATURES = ["file_ext", "goal_keywords", "test_presence"]
+
+
+class TestExpertResultCache(unittest.TestCase):
+    """Test ExpertResultCache functionality."""
+
+    def test_key(self):
+        """Test that keys normalize the goal and only depend on the relevant features."""
+        base = expert_cache_key("coder", "abc", "Fix the  bug.", {"file_ext": "py", "goal_keywords": "x"}, FEATURES)
+        same = expert_cache_key("coder", "abc", "fix the bug", {"file_ext": "py", "goal_keywords": "y",
+                                                                "other": 1}, FEATURES)
+        self.assertEqual(base, same)
+        for other in [expert_cache_key("tester", "abc", "fix the bug", {"file_ext": "py"}, FEATURES),
+                      expert_cache_key("coder", "abd", "fix the bug", {"file_ext": "py"}, FEATURES),
+                      expert_cache_key("coder", "abc", "fix the bug", {"file_ext": "ts"}, FEATURES)]:
+            self.assertNotEqual(base, other)
+
+    def test_ttl(self):
+        """Test that entries expire after ttl_sec."""
+        cache = ExpertResultCache(ttl_sec=10)
+        cache.put("k", {"response": "a"})
+        self.assertEqual(cache.get("k"), {"response": "a"})
+        with mock.patch("mcp.expert_cache.time.monotonic", return_value=time.monotonic() + 11):
+            self.assertIsNone(cache.get("k"))
+        self.assertEqual(cache.stats()["entries"], 0)
+
+    def test_size_aware_eviction(self):
+        """Test that least recently used entries are evicted to fit the byte budget."""
+        cache = ExpertResultCache(max_bytes=100)
+        small = {"response": "x" * 10}
+        cache.put("a", small)
+        cache.put("b", small)
+        cache.get("a")
+        cache.put("c", {"response": "y" * 50})
+
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNotNone(cache.get("c"))
+        self.assertLessEqual(cache.stats()["bytes"], 100)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+        cache.put("huge", {"response": "z" * 200})
+        self.assertIsNone(cache.get("huge"))
+        self.assertEqual(cache.stats()["entries"], 2)
+
+        cache.resize(max_bytes=70, ttl_sec=600)
+        self.assertEqual(cache.stats()["entries"], 1)
+        self.assertIsNotNone(cache.get("c"))
+
+    def test_disabled(self):
+        """Test that a zero budget caches nothing."""
+        cache = ExpertResultCache(max_bytes=0)
+        cache.put("k", {"response": "a"})
+        self.assertIsNone(cache.get("k"))
+
+
+class TestExpertCaching(unittest.TestCase):
+    """Test memoized expert runs inside MoERouter."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        shutil.copytree(CURSOR_DIR / "rules", Path(self.tmp.name) / "rules")
+        shutil.copytree(CURSOR_DIR / "prompts", Path(self.tmp.name) / "prompts")
+        self.calls = []
+
+        async def runner(expert, goal, score, temperature):
+            self.calls.append(expert["id"])
+            return {"confidence": 0.6, "response": expert["id"]}
+
+        self.router = MoERouter(str(Path(self.tmp.name) / "rules" / "moe.yml"), expert_runner=runner, seed=0)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_repeat_route_hits_cache(self):
+        """Test that a retried route reuses every expert result and reports the hits."""
+        first = self.router.route_task("Fix the parser bug")
+        runs = len(self.calls)
+        again = self.router.route_task("fix the parser bug.")
+
+        self.assertEqual(len(self.calls), runs)
+        self.assertEqual(first["cached_experts"], [])
+        self.assertEqual(again["cached_experts"], again["chosen_experts"])
+        self.assertTrue(all(result["cached"] for result in again["expert_results"]))
+        self.assertEqual(again["final_confidence"], first["final_confidence"])
+
+    def test_features_in_key(self):
+        """Test that the same goal on different files is not served from the cache."""
+        self.router.route_task("fix the parser bug", {"open_files": ["parser.py"]})
+        result = self.router.route_task("fix the parser bug", {"open_files": ["parser_test.py"]})
+        self.assertEqual(result["cached_experts"], [])
+
+    def test_prompt_change_misses(self):
+        """Test that editing an expert prompt invalidates only that expert's entries."""
+        self.router.route_task("fix the parser bug")
+        prompt = Path(self.tmp.name) / "prompts" / "experts" / "tester.md"
+        prompt.write_text("Write property-based tests.", encoding="utf-8")
+        stamp = time.time() + 5
+        os.utime(prompt, (stamp, stamp))
+        self.assertTrue(self.router.check_for_changes())
+
+        result = self.router.route_task("fix the parser bug")
+        self.assertEqual(result["cached_experts"], ["coder"])
+        self.assertFalse(next(r for r in result["expert_results"] if r["expert_id"] == "tester")["cached"])
+
+    def test_off_unless_configured(self):
+        """Test that a router config without expert_cache_max_bytes does not cache."""
+        path = Path(self.tmp.name) / "rules" / "moe.yml"
+        config = yaml.safe_load(path.read_text(encoding="utf-8"))
+        del config["moe"]["router"]["expert_cache_max_bytes"]
+        path.write_text(yaml.safe_dump(config), encoding="utf-8")
+
+        router = MoERouter(str(path), expert_runner=self.router.expert_runner, seed=0)
+        self.assertFalse(router.expert_cache.enabled)
+        router.route_task("fix the parser bug")
+        self.assertEqual(router.route_task("fix the parser bug")["cached_experts"], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
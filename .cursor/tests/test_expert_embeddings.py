@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Unit tests for embedding-based MoE expert preselection.
+"""
+
+import hashlib
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+# Add current directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mcp.expert_embeddings import ExpertEmbeddingIndex, expert_text
+from mcp.moe import MoERouter
+
+CURSOR_DIR = Path(__file__).resolve().parents[1]
+
+
+class BagOfWordsEmbedder:
+    """Deterministic local embedder: hashed word counts. Records every batch it embeds."""
+
+    DIM = 256
+
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, texts):
+        self.batches.append(list(texts))
+        vectors = np.zeros((len(texts), self.DIM))
+        for row, text in enumerate(texts):
+            for word in re.findall(r"[a-z]+", text.lower()):
+                vectors[row, int(hashlib.sha1(word.encode()).hexdigest(), 16) % self.DIM] += 1
+        return vectors.tolist()
+
+
+class TestExpertEmbeddingIndex(unittest.TestCase):
+    """Test the cached expert matrix."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.prompts_dir = Path(self.tmp.name)
+        shutil.copytree(CURSOR_DIR / "prompts" / "experts", self.prompts_dir / "experts")
+        self.experts = {
+            "security": {"id": "security", "prompt": "experts/security.md", "strengths": ["secrets_scan"]},
+            "tester": {"id": "tester", "prompt": "experts/tester.md", "strengths": ["tdd", "assertions"]},
+        }
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_expert_text(self):
+        """Test that the front matter is reduced to its title and strengths are appended."""
+        text = expert_text(self.experts["security"], self.prompts_dir)
+        self.assertTrue(text.startswith("Security Expert\n"))
+        self.assertIn("scan for secrets and dangerous calls", text)
+        self.assertNotIn("id: expert-security", text)
+        self.assertTrue(text.endswith("Strengths: secrets scan"))
+
+        missing = expert_text({"id": "ghost", "prompt": "experts/ghost.md", "strengths": []}, self.prompts_dir)
+        self.assertEqual(missing, "ghost\nStrengths: ")
+
+    def test_rebuild_embeds_only_changed_prompts(self):
+        """Test that vectors are cached by text hash."""
+        embedder = BagOfWordsEmbedder()
+        index = ExpertEmbeddingIndex(embedder, self.prompts_dir)
+
+        first = index.build(self.experts)
+        self.assertEqual(first.expert_ids, ("security", "tester"))
+        self.assertEqual(first.matrix.shape, (2, BagOfWordsEmbedder.DIM))
+        np.testing.assert_allclose(np.linalg.norm(first.matrix, axis=1), 1.0)
+
+        index.build(self.experts)
+        self.assertEqual(index.embedded, 2)
+
+        (self.prompts_dir / "experts" / "tester.md").write_text("Property-based tests.", encoding="utf-8")
+        second = index.build(self.experts)
+        self.assertEqual(index.embedded, 3)
+        self.assertEqual(len(embedder.batches[-1]), 1)
+        self.assertEqual(first.hashes[0], second.hashes[0])
+        self.assertNotEqual(first.hashes[1], second.hashes[1])
+
+    def test_select(self):
+        """Test cosine ranking with top_n and a similarity floor."""
+        embedder = BagOfWordsEmbedder()
+        embeddings = ExpertEmbeddingIndex(embedder, self.prompts_dir).build(self.experts)
+        goals = embedder(["scan for leaked secrets and dangerous calls", "tdd assertions", "zzz"])
+
+        picks = embeddings.select(goals, top_n=1, min_similarity=0.3)
+        self.assertEqual([[expert_id for expert_id, _ in row] for row in picks], [["security"], ["tester"], []])
+        self.assertGreater(picks[0][0][1], 0.3)
+
+        with self.assertRaises(ValueError):
+            embeddings.similarities([[1.0, 0.0]])
+
+
+class TestEmbeddingPreselection(unittest.TestCase):
+    """Test similarity preselection inside MoERouter."""
+
+    GOAL = "scan the repo for leaked secrets and dangerous calls"
+
+    def test_similarity_adds_candidates(self):
+        """Test that experts no rule picks join the candidates by prompt similarity."""
+        plain = MoERouter(str(CURSOR_DIR / "rules" / "moe.yml"))
+        self.assertNotIn("security", plain.route_task(self.GOAL)["candidates"])
+
+        embedder = BagOfWordsEmbedder()
+        router = MoERouter(str(CURSOR_DIR / "rules" / "moe.yml"), embedder=embedder)
+        result = router.route_task(self.GOAL)
+
+        self.assertEqual(result["similar_experts"][0][0], "security")
+        self.assertIn("security", result["candidates"])
+        self.assertEqual(result["ranked_experts"][0][0], "security")
+
+    def test_rule_picks_come_first(self):
+        """Test that rule picks keep their order ahead of similarity picks."""
+        router = MoERouter(str(CURSOR_DIR / "rules" / "moe.yml"), embedder=BagOfWordsEmbedder())
+        result = router.route_task("plan the roadmap and scan for secrets and dangerous calls")
+        self.assertEqual(result["candidates"][:2], ["planner", "tester"])
+        self.assertIn("security", result["candidates"])
+
+    def test_experts_embedded_once(self):
+        """Test that experts are embedded on first use and goals once per batch."""
+        embedder = BagOfWordsEmbedder()
+        router = MoERouter(str(CURSOR_DIR / "rules" / "moe.yml"), embedder=embedder)
+        self.assertEqual(embedder.batches, [])
+
+        router.route_tasks(["fix the parser bug", self.GOAL])
+        router.route_task("write the docs")
+        self.assertEqual([len(batch) for batch in embedder.batches], [6, 2, 1])
+        self.assertIsNotNone(router.snapshot.expert_embeddings)
+
+    def test_prompt_change_reloads(self):
+        """Test that editing a prompt file triggers a reload that re-embeds only that expert."""
+        with tempfile.TemporaryDirectory() as tmp:
+            shutil.copytree(CURSOR_DIR / "rules", Path(tmp) / "rules")
+            shutil.copytree(CURSOR_DIR / "prompts", Path(tmp) / "prompts")
+            embedder = BagOfWordsEmbedder()
+            router = MoERouter(str(Path(tmp) / "rules" / "moe.yml"), embedder=embedder)
+            router.route_task(self.GOAL)
+            self.assertFalse(router.check_for_changes())
+
+            prompt = Path(tmp) / "prompts" / "experts" / "tester.md"
+            prompt.write_text("Hunt leaked secrets with tests.", encoding="utf-8")
+            stamp = time.time() + 5
+            os.utime(prompt, (stamp, stamp))
+
+            self.assertTrue(router.check_for_changes())
+            self.assertEqual(router.snapshot.version, 2)
+            self.assertEqual(router.embedding_index.embedded, 7)
+            self.assertEqual(len(embedder.batches[-1]), 1)
+            self.assertIsNotNone(router.snapshot.expert_embeddings)
+
+    def test_embedder_failure_falls_back_to_rules(self):
+        """Test that a failing embedder leaves routing to the rules."""
+        def broken(texts):
+            raise RuntimeError("model unavailable")
+
+        router = MoERouter(str(CURSOR_DIR / "rules" / "moe.yml"), embedder=broken)
+        result = router.route_task("fix the parser bug")
+        self.assertEqual(result["similar_experts"], [])
+        self.assertEqual(result["candidates"], ["coder", "tester"])
+
+
+if __name__ == "__main__":
+    unittest.main()
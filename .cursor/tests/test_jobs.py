@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Unit tests for background ingestion jobs.
+"""
+
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+# Add current directory to path for imports
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mcp.jobs import (
+    JOB_CANCELLED,
+    JOB_COMPLETED,
+    IngestJobManager,
+)
+
+
+class FakeIngestor:
+    """Ingestor stand-in that optionally blocks on each file."""
+
+    def __init__(self, gate: threading.Event | None = None) -> None:
+        self.gate = gate
+        self.ingested: list[Path] = []
+        self.started = threading.Event()
+
+    def iter_directory_files(self, directory_path: Path) -> list[Path]:
+        return sorted(p for p in directory_path.rglob("*.md"))
+
+    def ingest_file(self, file_path: Path) -> dict:
+        self.started.set()
+        if self.gate is not None:
+            self.gate.wait(timeout=5)
+        self.ingested.append(file_path)
+        return {"status": "success", "chunks_count": 2}
+
+
+class TestIngestJobManager(unittest.TestCase):
+    """Test IngestJobManager functionality."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = Path(tempfile.mkdtemp())
+        for i in range(3):
+            (self.temp_dir / f"doc{i}.md").write_text(f"# Doc {i}")
+        self.notifications = []
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        import shutil
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _notify(self, method, params):
+        self.notifications.append((method, params))
+
+    def test_job_completes_with_progress(self):
+        """Test that a job ingests all files and reports progress."""
+        ingestor = FakeIngestor()
+        manager = IngestJobManager(lambda: ingestor, notify=self._notify)
+
+        job = manager.start([str(self.temp_dir)], request_id=7, progress_token="tok")
+        manager.wait(job.job_id, timeout=5)
+
+        self.assertEqual(job.status, JOB_COMPLETED)
+        self.assertEqual(job.files_total, 3)
+        self.assertEqual(job.files_done, 3)
+        self.assertEqual(job.chunks, 6)
+
+        methods = {method for method, _ in self.notifications}
+        self.assertEqual(methods, {"notifications/progress"})
+        last = self.notifications[-1][1]
+        self.assertEqual(last["progressToken"], "tok")
+        self.assertEqual(last["progress"], 3)
+        self.assertEqual(last["total"], 3)
+        self.assertEqual(last["status"], JOB_COMPLETED)
+
+    def test_cancel_by_request_id_stops_between_files(self):
+        """Test that cancellation takes effect before the next file."""
+        gate = threading.Event()
+        ingestor = FakeIngestor(gate)
+        manager = IngestJobManager(lambda: ingestor)
+
+        job = manager.start([str(self.temp_dir)], request_id="req-1")
+        self.assertTrue(ingestor.started.wait(timeout=5))
+
+        self.assertTrue(manager.cancel(request_id="req-1"))
+        gate.set()
+        manager.wait(job.job_id, timeout=5)
+
+        self.assertEqual(job.status, JOB_CANCELLED)
+        self.assertEqual(job.files_done, 1)
+        self.assertEqual(len(ingestor.ingested), 1)
+
+    def test_missing_path_recorded(self):
+        """Test that missing paths are reported as job errors."""
+        manager = IngestJobManager(FakeIngestor)
+
+        job = manager.start([str(self.temp_dir / "missing")])
+        manager.wait(job.job_id, timeout=5)
+
+        self.assertEqual(job.status, JOB_COMPLETED)
+        self.assertEqual(job.files_total, 0)
+        self.assertEqual(len(job.errors), 1)
+
+    def test_status_payload(self):
+        """Test job status listing and payload structure."""
+        manager = IngestJobManager(FakeIngestor)
+
+        job = manager.start([str(self.temp_dir)])
+        manager.wait(job.job_id, timeout=5)
+
+        status = manager.get(job.job_id).to_dict()
+        for key in ("job_id", "status", "files_total", "files_done", "chunks", "eta_sec"):
+            self.assertIn(key, status)
+        self.assertEqual(status["eta_sec"], 0.0)
+        self.assertEqual([j["job_id"] for j in manager.list_jobs()], [job.job_id])
+
+    def test_no_progress_without_token(self):
+        """Test that jobs started without a client progress token send no notifications."""
+        manager = IngestJobManager(FakeIngestor, notify=self._notify)
+
+        job = manager.start([str(self.temp_dir)])
+        manager.wait(job.job_id, timeout=5)
+
+        self.assertEqual(job.status, JOB_COMPLETED)
+        self.assertIsNone(job.progress_token)
+        self.assertEqual(self.notifications, [])
+
+    def test_run_queues_behind_background_job(self):
+        """Test that synchronous ingestion waits for the running job instead of overlapping it."""
+        gate = threading.Event()
+        ingestor = FakeIngestor(gate)
+        manager = IngestJobManager(lambda: ingestor)
+
+        background = manager.start([str(self.temp_dir / "doc0.md")])
+        self.assertTrue(ingestor.started.wait(timeout=5))
+        threading.Timer(0.1, gate.set).start()
+
+        job = manager.run([str(self.temp_dir / "doc1.md")], timeout=5)
+        self.assertEqual(background.status, JOB_COMPLETED)
+        self.assertEqual(job.status, JOB_COMPLETED)
+        self.assertEqual([p.name for p in ingestor.ingested], ["doc0.md", "doc1.md"])
+
+    def test_wait_on_job_dropped_by_shutdown(self):
+        """Test that a queued job cancelled by shutdown() is reported cancelled instead of raising."""
+        gate = threading.Event()
+        ingestor = FakeIngestor(gate)
+        manager = IngestJobManager(lambda: ingestor)
+
+        manager.start([str(self.temp_dir / "doc0.md")])
+        self.assertTrue(ingestor.started.wait(timeout=5))
+        queued = manager.start([str(self.temp_dir / "doc1.md")])
+        manager.shutdown()
+        gate.set()
+
+        self.assertIs(manager.wait(queued.job_id, timeout=5), queued)
+        self.assertEqual(queued.to_dict()["status"], JOB_CANCELLED)
+        self.assertIsNotNone(queued.finished_at)
+
+    def test_cancel_unknown_job(self):
+        """Test cancelling an unknown job is a no-op."""
+        manager = IngestJobManager(FakeIngestor)
+        self.assertFalse(manager.cancel(job_id="nope"))
+        self.assertFalse(manager.cancel(request_id=123))
+
+
+if __name__ == '__main__':
+    unittest.main()
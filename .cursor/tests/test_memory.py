@@ -174,6 +174,8 @@ class TestMemoryIntegration(unittest.TestCase):
 
         server = MCPServer()
 
+        self.addCleanup(server.close)
+
         async def test():
             # Test tools/list includes memory.log
             message = {
@@ -196,6 +198,8 @@ class TestMemoryIntegration(unittest.TestCase):
 
         server = MCPServer()
 
+        self.addCleanup(server.close)
+
         async def test():
             message = {
                 "jsonrpc": "2.0",
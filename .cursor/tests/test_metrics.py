@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Unit tests for server metrics and Prometheus export.
+"""
+
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+# Add current directory to path for imports
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mcp.metrics import LatencyHistogram, MetricsRegistry, PrometheusFileExporter
+
+
+class TestLatencyHistogram(unittest.TestCase):
+    """Test LatencyHistogram functionality."""
+
+    def test_empty_histogram(self):
+        """Test percentiles of an empty histogram."""
+        histogram = LatencyHistogram()
+        self.assertEqual(histogram.percentile(0.5), 0.0)
+        self.assertEqual(histogram.summary()["count"], 0)
+
+    def test_percentiles_ordered_and_bounded(self):
+        """Test that percentiles are monotonic and within the observed range."""
+        histogram = LatencyHistogram()
+        for i in range(1, 101):
+            histogram.observe(i / 1000)  # 1ms .. 100ms
+
+        p50 = histogram.percentile(0.50)
+        p95 = histogram.percentile(0.95)
+        p99 = histogram.percentile(0.99)
+
+        self.assertLessEqual(p50, p95)
+        self.assertLessEqual(p95, p99)
+        self.assertGreaterEqual(p50, 0.001)
+        self.assertLessEqual(p99, 0.1)
+        # Bucket interpolation should land in the right neighbourhood
+        self.assertAlmostEqual(p50, 0.05, delta=0.02)
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    """Test MetricsRegistry functionality."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.registry = MetricsRegistry()
+
+    def test_tool_calls_and_errors(self):
+        """Test per-tool counts and error rate."""
+        self.registry.record_call("rag.search", 0.01)
+        self.registry.record_call("rag.search", 0.02)
+        self.registry.record_call("rag.search", 0.03, error=True)
+
+        tool = self.registry.snapshot()["tools"]["rag.search"]
+        self.assertEqual(tool["calls"], 3)
+        self.assertEqual(tool["errors"], 1)
+        self.assertAlmostEqual(tool["error_rate"], 0.3333, places=3)
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            self.assertIn(key, tool["latency"])
+
+    def test_stage_timer_and_cache(self):
+        """Test stage timers and cache hit rates."""
+        with self.registry.timer("embed"):
+            pass
+        self.registry.record_cache("routing", hit=True)
+        self.registry.record_cache("routing", hit=False)
+
+        snapshot = self.registry.snapshot()
+        self.assertEqual(snapshot["stages"]["embed"]["count"], 1)
+        self.assertEqual(snapshot["caches"]["routing"]["hit_rate"], 0.5)
+
+    def test_prometheus_format(self):
+        """Test the Prometheus text exposition output."""
+        self.registry.record_call("health", 0.002)
+        text = self.registry.to_prometheus()
+
+        self.assertIn('mcp_tool_calls_total{tool="health"} 1', text)
+        self.assertIn('mcp_tool_latency_seconds_bucket{tool="health",le="+Inf"} 1', text)
+        self.assertIn('mcp_tool_latency_seconds_count{tool="health"} 1', text)
+        self.assertIn("# TYPE mcp_tool_latency_seconds histogram", text)
+
+    def test_reset(self):
+        """Test clearing all metrics."""
+        self.registry.record_call("health", 0.001)
+        self.registry.reset()
+        self.assertEqual(self.registry.snapshot()["tools"], {})
+
+
+class TestPrometheusFileExporter(unittest.TestCase):
+    """Test PrometheusFileExporter functionality."""
+
+    def test_write_file(self):
+        """Test that the exporter writes the file atomically."""
+        registry = MetricsRegistry()
+        registry.record_call("health", 0.001)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / "metrics" / "mcp.prom"
+            exporter = PrometheusFileExporter(registry, path, interval_sec=0.05).start()
+            exporter.stop()
+
+            self.assertTrue(path.exists())
+            self.assertIn("mcp_tool_calls_total", path.read_text(encoding="utf-8"))
+            self.assertFalse(path.with_suffix(".prom.tmp").exists())
+
+    def test_restart_after_stop(self):
+        """Test that a stopped exporter can be started again and keeps writing."""
+        registry = MetricsRegistry()
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / "mcp.prom"
+            exporter = PrometheusFileExporter(registry, path, interval_sec=0.01).start()
+            exporter.stop()
+            exporter.start()
+            try:
+                registry.record_call("after_restart", 0.001)
+                deadline = time.time() + 2.0
+                while "after_restart" not in path.read_text(encoding="utf-8") and time.time() < deadline:
+                    time.sleep(0.01)
+                self.assertIn("after_restart", path.read_text(encoding="utf-8"))
+            finally:
+                exporter.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the MoE router and its rule compiler.
+"""
+
+import asyncio
+import random
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+import yaml
+
+# Add current directory to path for imports
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mcp.consistency import SelfConsistency
+from mcp.moe import MoERouter
+from mcp.moe_rules import RuleSyntaxError, compile_condition, compile_rules
+
+MOE_CONFIG_PATH = Path(__file__).resolve().parents[1] / "rules" / "moe.yml"
+
+
+class TestRuleCompiler(unittest.TestCase):
+    """Test rule condition compilation."""
+
+    def test_regex(self):
+        """Test ~= with and without the i flag."""
+        predicate = compile_condition("goal_keywords ~= /(spec|plan)/i")
+        self.assertTrue(predicate({"goal_keywords": "Write the PLAN"}))
+        self.assertFalse(predicate({"goal_keywords": "fix it"}))
+        self.assertFalse(compile_condition("goal_keywords ~= /plan/")({"goal_keywords": "PLAN"}))
+        self.assertTrue(compile_condition(r"path ~= /src\/app/")({"path": "src/app/main.py"}))
+
+    def test_equality(self):
+        """Test == against booleans, strings and numbers."""
+        self.assertTrue(compile_condition("requires_rag == true")({"requires_rag": True}))
+        self.assertFalse(compile_condition("requires_rag == true")({"requires_rag": False}))
+        self.assertTrue(compile_condition("file_ext == 'PY'")({"file_ext": "py"}))
+        self.assertTrue(compile_condition("count == 3")({"count": 3}))
+        self.assertFalse(compile_condition("missing == true")({}))
+
+    def test_membership(self):
+        """Test in with a list of literals."""
+        predicate = compile_condition("file_ext in ['py', \"ts\", js]")
+        self.assertTrue(predicate({"file_ext": "ts"}))
+        self.assertTrue(predicate({"file_ext": "js"}))
+        self.assertFalse(predicate({"file_ext": "go"}))
+
+    def test_compound(self):
+        """Test && and || precedence and grouping."""
+        rule = compile_condition("file_ext in ['py','ts','js'] && goal_keywords ~= /(fix|bug|impl)/i")
+        self.assertTrue(rule({"file_ext": "py", "goal_keywords": "fix the bug"}))
+        self.assertFalse(rule({"file_ext": "go", "goal_keywords": "fix the bug"}))
+        self.assertFalse(rule({"file_ext": "py", "goal_keywords": "write docs"}))
+
+        # && binds tighter than ||
+        loose = compile_condition("a == 1 || b == 1 && c == 1")
+        self.assertTrue(loose({"a": 1, "b": 0, "c": 0}))
+        self.assertFalse(loose({"a": 0, "b": 1, "c": 0}))
+        grouped = compile_condition("(a == 1 || b == 1) && c == 1")
+        self.assertFalse(grouped({"a": 1, "b": 0, "c": 0}))
+        self.assertTrue(grouped({"a": 0, "b": 1, "c": 1}))
+
+    def test_malformed(self):
+        """Test that malformed conditions raise with a position."""
+        cases = {
+            "": "empty condition",
+            "goal_keywords ~= (fix)": "expected a /regex/",
+            "goal_keywords ~= /(fix/i": "invalid regex",
+            "goal_keywords ~= /fix/q": "unknown regex flag",
+            "file_ext in ['py', 'ts'": "expected ']'",
+            "file_ext = 'py'": "unexpected character",
+            "file_ext == 'py' &&": "expected a feature name, got end of rule",
+            "file_ext 'py'": "expected '~=', '==' or 'in'",
+            "(a == 1": "expected ')'",
+            "a == 1 b == 2": "unexpected 'b'",
+        }
+        for condition, message in cases.items():
+            with self.subTest(condition=condition):
+                with self.assertRaises(RuleSyntaxError) as ctx:
+                    compile_condition(condition)
+                self.assertIn(message, str(ctx.exception))
+
+    def test_unknown_feature(self):
+        """Test that feature names are checked when known features are given."""
+        with self.assertRaises(RuleSyntaxError) as ctx:
+            compile_condition("goal_keyword ~= /fix/", known_features=["goal_keywords"])
+        self.assertIn("unknown feature 'goal_keyword'", str(ctx.exception))
+        self.assertEqual(ctx.exception.column, 0)
+
+    def test_compile_rules(self):
+        """Test rule list validation."""
+        rules = compile_rules([{"if": "a == 1", "pick": ["x", "y"]}], known_experts=["x", "y"])
+        self.assertEqual(rules[0].pick, ("x", "y"))
+        self.assertTrue(rules[0].matches({"a": 1}))
+
+        with self.assertRaises(RuleSyntaxError):
+            compile_rules([{"if": "a == 1", "pick": ["z"]}], known_experts=["x"])
+        with self.assertRaises(RuleSyntaxError):
+            compile_rules([{"pick": ["x"]}])
+        with self.assertRaises(RuleSyntaxError):
+            compile_rules([{"if": "a == 1", "pick": []}])
+
+
+class TestMoERouter(unittest.TestCase):
+    """Test MoERouter functionality."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.router = MoERouter(str(MOE_CONFIG_PATH))
+
+    def test_rules_compiled_at_load(self):
+        """Test that every configured rule is compiled."""
+        self.assertEqual(len(self.router.compiled_rules), len(self.router.routing_rules))
+
+    def test_compound_rule_fires(self):
+        """Test the file_ext && goal_keywords rule from moe.yml."""
+        picks = self.router._preselect_experts({"file_ext": "py", "goal_keywords": "fix the login bug"})
+        self.assertEqual(picks, ["coder", "tester"])
+
+        # Wrong extension: the compound rule does not fire, so the default applies
+        picks = self.router._preselect_experts({"file_ext": "md", "goal_keywords": "fix the login bug"})
+        self.assertEqual(picks, ["coder"])
+
+    def test_route_task(self):
+        """Test the full pipeline on a planning goal."""
+        result = self.router.route_task("Write a spec and roadmap for the API")
+        self.assertEqual(result["candidates"], ["planner", "tester"])
+        self.assertTrue(result["chosen_experts"])
+
+    def test_sync_route_uses_shared_loop(self):
+        """Test that route_task runs on the shared background loop, not a loop of its own."""
+        from mcp.background import background_loop
+
+        async def runner(expert, goal, score, temperature):
+            loops.append(asyncio.get_running_loop())
+            return {"confidence": 0.8, "response": expert["id"]}
+
+        loops = []
+        MoERouter(str(MOE_CONFIG_PATH), expert_runner=runner).route_task("fix the login bug")
+        self.assertTrue(loops)
+        self.assertTrue(all(loop is background_loop.loop for loop in loops))
+
+    def test_import_does_not_load_orchestrator(self):
+        """Test that importing the MoE router does not build the orchestrator's globals."""
+        import subprocess
+        code = "import sys, mcp.moe; sys.exit('mcp.orchestrator' in sys.modules)"
+        cwd = str(Path(__file__).resolve().parents[1])
+        self.assertEqual(subprocess.run([sys.executable, "-c", code], cwd=cwd).returncode, 0)
+
+    def test_evaluate_condition(self):
+        """Test ad-hoc condition evaluation."""
+        self.assertTrue(self.router._evaluate_condition("requires_rag == true", {"requires_rag": True}))
+
+    def test_malformed_config(self):
+        """Test that a malformed rule fails when the config is loaded."""
+        with open(MOE_CONFIG_PATH, encoding="utf-8") as f:
+            config = yaml.safe_load(f)
+        config["moe"]["routing_rules"].append({"if": "file_ext in ['py'", "pick": ["coder"]})
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "moe.yml"
+            path.write_text(yaml.safe_dump(config), encoding="utf-8")
+            with self.assertRaises(RuleSyntaxError):
+                MoERouter(str(path))
+
+
+class TestBatchRanking(unittest.TestCase):
+    """Test vectorized batch ranking."""
+
+    WORDS = ["fix", "bug", "impl", "plan", "spec", "roadmap", "refactor", "perf", "research", "docs",
+             "security", "auth", "test", "tdd", "assertions", "cleanup", "evidence", "citation",
+             "decompose", "safe_edit", "the", "parser", "api"]
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.router = MoERouter(str(MOE_CONFIG_PATH))
+
+    def test_matches_single_ranking(self):
+        """Test that batch ranking gives the single-goal top_k for every goal."""
+        rng = random.Random(0)
+        goals = [" ".join(rng.choice(self.WORDS) for _ in range(rng.randint(1, 6))) for _ in range(300)]
+        features_list = [self.router._extract_features(goal) for goal in goals]
+        candidates_list = [self.router._preselect_experts(features) for features in features_list]
+        # Exercise candidate lists beyond what the rules produce, unknown ids included
+        candidates_list[0] = list(self.router.experts) + ["ghost"]
+        candidates_list[1] = ["security", "planner"]
+
+        batch = self.router._rank_experts_batch(candidates_list, features_list)
+        for goal, candidates, features, ranked in zip(goals, candidates_list, features_list, batch):
+            with self.subTest(goal=goal):
+                self.assertEqual(ranked, self.router._rank_experts(candidates, features))
+
+    def test_empty_batch(self):
+        """Test ranking an empty batch."""
+        self.assertEqual(self.router._rank_experts_batch([], []), [])
+
+    def test_route_tasks(self):
+        """Test the batch pipeline returns one decision per goal, in order."""
+        goals = ["Write a spec for the API", "Refactor the perf hotspot", "Research the docs"]
+        results = self.router.route_tasks(goals)
+
+        self.assertEqual([r["goal"] for r in results], goals)
+        for goal, result in zip(goals, results):
+            single = self.router.route_task(goal)
+            self.assertEqual(result["candidates"], single["candidates"])
+            self.assertEqual(result["ranked_experts"], single["ranked_experts"])
+            self.assertIn("vote_distribution", result)
+
+        with self.assertRaises(ValueError):
+            self.router.route_tasks(goals, [None])
+
+
+class TestConcurrentExperts(unittest.TestCase):
+    """Test concurrent expert execution with early stopping."""
+
+    RANKED = [("coder", 0.5), ("tester", 0.4), ("planner", 0.3)]
+
+    def _router(self, behaviour, timeout=None):
+        """Router whose experts sleep and answer per behaviour[expert_id] = (delay, confidence)."""
+        self.cancelled = []
+
+        async def runner(expert, goal, score, temperature):
+            delay, confidence = behaviour[expert["id"]]
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                self.cancelled.append(expert["id"])
+                raise
+            if confidence is None:
+                raise RuntimeError("expert crashed")
+            return {"confidence": confidence, "response": expert["id"]}
+
+        router = MoERouter(str(MOE_CONFIG_PATH), expert_runner=runner)
+        router.router_config["expert_timeout_sec"] = timeout
+        router.consistency = SelfConsistency(samples=1)
+        return router
+
+    def _run(self, router):
+        start = time.perf_counter()
+        results, skipped = asyncio.run(router._run_experts(self.RANKED, "goal"))
+        return results, skipped, time.perf_counter() - start
+
+    def test_runs_concurrently(self):
+        """Test that latency is the slowest expert, not the sum."""
+        router = self._router({"coder": (0.1, 0.5), "tester": (0.1, 0.5), "planner": (0.1, 0.5)})
+        results, skipped, elapsed = self._run(router)
+
+        self.assertEqual([r["expert_id"] for r in results], ["coder", "tester", "planner"])
+        self.assertEqual(skipped, {})
+        self.assertLess(elapsed, 0.25)
+
+    def test_early_stop_cancels_rest(self):
+        """Test that a confident expert cancels the slower ones."""
+        router = self._router({"coder": (1.0, 0.5), "tester": (0.02, 0.95), "planner": (1.0, 0.5)})
+        results, skipped, elapsed = self._run(router)
+
+        self.assertEqual([r["expert_id"] for r in results], ["tester"])
+        self.assertEqual(skipped, {"coder": "cancelled", "planner": "cancelled"})
+        self.assertEqual(sorted(self.cancelled), ["coder", "planner"])
+        self.assertLess(elapsed, 0.5)
+
+    def test_timeout_and_errors(self):
+        """Test that slow and failing experts are dropped."""
+        router = self._router({"coder": (0.01, 0.5), "tester": (1.0, 0.9), "planner": (0.01, None)}, timeout=0.1)
+        results, skipped, elapsed = self._run(router)
+
+        self.assertEqual([r["expert_id"] for r in results], ["coder"])
+        self.assertEqual(skipped["tester"], "timeout")
+        self.assertEqual(skipped["planner"], "error: expert crashed")
+        self.assertLess(elapsed, 0.5)
+
+    def test_results_aggregate(self):
+        """Test that runner results feed _aggregate_results."""
+        router = self._router({"coder": (0.01, 0.6), "tester": (0.01, 0.4), "planner": (0.01, 0.2)})
+        results, _, _ = self._run(router)
+        aggregate = router._aggregate_results(results)
+        self.assertEqual(aggregate["chosen_experts"], ["coder", "tester", "planner"])
+        self.assertAlmostEqual(sum(aggregate["vote_distribution"].values()), 2.0)
+
+    def test_route_task_inside_event_loop(self):
+        """Test that the blocking wrapper works from a running loop."""
+        router = MoERouter(str(MOE_CONFIG_PATH))
+
+        async def scenario():
+            return router.route_task("Fix the parser bug")
+        result = asyncio.run(scenario())
+        self.assertIn("skipped_experts", result)
+        self.assertTrue(result["chosen_experts"])
+
+
+class TestHotReload(unittest.TestCase):
+    """Test hot reload of moe.yml."""
+
+    def setUp(self):
+        with open(MOE_CONFIG_PATH, encoding="utf-8") as f:
+            self.base = yaml.safe_load(f)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "moe.yml"
+        self._write(self.base)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _write(self, config, text=None):
+        """Write the config and bump its mtime so the change is visible even within one clock tick."""
+        self.path.write_text(text if text is not None else yaml.safe_dump(config), encoding="utf-8")
+        stamp = time.time() + getattr(self, "_ticks", 0)
+        self._ticks = getattr(self, "_ticks", 0) + 1
+        os.utime(self.path, (stamp, stamp))
+
+    def _with_top_k(self, top_k):
+        config = yaml.safe_load(yaml.safe_dump(self.base))
+        config["moe"]["router"]["top_k"] = top_k
+        return config
+
+    def test_reload_on_change(self):
+        """Test that a changed file is swapped in and an unchanged one is not re-read."""
+        router = MoERouter(str(self.path))
+        self.assertFalse(router.check_for_changes())
+
+        self._write(self._with_top_k(1))
+        self.assertTrue(router.check_for_changes())
+        self.assertEqual(router.snapshot.version, 2)
+        self.assertEqual(router.router_config["top_k"], 1)
+        self.assertLessEqual(len(router.route_task("Fix the parser bug")["ranked_experts"]), 1)
+        self.assertFalse(router.check_for_changes())
+
+    def test_invalid_file_keeps_previous(self):
+        """Test that broken YAML or rules keep the active config and are reported once."""
+        router = MoERouter(str(self.path))
+        broken = yaml.safe_load(yaml.safe_dump(self.base))
+        broken["moe"]["routing_rules"].append({"if": "file_ext in ['py'", "pick": ["coder"]})
+
+        for config, text in ((broken, None), (None, "moe: [unclosed")):
+            self._write(config, text)
+            self.assertFalse(router.check_for_changes())
+            self.assertEqual(router.snapshot.version, 1)
+            self.assertIsNotNone(router.last_reload_error)
+            # Same broken file: not retried
+            self.assertFalse(router.check_for_changes())
+            self.assertEqual(router.route_task("Fix the parser bug")["config_version"], 1)
+
+        self._write(self._with_top_k(2))
+        self.assertTrue(router.check_for_changes())
+        self.assertIsNone(router.last_reload_error)
+        self.assertEqual(router.snapshot.version, 2)
+
+    def test_in_flight_route_keeps_old_config(self):
+        """Test that a reload mid-route does not change the running request."""
+        reloaded = asyncio.Event()
+
+        async def runner(expert, goal, score, temperature):
+            await reloaded.wait()
+            return {"confidence": 0.5, "response": expert["id"]}
+
+        router = MoERouter(str(self.path), expert_runner=runner)
+        router.consistency = SelfConsistency(samples=1)
+
+        async def scenario():
+            route = asyncio.ensure_future(router.route_task_async("Fix the parser bug"))
+            await asyncio.sleep(0.01)
+            self._write(self._with_top_k(1))
+            self.assertTrue(router.reload())
+            reloaded.set()
+            return await route, await router.route_task_async("Fix the parser bug")
+
+        old, new = asyncio.run(scenario())
+        self.assertEqual(old["config_version"], 1)
+        self.assertGreater(len(old["ranked_experts"]), 1)
+        self.assertEqual(new["config_version"], 2)
+        self.assertEqual(len(new["ranked_experts"]), 1)
+
+    def test_watcher(self):
+        """Test that the background watcher picks up a change."""
+        router = MoERouter(str(self.path))
+        watcher = router.watch(interval_sec=0.01)
+        try:
+            self._write(self._with_top_k(1))
+            deadline = time.time() + 2.0
+            while router.snapshot.version == 1 and time.time() < deadline:
+                time.sleep(0.01)
+        finally:
+            watcher.stop()
+        self.assertEqual(router.router_config["top_k"], 1)
+
+    def test_watcher_restart(self):
+        """Test that a stopped watcher can be started again and keeps reloading."""
+        router = MoERouter(str(self.path))
+        watcher = router.watch(interval_sec=0.01)
+        watcher.stop()
+        watcher.start()
+        try:
+            self._write(self._with_top_k(1))
+            deadline = time.time() + 2.0
+            while router.snapshot.version == 1 and time.time() < deadline:
+                time.sleep(0.01)
+        finally:
+            watcher.stop()
+        self.assertEqual(router.router_config["top_k"], 1)
+
+
+class TestSeededRouting(unittest.TestCase):
+    """Test the per-router seeded RNG."""
+
+    GOALS = ["Fix the parser bug", "Plan the roadmap", "Refactor perf of the cache", "Research docs on auth"]
+
+    def _replay(self, router):
+        return [
+            (result["chosen_experts"], result["winning_approach"], result["final_confidence"])
+            for result in (router.route_task(goal) for goal in self.GOALS)
+        ]
+
+    def test_same_seed_same_decisions(self):
+        """Test that replaying goals with the same seed reproduces every decision."""
+        first = self._replay(MoERouter(str(MOE_CONFIG_PATH), seed=7))
+        self.assertEqual(first, self._replay(MoERouter(str(MOE_CONFIG_PATH), seed=7)))
+        self.assertNotEqual(first, self._replay(MoERouter(str(MOE_CONFIG_PATH), seed=8)))
+
+    def test_routers_do_not_share_rng(self):
+        """Test that one router's draws (or the global RNG) do not affect another's."""
+        expected = self._replay(MoERouter(str(MOE_CONFIG_PATH), seed=3))
+
+        router = MoERouter(str(MOE_CONFIG_PATH), seed=3)
+        other = MoERouter(str(MOE_CONFIG_PATH), seed=3)
+        random.seed(12345)
+        other.route_task("Plan the roadmap")
+        random.random()
+        self.assertEqual(self._replay(router), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
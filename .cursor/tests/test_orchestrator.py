@@ -201,6 +201,10 @@ class TestMCPServerOrchestratorIntegration(unittest.TestCase):
         from mcp.server import MCPServer
         self.server = MCPServer()
 
+    def tearDown(self):
+        """Stop the server's background threads."""
+        self.server.close()
+
     def test_orchestrator_route_tool_call(self):
         """Test calling orchestrator.route through MCP server."""
         import asyncio
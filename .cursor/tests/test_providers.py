@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the LLM provider pool.
+"""
+
+import asyncio
+import time
+import unittest
+from unittest.mock import AsyncMock
+
+# Add current directory to path for imports
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mcp.llm_stub import StubBehavior, StubLLMServer
+from mcp.orchestrator import OPENAI_AVAILABLE, AgentType, AIAgentRouter
+from mcp.providers import LLMProvider, ProviderPool, ProviderStats
+from mcp.routing_cache import RoutingCache
+
+
+class TestProviderStats(unittest.TestCase):
+    """Test ProviderStats functionality."""
+
+    def test_ewma_and_p95(self):
+        """Test latency averaging and the p95 window."""
+        stats = ProviderStats(alpha=0.5)
+        self.assertIsNone(stats.p95())
+        self.assertEqual(stats.score(), 0.0)
+
+        for seconds in (0.1, 0.1, 0.1, 0.1, 0.9):
+            stats.record_success(seconds)
+        self.assertAlmostEqual(stats.ewma_latency, 0.5)
+        self.assertEqual(stats.p95(), 0.9)
+
+    def test_errors_raise_score(self):
+        """Test that failures make a provider look more expensive."""
+        stats = ProviderStats()
+        stats.record_success(0.1)
+        healthy = stats.score()
+        stats.record_failure()
+        self.assertGreater(stats.score(), healthy)
+
+    def test_circuit_breaker(self):
+        """Test that the breaker opens after consecutive failures and half-opens after the cooldown."""
+        stats = ProviderStats(failure_threshold=2, cooldown_sec=0.05)
+        stats.record_failure()
+        self.assertTrue(stats.available())
+        stats.record_failure()
+        self.assertFalse(stats.available())
+
+        time.sleep(0.06)
+        self.assertTrue(stats.available())
+        # A failed trial request reopens it
+        self.assertTrue(stats.try_acquire())
+        stats.record_failure()
+        self.assertFalse(stats.available())
+
+        time.sleep(0.06)
+        self.assertTrue(stats.try_acquire())
+        stats.record_success(0.1)
+        self.assertEqual(stats.consecutive_failures, 0)
+        self.assertFalse(stats.half_open())
+
+    def test_half_open_single_probe(self):
+        """Test that a half-open breaker lets one trial request through at a time."""
+        stats = ProviderStats(failure_threshold=1, cooldown_sec=0.01)
+        stats.record_failure()
+        time.sleep(0.02)
+
+        self.assertTrue(stats.half_open())
+        self.assertTrue(stats.try_acquire())
+        self.assertFalse(stats.available())
+        self.assertFalse(stats.try_acquire())
+        # A probe that ends without a verdict frees the slot
+        stats.release_probe()
+        self.assertTrue(stats.try_acquire())
+
+
+class FakeClient:
+    """Provider stand-in answering after a fixed delay, or failing."""
+
+    def __init__(self, delay: float, fail: bool = False) -> None:
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+        self.cancelled = 0
+
+    async def __call__(self, provider: LLMProvider) -> str:
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.fail:
+            raise ConnectionError(f"{provider.name} down")
+        return provider.name
+
+
+class TestProviderPool(unittest.TestCase):
+    """Test ProviderPool functionality."""
+
+    def _pool(self, *clients, **kwargs):
+        providers = [LLMProvider(f"p{i}", client, "model", stats=ProviderStats(failure_threshold=2, cooldown_sec=60))
+                     for i, client in enumerate(clients)]
+        return ProviderPool(providers, **kwargs)
+
+    @staticmethod
+    def _request(provider: LLMProvider):
+        return provider.client(provider)
+
+    def test_single_provider(self):
+        """Test that a single provider is called once, without hedging."""
+        client = FakeClient(0.01)
+        pool = self._pool(client, default_hedge_sec=0.001)
+        self.assertEqual(asyncio.run(pool.complete(self._request)), "p0")
+        self.assertEqual(client.calls, 1)
+        self.assertEqual(pool.hedged, 0)
+
+    def test_hedge_to_faster_provider(self):
+        """Test that a slow primary gets a backup request and the backup wins."""
+        slow, fast = FakeClient(1.0), FakeClient(0.01)
+        pool = self._pool(slow, fast, default_hedge_sec=0.05)
+
+        start = time.perf_counter()
+        self.assertEqual(asyncio.run(pool.complete(self._request)), "p1")
+        self.assertLess(time.perf_counter() - start, 0.5)
+        self.assertEqual((pool.hedged, pool.hedge_wins), (1, 1))
+        # The losing request was cancelled, and its truncated time is not a latency sample
+        self.assertEqual(slow.cancelled, 1)
+        self.assertEqual(pool.providers[0].stats.cancelled, 1)
+        self.assertEqual(len(pool.providers[0].stats.latencies), 0)
+        self.assertIsNone(pool.providers[0].stats.ewma_latency)
+
+    def test_no_hedge_when_fast(self):
+        """Test that no backup is sent when the primary answers within the delay."""
+        first, second = FakeClient(0.01), FakeClient(0.01)
+        pool = self._pool(first, second, default_hedge_sec=0.5)
+        self.assertEqual(asyncio.run(pool.complete(self._request)), "p0")
+        self.assertEqual(second.calls, 0)
+
+    def test_failover_without_waiting(self):
+        """Test that a failing provider is replaced immediately."""
+        broken, healthy = FakeClient(0.0, fail=True), FakeClient(0.01)
+        pool = self._pool(broken, healthy, default_hedge_sec=5.0)
+
+        start = time.perf_counter()
+        self.assertEqual(asyncio.run(pool.complete(self._request)), "p1")
+        self.assertLess(time.perf_counter() - start, 1.0)
+        self.assertEqual(pool.providers[0].stats.errors, 1)
+
+    def test_all_fail(self):
+        """Test that the last error is raised when every provider fails."""
+        pool = self._pool(FakeClient(0.0, fail=True), FakeClient(0.0, fail=True))
+        with self.assertRaises(ConnectionError):
+            asyncio.run(pool.complete(self._request))
+
+    def test_empty_pool(self):
+        """Test that an empty pool raises."""
+        with self.assertRaises(RuntimeError):
+            asyncio.run(ProviderPool([]).complete(self._request))
+
+    def test_open_circuit_is_skipped(self):
+        """Test that a provider with an open breaker is not called."""
+        broken, healthy = FakeClient(0.0, fail=True), FakeClient(0.0)
+        pool = self._pool(broken, healthy, hedge=False)
+
+        async def scenario():
+            for _ in range(4):
+                await pool.complete(self._request)
+        asyncio.run(scenario())
+        # Two failures open the breaker; later requests go straight to p1
+        self.assertEqual(broken.calls, 2)
+        self.assertEqual(healthy.calls, 4)
+        self.assertTrue(pool.stats()["providers"]["p0"]["circuit_open"])
+
+    def test_half_open_probe_is_exclusive(self):
+        """Test that concurrent requests send only one trial request to a half-open provider."""
+        recovering, healthy = FakeClient(0.05), FakeClient(0.05)
+        pool = self._pool(recovering, healthy, hedge=False)
+        stats = pool.providers[0].stats
+        stats.record_failure()
+        stats.record_failure()
+        stats.open_until = time.monotonic() - 1  # Cooldown over
+        # Rank the recovering provider first
+        pool.providers[1].stats.record_success(1.0)
+
+        async def scenario():
+            return await asyncio.gather(*(pool.complete(self._request) for _ in range(3)))
+        results = asyncio.run(scenario())
+
+        self.assertEqual(recovering.calls, 1)
+        self.assertEqual(sorted(results), ["p0", "p1", "p1"])
+        self.assertFalse(stats.half_open())
+        self.assertTrue(stats.available())
+
+    def test_cancelled_probe_frees_slot(self):
+        """Test that a probe cancelled before it starts does not hold the half-open slot."""
+        pool = self._pool(FakeClient(0.01), hedge=False)
+        stats = pool.providers[0].stats
+        stats.record_failure()
+        stats.record_failure()
+        stats.open_until = time.monotonic() - 1
+
+        async def scenario():
+            task = asyncio.ensure_future(pool.complete(self._request))
+            await asyncio.sleep(0)  # complete() launches the probe, then waits
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        asyncio.run(scenario())
+
+        self.assertFalse(stats.probe_in_flight)
+        self.assertTrue(stats.available())
+
+    def test_orders_by_latency(self):
+        """Test that the faster provider becomes the first choice."""
+        slow, fast = FakeClient(0.05), FakeClient(0.0)
+        pool = self._pool(slow, fast, hedge=False)
+        pool.providers[0].stats.record_success(0.05)
+        pool.providers[1].stats.record_success(0.001)
+        self.assertEqual([p.name for p in pool.ordered()], ["p1", "p0"])
+
+    def test_hedge_delay_uses_p95(self):
+        """Test that the hedge delay follows the provider's p95."""
+        pool = self._pool(FakeClient(0.0), default_hedge_sec=2.0, min_hedge_sec=0.01)
+        provider = pool.providers[0]
+        self.assertEqual(pool.hedge_delay(provider), 2.0)
+        for _ in range(20):
+            provider.stats.record_success(0.2)
+        self.assertAlmostEqual(pool.hedge_delay(provider), 0.2)
+
+
+class TestStreamFailover(unittest.TestCase):
+    """Test provider failover for streamed completions."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.router = AIAgentRouter()
+        self.router.providers = ProviderPool([LLMProvider("a", object(), "m"), LLMProvider("b", object(), "m")])
+
+    def _stream(self, fail_after):
+        """Streams where provider name fails after fail_after[name] tokens (None never fails)."""
+        async def stream(provider, context):
+            for i, text in enumerate(["{", "}"]):
+                if fail_after[provider.name] == i:
+                    raise ConnectionError(provider.name)
+                yield text
+        self.router._provider_stream_text = stream  # type: ignore[method-assign]
+
+    def _collect(self):
+        async def scenario():
+            return [text async for text in self.router._ai_stream_text("ctx")]
+        return asyncio.run(scenario())
+
+    def test_fails_over_before_first_token(self):
+        """Test that a provider failing before any text is replaced by the next one."""
+        self._stream({"a": 0, "b": None})
+        self.assertEqual(self._collect(), ["{", "}"])
+        self.assertEqual(self.router.providers.providers[0].stats.consecutive_failures, 1)
+
+    def test_no_failover_after_first_token(self):
+        """Test that an error after text was yielded propagates."""
+        self._stream({"a": 1, "b": None})
+        with self.assertRaises(ConnectionError):
+            self._collect()
+
+    def test_all_fail(self):
+        """Test that the last provider's error propagates."""
+        self._stream({"a": 0, "b": 0})
+        with self.assertRaisesRegex(ConnectionError, "b"):
+            self._collect()
+
+    def test_skips_probing_provider(self):
+        """Test that a stream does not join a half-open provider's trial request."""
+        self._stream({"a": None, "b": None})
+        stats = self.router.providers.providers[0].stats
+        stats.open_until = time.monotonic() - 1
+        stats.probe_in_flight = True
+        self.router.providers.providers[1].stats.record_success(1.0)
+        calls = []
+        stream = self.router._provider_stream_text
+
+        async def recording(provider, context):
+            calls.append(provider.name)
+            async for text in stream(provider, context):
+                yield text
+        self.router._provider_stream_text = recording  # type: ignore[method-assign]
+
+        self.assertEqual(self._collect(), ["{", "}"])
+        self.assertEqual(calls, ["b"])
+
+
+@unittest.skipUnless(OPENAI_AVAILABLE, "openai not installed")
+class TestRouterProviderPool(unittest.TestCase):
+    """Test AIAgentRouter hedging across local stub servers."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        from openai import AsyncOpenAI
+        decide = {"agent": "TESTS", "confidence": 0.8, "reasoning": "stub", "steps": ["test"]}
+        self.slow = StubLLMServer(StubBehavior(latency_sec=1.0, decide=lambda prompt: decide)).start()
+        self.fast = StubLLMServer(StubBehavior(latency_sec=0.01, decide=lambda prompt: decide)).start()
+
+        self.router = AIAgentRouter()
+        self.router.cache = RoutingCache(max_entries=0)
+        self.router.get_rag_context = AsyncMock(return_value="")  # type: ignore[method-assign]
+        self.clients = [AsyncOpenAI(api_key="stub", base_url=stub.openai_base_url, max_retries=0)
+                        for stub in (self.slow, self.fast)]
+        self.router.providers = ProviderPool([
+            LLMProvider("slow", self.clients[0], "stub-model"),
+            LLMProvider("fast", self.clients[1], "stub-model")
+        ], default_hedge_sec=0.1)
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.slow.stop()
+        self.fast.stop()
+
+    def test_hedged_route(self):
+        """Test that routing answers from the fast stub when the primary stalls."""
+        async def scenario():
+            try:
+                start = time.perf_counter()
+                result = await self.router.route_goal("Write tests for the parser")
+                return result, time.perf_counter() - start
+            finally:
+                for client in self.clients:
+                    await client.close()
+
+        result, elapsed = asyncio.run(scenario())
+        self.assertEqual(result.agent, AgentType.TESTS)
+        self.assertLess(elapsed, 0.8)
+        self.assertEqual(self.router.providers.hedge_wins, 1)
+        self.assertEqual(self.fast.requests, 1)
+        # The fast provider is preferred from now on
+        self.assertEqual(self.router.providers.ordered()[0].name, "fast")
+
+    def test_client_assignment_replaces_pool(self):
+        """Test that assigning a client leaves a single-provider pool."""
+        self.router.client = self.clients[1]
+        self.router.model_name = "other-model"
+        self.assertEqual(len(self.router.providers), 1)
+        self.assertIs(self.router.client, self.clients[1])
+        self.assertEqual(self.router.providers.primary.model, "other-model")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -10,13 +10,14 @@ import json
 import os
 from pathlib import Path
 from unittest.mock import Mock, patch, MagicMock
+import numpy as np
 import sys
 
 # Add rag directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from rag.ingest import TextChunker, FileLoader, RAGIngestor
-from mcp.server import MCPServer
+from mcp.server import MCPServer, TokenBucketRateLimiter, encode_message
 
 
 class TestTextChunker(unittest.TestCase):
@@ -272,6 +273,7 @@ class TestMCPServer(unittest.TestCase):
 
     def tearDown(self):
         import shutil
+        self.server.close()
         shutil.rmtree(self.temp_dir, ignore_errors=True)
 
     @patch('mcp.server.RAGIngestor')
@@ -330,6 +332,7 @@ class TestMCPServer(unittest.TestCase):
 
         # Create server and test search
         server = MCPServer()
+        self.addCleanup(server.close)
         result = server.rag_server.search_knowledge_chunks("test query", 2)
 
         self.assertIsInstance(result, list)
@@ -339,6 +342,63 @@ class TestMCPServer(unittest.TestCase):
         self.assertIn("idx", result[0])
         self.assertIn("score", result[0])
 
+    @patch('mcp.server.chromadb.PersistentClient')
+    @patch('mcp.server.SentenceTransformer')
+    def test_search_knowledge_chunks_batch(self, mock_sentence_transformer, mock_persistent_client):
+        """Test that a batch search embeds all queries in one call."""
+        mock_collection = Mock()
+        mock_client = Mock()
+        mock_client.get_or_create_collection.return_value = mock_collection
+        mock_persistent_client.return_value = mock_client
+
+        mock_collection.query.return_value = {
+            'ids': [['a1'], ['b1', 'b2']],
+            'documents': [['First'], ['Second 1', 'Second 2']],
+            'metadatas': [
+                [{'source_file': 'a.md', 'chunk_index': 0}],
+                [{'source_file': 'b.md', 'chunk_index': 0}, {'source_file': 'b.md', 'chunk_index': 1}]
+            ],
+            'distances': [[0.1], [0.2, 0.3]]
+        }
+
+        mock_model = Mock()
+        mock_embedding_result = Mock()
+        mock_embedding_result.tolist.return_value = [[0.1, 0.2], [0.3, 0.4]]
+        mock_model.encode.return_value = mock_embedding_result
+        mock_sentence_transformer.return_value = mock_model
+
+        server = MCPServer()
+
+        self.addCleanup(server.close)
+        result = server.rag_server.search_knowledge_chunks_batch(["query a", "query b"], 2)
+
+        mock_model.encode.assert_called_once_with(["query a", "query b"])
+        mock_collection.query.assert_called_once()
+        self.assertEqual([len(chunks) for chunks in result], [1, 2])
+        self.assertEqual(result[1][1]["path"], "b.md")
+        self.assertEqual(server.rag_server.search_knowledge_chunks_batch([], 2), [])
+
+    @patch('mcp.server.chromadb.PersistentClient')
+    @patch('mcp.server.SentenceTransformer')
+    def test_query_embeddings_memoized(self, mock_sentence_transformer, mock_persistent_client):
+        """Test that repeated queries (RAG search, MoE routing) reuse their embedding."""
+        mock_persistent_client.return_value = Mock()
+        mock_model = Mock()
+        mock_model.encode.side_effect = lambda texts: np.array(
+            [[float(len(text)), 1.0] for text in texts] if isinstance(texts, list) else [float(len(texts)), 1.0]
+        )
+        mock_sentence_transformer.return_value = mock_model
+
+        server = MCPServer()
+        self.addCleanup(server.close)
+        rag_server = server.rag_server
+        first = rag_server.get_query_embeddings(["fix bug", "plan"])
+        second = rag_server.get_query_embeddings(["plan", "fix bug", "docs"])
+
+        self.assertEqual(first, [[7.0, 1.0], [4.0, 1.0]])
+        self.assertEqual(second, [[4.0, 1.0], [7.0, 1.0], [4.0, 1.0]])
+        self.assertEqual([c.args[0] for c in mock_model.encode.call_args_list], [["fix bug", "plan"], "docs"])
+
     def test_mcp_message_handling_initialize(self):
         """Test MCP initialize message handling."""
         import asyncio
@@ -379,6 +439,8 @@ class TestMCPServer(unittest.TestCase):
 
         server = MCPServer()
 
+        self.addCleanup(server.close)
+
         async def test():
             # Test normal operation
             message = {
@@ -410,6 +472,8 @@ class TestMCPServer(unittest.TestCase):
 
         server = MCPServer()
 
+        self.addCleanup(server.close)
+
         async def test():
             async def make_request(req_id: int):
                 message = {
@@ -430,6 +494,114 @@ class TestMCPServer(unittest.TestCase):
 
         asyncio.run(test())
 
+    def test_tool_registry_dispatch(self):
+        """Test that every advertised tool has a handler and unknown tools fail."""
+        import asyncio
+
+        for name, spec in self.server.tools.items():
+            self.assertEqual(spec.name, name)
+            self.assertTrue(callable(spec.handler))
+
+        listed = [tool["name"] for tool in self.server._tools_list_result["tools"]]
+        self.assertEqual(listed, list(self.server.tools))
+
+        health = asyncio.run(self.server.call_tool("health", {}))
+        self.assertEqual(health["status"], "ok")
+
+        with self.assertRaises(ValueError):
+            asyncio.run(self.server.call_tool("no.such.tool", {}))
+
+    def test_route_batch_routers(self):
+        """Test that route_batch uses the MoE router by default and the LLM agent router on request."""
+        import asyncio
+
+        goals = {"goals": ["Add tests for the parser", 3]}
+        moe = asyncio.run(self.server.call_tool("orchestrator.route_batch", goals))
+        self.assertEqual(moe["count"], 2)
+        self.assertIn("chosen_experts", moe["results"][0])
+        self.assertIn("error", moe["results"][1])
+
+        decision = {"agent": "tests", "confidence": 0.9, "reasoning": "r", "steps": []}
+        with patch('mcp.server.route_goals_async', return_value=[decision]) as route:
+            agent = asyncio.run(self.server.call_tool(
+                "orchestrator.route_batch", {"goals": ["Add tests"], "router": "agent", "max_concurrency": 2}
+            ))
+        route.assert_called_once_with(["Add tests"], [None], 2)
+        self.assertEqual(agent["results"][0]["agent"], "tests")
+
+        with self.assertRaises(ValueError):
+            asyncio.run(self.server.call_tool("orchestrator.route_batch", {"goals": [], "router": "llm"}))
+
+    def test_tools_list_encoded_once(self):
+        """Test that the pre-serialized tools/list frame matches plain encoding."""
+        import asyncio
+
+        response = asyncio.run(self.server.handle_message(
+            {"jsonrpc": "2.0", "id": 5, "method": "tools/list"}
+        ))
+        encoded = encode_message(response)
+
+        self.assertEqual(json.loads(encoded), json.loads(json.dumps(response)))
+
+
+class TestTokenBucketRateLimiter(unittest.TestCase):
+    """Test token bucket rate limiting."""
+
+    def test_burst_then_reject_with_retry_after(self):
+        """Test that the bucket allows a burst and then reports retry-after."""
+        limiter = TokenBucketRateLimiter(requests_per_minute=60, burst=3)
+
+        for _ in range(3):
+            allowed, retry_after = limiter.try_acquire(1)
+            self.assertTrue(allowed)
+            self.assertEqual(retry_after, 0.0)
+
+        allowed, retry_after = limiter.try_acquire(1)
+        self.assertFalse(allowed)
+        self.assertGreater(retry_after, 0.0)
+        self.assertLessEqual(retry_after, 1.0)
+
+    def test_per_tool_costs(self):
+        """Test that tools are charged their configured cost."""
+        limiter = TokenBucketRateLimiter.from_config({
+            "requests_per_minute": 60,
+            "burst": 10,
+            "tool_costs": {"health": 0, "rag.ingest": 8}
+        })
+
+        self.assertEqual(limiter.cost_for("health"), 0)
+        self.assertEqual(limiter.cost_for("unknown"), 1)
+        self.assertEqual(limiter.cost_for(None), 1)
+
+        self.assertTrue(limiter.try_acquire(limiter.cost_for("rag.ingest"))[0])
+        self.assertFalse(limiter.try_acquire(limiter.cost_for("rag.ingest"))[0])
+        # Free tools are never limited
+        self.assertTrue(limiter.try_acquire(limiter.cost_for("health"))[0])
+
+    @patch('mcp.server.WorkspaceIndex')
+    @patch('mcp.server.MoERouter')
+    @patch('mcp.server.chromadb.PersistentClient')
+    @patch('mcp.server.SentenceTransformer')
+    def test_rate_limit_error_includes_retry_after(self, *mocks):
+        """Test that rejected requests carry a retry-after hint."""
+        import asyncio
+
+        server = MCPServer()
+
+        self.addCleanup(server.close)
+        server.rate_limiter = TokenBucketRateLimiter(requests_per_minute=60, burst=1)
+
+        async def test():
+            message = {"jsonrpc": "2.0", "id": 1, "method": "tools/list"}
+            await server.handle_message(message)
+            response = await server.handle_message(message)
+
+            self.assertEqual(response["error"]["code"], -32001)
+            self.assertIn("retry_after_sec", response["error"]["data"])
+            self.assertGreater(response["error"]["data"]["retry_after_sec"], 0)
+
+        asyncio.run(test())
+
 
 if __name__ == '__main__':
     unittest.main()
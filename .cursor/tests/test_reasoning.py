@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the Tree/Graph-of-Thought search engine.
+"""
+
+import asyncio
+import time
+import unittest
+from pathlib import Path
+
+import yaml
+
+# Add current directory to path for imports
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mcp.reasoning import DeterministicThoughtModel, Proposal, ThoughtSearch, state_key
+
+CURSOR_DIR = Path(__file__).resolve().parents[1]
+
+
+def recording(model):
+    """Wrap an expander, recording the state of every expansion."""
+    states = []
+
+    async def expander(state, branching):
+        states.append(state)
+        return await model(state, branching)
+
+    expander.states = states
+    return expander
+
+
+class TestThoughtSearch(unittest.TestCase):
+    """Test ThoughtSearch functionality."""
+
+    def test_from_reasoning_config(self):
+        """Test loading tot, got and budgets from reasoning.yml."""
+        with open(CURSOR_DIR / "rules" / "reasoning.yml", encoding="utf-8") as f:
+            search = ThoughtSearch.from_config(yaml.safe_load(f))
+        self.assertEqual((search.branching, search.depth, search.beam_width), (3, 4, 3))
+        self.assertTrue(search.reuse_nodes)
+        self.assertEqual(search.merge_strategy, "best-score")
+        self.assertEqual(search.max_runtime_sec, 120)
+        self.assertEqual(search.max_tokens, 16000)
+        self.assertEqual(search.early_stop_confidence, 0.85)
+
+    def test_complete_plan(self):
+        """Test a full-depth search: one expansion per beam state per level."""
+        model = DeterministicThoughtModel("fix the parser bug")
+        result = asyncio.run(ThoughtSearch(branching=3, depth=4).run(model))
+
+        self.assertTrue(result.complete)
+        self.assertEqual(result.stop_reason, "depth")
+        self.assertEqual(len(result.steps), 4)
+        self.assertEqual(len(set(result.steps)), 4)
+        self.assertEqual(result.explored_nodes, 1 + 3 + 3 + 3)
+        self.assertEqual(model.calls, result.explored_nodes)
+        self.assertEqual(result.tokens_used, result.explored_nodes * 3 * model.tokens_per_step)
+        self.assertAlmostEqual(result.confidence, sum(model.quality(step) for step in result.steps) / 4)
+
+        again = asyncio.run(ThoughtSearch(branching=3, depth=4).run(DeterministicThoughtModel("fix the parser bug")))
+        self.assertEqual(again.steps, result.steps)
+
+    def test_state_key_is_ordered(self):
+        """Test that a state's identity keeps the order of its normalized steps."""
+        self.assertEqual(state_key(["Write  TESTS", "ship"]), state_key(["write tests", "Ship"]))
+        self.assertNotEqual(state_key(["a", "b"]), state_key(["b", "a"]))
+
+    def test_states_from_different_parents_merged(self):
+        """Test that two parents reaching the same canonical state share one node, expanded once."""
+        async def expander(state, branching):
+            if not state:
+                return [Proposal("a", 0.5), Proposal("b", 0.5)]
+            if len(state) == 1:
+                other = "b" if state == ("a",) else "a"
+                return [Proposal(other, 0.6, state="a+b")]
+            return [Proposal("ship", 0.6)]
+
+        def search(reuse_nodes):
+            recorder = recording(expander)
+            result = asyncio.run(ThoughtSearch(branching=2, depth=3, beam_width=4, reuse_nodes=reuse_nodes).run(recorder))
+            return result, recorder.states
+
+        graph, graph_states = search(True)
+        tree, tree_states = search(False)
+
+        self.assertEqual(graph.merged_nodes, 1)
+        self.assertEqual(tree.merged_nodes, 0)
+        # ("a", "b") and ("b", "a") are one node: expanded once, reached along two paths
+        self.assertEqual(len([state for state in graph_states if len(state) == 2]), 1)
+        self.assertEqual(len([state for state in tree_states if len(state) == 2]), 2)
+        self.assertEqual(graph.explored_nodes, 1 + 2 + 1)
+        self.assertEqual(tree.explored_nodes, 1 + 2 + 2)
+        self.assertAlmostEqual(graph.confidence, tree.confidence)
+
+    def test_default_state_is_ordered(self):
+        """Test that without a canonical state only identical ordered steps merge."""
+        async def expander(state, branching):
+            if not state:
+                return [Proposal("a", 0.5), Proposal("b", 0.5)]
+            other = "b" if state == ("a",) else "a"
+            return [Proposal(other, 0.6), Proposal(other.upper() + " ", 0.6)]
+
+        result = asyncio.run(ThoughtSearch(branching=2, depth=2, beam_width=4).run(expander))
+        # ("a", "b") and ("b", "a") stay apart; each parent's reworded duplicate merges
+        self.assertEqual(result.merged_nodes, 2)
+        self.assertEqual(result.pruned_nodes, 0)
+        self.assertEqual(len(result.alternatives), 1)
+
+    def test_model_states_merged(self):
+        """Test that the stand-in model's order-insensitive states are merged and expanded once."""
+        def search(reuse_nodes):
+            expander = recording(DeterministicThoughtModel("goal", steps=["a", "b", "c", "d"]))
+            result = asyncio.run(ThoughtSearch(branching=3, depth=3, beam_width=12, reuse_nodes=reuse_nodes).run(expander))
+            return result, expander.states
+
+        graph, graph_states = search(True)
+        tree, tree_states = search(False)
+
+        canonical = DeterministicThoughtModel.canonical_state
+        self.assertGreater(graph.merged_nodes, 0)
+        self.assertEqual(tree.merged_nodes, 0)
+        self.assertEqual(len({canonical(state) for state in graph_states}), len(graph_states))
+        self.assertLess(graph.explored_nodes, tree.explored_nodes)
+        self.assertAlmostEqual(graph.confidence, tree.confidence)
+
+    def test_best_score_merge(self):
+        """Test that a node reached from two parents keeps its best-scoring path."""
+        scores = {("a",): {"b": 0.2}, ("b",): {"a": 0.9}}
+
+        async def expander(state, branching):
+            if not state:
+                return [Proposal("a", 0.5), Proposal("b", 0.5)]
+            return [Proposal(step, score, state="a+b") for step, score in scores.get(state, {}).items()]
+
+        best = asyncio.run(ThoughtSearch(branching=2, depth=2).run(expander))
+        self.assertEqual(best.steps, ("b", "a"))
+        self.assertEqual(best.merged_nodes, 1)
+        self.assertAlmostEqual(best.confidence, 0.7)
+
+        first = asyncio.run(ThoughtSearch(branching=2, depth=2, merge_strategy="first").run(expander))
+        self.assertEqual(first.steps, ("a", "b"))
+
+    def test_concurrent_expansion(self):
+        """Test that a level's states are expanded concurrently."""
+        model = DeterministicThoughtModel("goal", latency_sec=0.05)
+        start = time.perf_counter()
+        result = asyncio.run(ThoughtSearch(branching=3, depth=4).run(model))
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(result.explored_nodes, 10)
+        # 4 levels of 0.05s, not 10 sequential expansions
+        self.assertLess(elapsed, 0.4)
+
+    def test_token_budget(self):
+        """Test that the search stops once max_tokens is spent."""
+        model = DeterministicThoughtModel("goal", tokens_per_step=40)
+        result = asyncio.run(ThoughtSearch(branching=3, depth=4, max_tokens=500).run(model))
+
+        self.assertEqual(result.stop_reason, "max_tokens")
+        self.assertLess(result.explored_nodes, 10)
+        self.assertGreaterEqual(result.tokens_used, 500)
+        self.assertFalse(result.complete)
+        self.assertTrue(result.steps)
+
+    def test_runtime_budget(self):
+        """Test that the search stops at max_runtime_sec and returns the best partial plan."""
+        model = DeterministicThoughtModel("goal", latency_sec=0.2)
+        start = time.perf_counter()
+        result = asyncio.run(ThoughtSearch(branching=3, depth=4, max_runtime_sec=0.3).run(model))
+
+        self.assertLess(time.perf_counter() - start, 0.5)
+        self.assertEqual(result.stop_reason, "max_runtime")
+        self.assertEqual(result.depth_reached, 1)
+        self.assertEqual(len(result.steps), 1)
+
+    def test_early_stop_on_confidence(self):
+        """Test that a confident complete answer ends the search."""
+        model = DeterministicThoughtModel("goal", finish_after=2)
+        result = asyncio.run(ThoughtSearch(branching=3, depth=4, early_stop_confidence=0.1).run(model))
+
+        self.assertEqual(result.stop_reason, "confidence")
+        self.assertTrue(result.complete)
+        self.assertEqual(len(result.steps), 2)
+
+    def test_backtrack_from_dead_end(self):
+        """Test that pruned states are revived when the beam dead-ends."""
+        async def expander(state, branching):
+            if not state:
+                return [Proposal("a", 0.9), Proposal("b", 0.8), Proposal("c", 0.1)]
+            if state == ("c",):
+                return [Proposal("d", 0.5)]
+            return [Proposal(state[-1], 1.0)]  # Repeats itself: no new state
+
+        result = asyncio.run(ThoughtSearch(branching=3, depth=2, beam_width=2).run(expander))
+        self.assertEqual(result.steps, ("c", "d"))
+        self.assertEqual(result.backtracked_nodes, 1)
+        self.assertTrue(result.complete)
+
+        stuck = asyncio.run(ThoughtSearch(branching=3, depth=2, beam_width=2, backtrack=False).run(expander))
+        self.assertFalse(stuck.complete)
+        self.assertEqual(stuck.stop_reason, "exhausted")
+
+    def test_invalid_config(self):
+        """Test argument validation."""
+        with self.assertRaises(ValueError):
+            ThoughtSearch(depth=0)
+        with self.assertRaises(ValueError):
+            ThoughtSearch(merge_strategy="average")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,552 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the orchestrator routing runtime.
+"""
+
+import asyncio
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+
+# Add current directory to path for imports
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mcp.background import BackgroundLoop
+from mcp.llm_stub import StubBehavior, StubLLMServer
+from mcp.orchestrator import (
+    ANTHROPIC_AVAILABLE, OPENAI_AVAILABLE,
+    AgentType, AIAgentRouter, RoutingResult, RuleBasedRouter, SingleFlight
+)
+from mcp.providers import LLMProvider, ProviderPool
+from mcp.routing_cache import RoutingCache, cache_key
+
+
+class TestBackgroundLoop(unittest.TestCase):
+    """Test BackgroundLoop functionality."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.background = BackgroundLoop(name="test-loop")
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.background.stop()
+
+    def test_run_reuses_one_loop(self):
+        """Test that consecutive calls share the same loop and thread."""
+        async def current():
+            return asyncio.get_running_loop(), threading.current_thread()
+
+        first = self.background.run(current())
+        second = self.background.run(current())
+
+        self.assertIs(first[0], second[0])
+        self.assertIs(first[1], second[1])
+        self.assertIsNot(first[1], threading.current_thread())
+
+    def test_run_from_running_loop(self):
+        """Test that sync calls work while the caller's own loop is running."""
+        async def double(x):
+            await asyncio.sleep(0)
+            return x * 2
+
+        async def caller():
+            return self.background.run(double(21))
+
+        self.assertEqual(asyncio.run(caller()), 42)
+
+    def test_run_from_loop_thread_raises(self):
+        """Test that blocking on the loop from its own thread is refused."""
+        async def nested():
+            inner = asyncio.sleep(0)
+            with self.assertRaises(RuntimeError):
+                self.background.run(inner)
+            return True
+
+        self.assertTrue(self.background.run(nested()))
+
+    def test_restart_after_stop(self):
+        """Test that the loop starts again after being stopped."""
+        async def value():
+            return 1
+
+        self.background.run(value())
+        self.background.stop()
+        self.assertEqual(self.background.run(value()), 1)
+
+
+class TestRuleBasedRouter(unittest.TestCase):
+    """Test the compiled, scored rule-based router."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.router = RuleBasedRouter()
+
+    def test_routes_by_capability_keywords(self):
+        """Test that keywords beyond the old hard-coded list are used."""
+        cases = {
+            "Write pytest tests for the parser": AgentType.TESTS,
+            "Increase coverage with fixtures": AgentType.TESTS,
+            "Create a migration for the users table": AgentType.DB,
+            "Add CRUD endpoints that persist orders": AgentType.DB,
+            "Refactor the code to improve performance": AgentType.GENERAL,
+        }
+        for goal, expected in cases.items():
+            with self.subTest(goal=goal):
+                self.assertEqual(self.router.route_goal(goal).agent, expected)
+
+    def test_confidence_reflects_evidence(self):
+        """Test that unmatched goals get low confidence and strong matches high."""
+        unmatched = self.router.route_goal("Improve the onboarding flow")
+        strong = self.router.route_goal("Optimize SQL query with a join index")
+
+        self.assertEqual(unmatched.agent, AgentType.GENERAL)
+        self.assertEqual(unmatched.confidence, 0.5)
+        self.assertGreater(strong.confidence, 0.85)
+        self.assertLessEqual(strong.confidence, 0.95)
+
+    def test_scores_split_shared_keywords(self):
+        """Test that a keyword listed by two agents is shared between them."""
+        scores, matched = self.router.score_goal("updates")
+        self.assertEqual(scores[AgentType.GENERAL], 0.5)
+        self.assertEqual(scores[AgentType.DB], 0.5)
+        self.assertEqual(matched[AgentType.TESTS], [])
+
+    def test_route_goals_batch(self):
+        """Test that batch routing matches single routing in input order."""
+        goals = ["Write unit tests", "Design the database schema", "Plan the architecture"]
+        self.assertEqual(self.router.route_goals(goals), [self.router.route_goal(g) for g in goals])
+
+
+class TestRoutingCache(unittest.TestCase):
+    """Test RoutingCache functionality."""
+
+    def test_key_normalization(self):
+        """Test that whitespace, case and meta key order do not change the key."""
+        self.assertEqual(
+            cache_key("Write  unit tests\nfor parser.", {"a": 1, "b": [1, 2]}),
+            cache_key("write unit tests for parser", {"b": [1, 2], "a": 1})
+        )
+        self.assertNotEqual(cache_key("write tests", {"a": 1}), cache_key("write tests", {"a": 2}))
+        self.assertEqual(cache_key("write tests", None), cache_key("write tests", {}))
+
+    def test_ttl_expiry(self):
+        """Test that expired entries count as misses."""
+        cache = RoutingCache(ttl_sec=0.05)
+        cache.put("k", {"agent": "tests"})
+        self.assertEqual(cache.get("k"), {"agent": "tests"})
+        time.sleep(0.06)
+        self.assertIsNone(cache.get("k"))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted first."""
+        cache = RoutingCache(max_entries=2)
+        cache.put("a", {"v": 1})
+        cache.put("b", {"v": 2})
+        cache.get("a")
+        cache.put("c", {"v": 3})
+
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("a"))
+        self.assertEqual(cache.stats()["entries"], 2)
+
+    def test_persistence(self):
+        """Test that entries survive a restart."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / "routing_cache.json"
+            cache = RoutingCache(path=path)
+            cache.put("k", {"agent": "db"})
+            cache.flush()
+
+            reloaded = RoutingCache(path=path)
+            self.assertEqual(reloaded.get("k"), {"agent": "db"})
+            self.assertTrue(reloaded.stats()["persistent"])
+
+    def test_debounced_write(self):
+        """Test that puts do not write the file; one background write follows a burst."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / "routing_cache.json"
+            cache = RoutingCache(path=path, flush_sec=0.05)
+            with patch.object(RoutingCache, "_save", wraps=cache._save) as save:
+                for i in range(20):
+                    cache.put(f"k{i}", {"agent": "db"})
+                self.assertFalse(path.exists())
+                save.assert_not_called()
+
+                deadline = time.time() + 2
+                while not path.exists() and time.time() < deadline:
+                    time.sleep(0.01)
+                time.sleep(0.1)
+                self.assertEqual(save.call_count, 1)
+            self.assertEqual(RoutingCache(path=path).stats()["entries"], 20)
+
+
+class TestAIAgentRouterCache(unittest.TestCase):
+    """Test that cached decisions skip RAG and the LLM call."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.router = AIAgentRouter()
+        self.router.client = object()  # type: ignore[assignment]
+        self.router.cache = RoutingCache()
+        self.router._ai_route_goal = AsyncMock(return_value=RoutingResult(  # type: ignore[method-assign]
+            agent=AgentType.TESTS, confidence=0.9, reasoning="tests", steps=["write tests"]
+        ))
+
+    def test_second_call_hits_cache(self):
+        """Test that a repeated goal is served from the cache."""
+        first = asyncio.run(self.router.route_goal("Write unit tests", {"file": "a.py"}))
+        second = asyncio.run(self.router.route_goal("write unit tests ", {"file": "a.py"}))
+
+        self.assertEqual(self.router._ai_route_goal.await_count, 1)
+        self.assertEqual(first, second)
+        self.assertEqual(self.router.cache.stats()["hits"], 1)
+
+    def test_failures_are_not_cached(self):
+        """Test that fallback results are not stored."""
+        self.router._ai_route_goal.side_effect = RuntimeError("provider down")
+        asyncio.run(self.router.route_goal("Write unit tests"))
+        self.assertEqual(self.router.cache.stats()["entries"], 0)
+
+
+class TestSpeculativeRouting(unittest.TestCase):
+    """Test the rule-based vs LLM race."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.router = AIAgentRouter()
+        self.router.client = object()  # type: ignore[assignment]
+        self.router.cache = RoutingCache(max_entries=0)
+        self.router.speculative = True
+        self.router.rule_confidence_threshold = 0.8
+        self.router.llm_deadline_sec = 0.05
+
+    def _llm(self, agent, delay):
+        self.llm_calls = 0
+
+        async def route(goal, meta):
+            self.llm_calls += 1
+            await asyncio.sleep(delay)
+            return RoutingResult(agent=agent, confidence=0.95, reasoning="llm", steps=["llm"])
+        self.router._ai_route_goal = route  # type: ignore[method-assign]
+
+    def test_confident_rule_returns_immediately(self):
+        """Test that a confident rule-based answer does not wait for the LLM."""
+        self._llm(AgentType.TESTS, 0.2)
+
+        async def scenario():
+            start = time.perf_counter()
+            result = await self.router.route_goal("Write pytest tests for the parser")
+            elapsed = time.perf_counter() - start
+            await asyncio.gather(*self.router._background_tasks)
+            return result, elapsed
+
+        result, elapsed = asyncio.run(scenario())
+        self.assertEqual(result.agent, AgentType.TESTS)
+        self.assertLess(elapsed, 0.1)
+
+        stats = self.router.speculation.stats()
+        self.assertEqual(stats["rule_wins"], 1)
+        # Confident rule answers do not pay for an LLM call
+        self.assertEqual(self.llm_calls, 0)
+        self.assertEqual(stats["compared"], 0)
+
+    def test_sampled_confident_rule_measures_agreement(self):
+        """Test that sampled confident answers run the LLM in the background for agreement stats."""
+        self._llm(AgentType.TESTS, 0.05)
+        self.router.speculative_sample_rate = 1.0
+
+        async def scenario():
+            start = time.perf_counter()
+            result = await self.router.route_goal("Write pytest tests for the parser")
+            elapsed = time.perf_counter() - start
+            await asyncio.gather(*self.router._background_tasks)
+            return result, elapsed
+
+        result, elapsed = asyncio.run(scenario())
+        self.assertEqual(result.agent, AgentType.TESTS)
+        self.assertLess(elapsed, 0.05)
+        self.assertEqual(self.llm_calls, 1)
+
+        stats = self.router.speculation.stats()
+        self.assertEqual(stats["rule_wins"], 1)
+        self.assertEqual(stats["compared"], 1)
+        self.assertEqual(stats["agreement_rate"], 1.0)
+
+    def test_llm_within_deadline_wins(self):
+        """Test that the LLM answer is used when the rule-based one is unsure."""
+        self._llm(AgentType.DB, 0.0)
+        result = asyncio.run(self.router.route_goal("Improve the onboarding flow"))
+
+        self.assertEqual(result.agent, AgentType.DB)
+        self.assertEqual(self.router.speculation.stats()["llm_wins"], 1)
+
+    def test_deadline_falls_back_to_rule(self):
+        """Test the rule-based fallback when the LLM misses the deadline."""
+        self._llm(AgentType.DB, 0.2)
+
+        async def scenario():
+            result = await self.router.route_goal("Improve the onboarding flow")
+            await asyncio.gather(*self.router._background_tasks)
+            return result
+
+        result = asyncio.run(scenario())
+        self.assertEqual(result.agent, AgentType.GENERAL)
+
+        stats = self.router.speculation.stats()
+        self.assertEqual(stats["deadline_fallbacks"], 1)
+        self.assertEqual(stats["agreement_rate"], 0.0)
+
+
+class TestSingleFlight(unittest.TestCase):
+    """Test request coalescing."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.calls = 0
+
+    async def _slow(self, value="done"):
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        return value
+
+    def test_concurrent_calls_share_one_request(self):
+        """Test that identical concurrent calls run the factory once."""
+        flight = SingleFlight("test")
+
+        async def scenario():
+            return await asyncio.gather(*(flight.do("k", self._slow) for _ in range(5)))
+
+        self.assertEqual(asyncio.run(scenario()), ["done"] * 5)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(flight.coalesced, 4)
+        self.assertEqual(flight.in_flight(), 0)
+
+    def test_cancelled_caller_does_not_cancel_shared_call(self):
+        """Test that other waiters still get the result when one caller is cancelled."""
+        flight = SingleFlight("test")
+
+        async def scenario():
+            first = asyncio.ensure_future(flight.do("k", self._slow))
+            second = asyncio.ensure_future(flight.do("k", self._slow))
+            await asyncio.sleep(0.01)
+            first.cancel()
+            return first, await second
+
+        first, result = asyncio.run(scenario())
+        self.assertTrue(first.cancelled())
+        self.assertEqual(result, "done")
+        self.assertEqual(self.calls, 1)
+
+    def test_last_waiter_cancels_call(self):
+        """Test that the call is cancelled once nobody waits for it."""
+        flight = SingleFlight("test")
+
+        async def scenario():
+            caller = asyncio.ensure_future(flight.do("k", self._slow))
+            await asyncio.sleep(0.01)
+            shared = flight._calls["k"].task
+            caller.cancel()
+            await asyncio.sleep(0)
+            await asyncio.sleep(0)
+            return shared
+
+        self.assertTrue(asyncio.run(scenario()).cancelled())
+
+    def test_router_coalesces_llm_calls(self):
+        """Test that AIAgentRouter sends one LLM request for identical goals."""
+        router = AIAgentRouter()
+        router.client = object()  # type: ignore[assignment]
+        router.cache = RoutingCache(max_entries=0)
+
+        async def route(goal, meta):
+            self.calls += 1
+            await asyncio.sleep(0.02)
+            return RoutingResult(agent=AgentType.DB, confidence=0.9, reasoning="llm", steps=[])
+        router._ai_route_goal = route  # type: ignore[method-assign]
+
+        async def scenario():
+            return await asyncio.gather(
+                router.route_goal("Design the schema", {"db": "postgres"}),
+                router.route_goal("design the  schema", {"db": "postgres"}),
+                router.route_goal("Design the schema", {"db": "sqlite"})
+            )
+
+        results = asyncio.run(scenario())
+        self.assertTrue(all(r.agent == AgentType.DB for r in results))
+        self.assertEqual(self.calls, 2)
+
+
+class TestStubProvider(unittest.TestCase):
+    """Test AIAgentRouter end to end against the local stub provider."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.stub = StubLLMServer(StubBehavior(decide=lambda prompt: {
+            "agent": "DB", "confidence": 0.7, "reasoning": "stub", "steps": ["migrate"]
+        })).start()
+        self.router = AIAgentRouter()
+        self.router.cache = RoutingCache(max_entries=0)
+        self.router.get_rag_context = AsyncMock(return_value="")  # type: ignore[method-assign]
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.stub.stop()
+
+    def _route(self, client, model):
+        async def scenario():
+            self.router.client = client
+            self.router.model_name = model
+            try:
+                return await self.router.route_goal("Plan the next sprint")
+            finally:
+                await client.close()
+        return asyncio.run(scenario())
+
+    @unittest.skipUnless(OPENAI_AVAILABLE, "openai not installed")
+    def test_openai_api(self):
+        """Test routing through the OpenAI-compatible endpoint."""
+        from openai import AsyncOpenAI
+        client = AsyncOpenAI(api_key="stub", base_url=self.stub.openai_base_url, max_retries=0)
+
+        result = self._route(client, "stub-model")
+        self.assertEqual(result.agent, AgentType.DB)
+        self.assertEqual(result.steps, ["migrate"])
+        self.assertEqual(self.stub.requests, 1)
+
+        # RAG gets what the prompt budget leaves after system prompt, goal and completion
+        budget = self.router.get_rag_context.await_args.kwargs["max_tokens"]
+        self.assertLess(budget, self.router.context_assembler.max_tokens - self.router.max_completion_tokens)
+        self.assertGreater(budget, 0)
+
+    @unittest.skipUnless(ANTHROPIC_AVAILABLE, "anthropic not installed")
+    def test_anthropic_api(self):
+        """Test routing through the Anthropic-compatible endpoint."""
+        from anthropic import AsyncAnthropic
+        client = AsyncAnthropic(api_key="stub", base_url=self.stub.base_url, max_retries=0)
+
+        result = self._route(client, "stub-model")
+        self.assertEqual(result.agent, AgentType.DB)
+        self.assertEqual(self.stub.requests, 1)
+
+    @unittest.skipUnless(OPENAI_AVAILABLE, "openai not installed")
+    def test_errors_fall_back_to_rules(self):
+        """Test that provider errors produce a rule-based decision."""
+        from openai import AsyncOpenAI
+        self.stub.behavior = StubBehavior(error_rate=1.0)
+        client = AsyncOpenAI(api_key="stub", base_url=self.stub.openai_base_url, max_retries=0)
+
+        result = self._route(client, "stub-model")
+        self.assertTrue(result.reasoning.startswith("Rule-based"))
+
+
+
+class TestBatchRouting(unittest.TestCase):
+    """Test AIAgentRouter.route_goals functionality."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.router = AIAgentRouter()
+        self.router.cache = RoutingCache(max_entries=16)
+        self.router.providers = ProviderPool([LLMProvider("fake", object(), "fake-model")])
+        self.router.speculative = False
+
+        self.searched: list[list[str]] = []
+        self.prompts: list[str] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+        async def search_rag_chunks(goals):
+            self.searched.append(list(goals))
+            return [[{"text": f"knowledge for {goal}", "path": "k.md", "idx": 0, "score": 0.9}] for goal in goals]
+
+        async def complete_text(provider, context):
+            self.prompts.append(context)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            await asyncio.sleep(0.02)
+            self.in_flight -= 1
+            if "explode" in context:
+                raise RuntimeError("provider down")
+            agent = "DB" if "schema" in context else "TESTS"
+            return f'{{"agent": "{agent}", "confidence": 0.9, "reasoning": "fake", "steps": ["go"]}}'
+
+        self.router.search_rag_chunks = search_rag_chunks  # type: ignore[method-assign]
+        self.router._complete_text = complete_text  # type: ignore[method-assign]
+
+    def test_results_in_input_order(self):
+        """Test that results line up with the input goals."""
+        goals = [f"Write tests for module {i}" if i % 2 else f"Design the schema for table {i}" for i in range(10)]
+        results = asyncio.run(self.router.route_goals(goals, max_concurrency=4))
+
+        self.assertEqual(len(results), 10)
+        for i, result in enumerate(results):
+            self.assertEqual(result.agent, AgentType.TESTS if i % 2 else AgentType.DB)
+
+    def test_single_batched_search(self):
+        """Test that RAG context is fetched once for all uncached goals."""
+        self.router.cache.put(cache_key("Cached goal"), RoutingResult(AgentType.DB, 0.9, "cached", []).to_dict())
+        goals = ["Write tests for a", "Write tests for b", "Write tests for a", "Cached goal", "   "]
+        results = asyncio.run(self.router.route_goals(goals))
+
+        self.assertEqual(self.searched, [["Write tests for a", "Write tests for b"]])
+        self.assertEqual(results[3].reasoning, "cached")
+        self.assertEqual(results[4].confidence, 0.0)
+        # Each prompt carries its own goal's prefetched knowledge
+        for prompt in self.prompts:
+            goal = prompt.split("\n", 1)[0].removeprefix("Goal: ")
+            self.assertIn(f"knowledge for {goal}", prompt)
+
+    def test_concurrency_limit(self):
+        """Test that at most max_concurrency LLM calls run at once."""
+        goals = [f"Write tests for module {i}" for i in range(12)]
+        start = time.perf_counter()
+        asyncio.run(self.router.route_goals(goals, max_concurrency=3))
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(self.max_in_flight, 3)
+        # 12 calls of 20 ms, three at a time, beat running them one by one
+        self.assertLess(elapsed, 12 * 0.02)
+
+    def test_per_item_errors(self):
+        """Test that one bad item does not fail the batch."""
+        goals = ["Write tests for the parser", 42, "Design the schema for users"]
+        results = asyncio.run(self.router.route_goals(goals))  # type: ignore[arg-type]
+
+        self.assertEqual(results[0].agent, AgentType.TESTS)
+        self.assertIsInstance(results[1], ValueError)
+        self.assertEqual(results[2].agent, AgentType.DB)
+
+    def test_llm_failure_falls_back_per_item(self):
+        """Test that an LLM error only affects its own goal."""
+        results = asyncio.run(self.router.route_goals(["Write tests", "explode the database schema"]))
+        self.assertEqual(results[0].reasoning, "fake")
+        self.assertTrue(results[1].reasoning.startswith("Rule-based"))
+
+    def test_meta_length_mismatch(self):
+        """Test that metas must match goals."""
+        with self.assertRaises(ValueError):
+            asyncio.run(self.router.route_goals(["a", "b"], [None]))
+
+    def test_injected_search_runs_off_loop(self):
+        """Test that the injected RAG search is used and runs in a worker thread."""
+        router = AIAgentRouter()
+        calls = []
+
+        def search(goals, k):
+            calls.append((list(goals), k, threading.current_thread() is threading.main_thread()))
+            return [[] for _ in goals]
+
+        router.rag_search = search
+        self.assertEqual(asyncio.run(router.search_rag_chunks(["a", "b"])), [[], []])
+        self.assertEqual(calls, [(["a", "b"], router.RAG_CANDIDATES, False)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Unit tests for streamed routing responses.
+"""
+
+import asyncio
+import json
+import unittest
+from unittest.mock import AsyncMock
+
+# Add current directory to path for imports
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mcp.llm_stub import StubBehavior, StubLLMServer
+from mcp.orchestrator import OPENAI_AVAILABLE, AgentType, AIAgentRouter
+from mcp.routing_cache import RoutingCache
+from mcp.streaming import IncrementalJSONParser
+
+DECISION = {
+    "agent": "DB",
+    "confidence": 0.82,
+    "reasoning": "Needs a \"migration\", {not} [a] test, path C:\\\\db",
+    "steps": ["Write migration", {"nested": [1, 2]}, "Backfill"]
+}
+
+
+class TestIncrementalJSONParser(unittest.TestCase):
+    """Test IncrementalJSONParser functionality."""
+
+    def test_fields_complete_in_order(self):
+        """Test that each member is emitted once its value is complete, for any split."""
+        text = json.dumps(DECISION)
+        for size in (1, 3, 7, len(text)):
+            with self.subTest(size=size):
+                parser = IncrementalJSONParser()
+                emitted = []
+                for i in range(0, len(text), size):
+                    emitted += [key for key, _ in parser.feed(text[i:i + size])]
+                self.assertEqual(emitted, list(DECISION))
+                self.assertEqual(parser.result(), DECISION)
+
+    def test_agent_available_before_end(self):
+        """Test that early fields are parsed while later ones are still streaming."""
+        text = json.dumps(DECISION)
+        parser = IncrementalJSONParser()
+        parser.feed(text[:text.index('"reasoning"') + 5])
+
+        self.assertEqual(parser.fields, {"agent": "DB", "confidence": 0.82})
+        self.assertFalse(parser.done)
+        with self.assertRaises(ValueError):
+            parser.result()
+
+    def test_skips_code_fence(self):
+        """Test that text before the object is ignored."""
+        parser = IncrementalJSONParser()
+        parser.feed('```json\n{"agent": "TESTS"}\n```')
+        self.assertEqual(parser.result(), {"agent": "TESTS"})
+
+
+@unittest.skipUnless(OPENAI_AVAILABLE, "openai not installed")
+class TestRouteGoalStream(unittest.TestCase):
+    """Test AIAgentRouter.route_goal_stream against the stub provider."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.stub = StubLLMServer(StubBehavior(token_delay_sec=0.002, decide=lambda prompt: DECISION)).start()
+        self.router = AIAgentRouter()
+        self.router.cache = RoutingCache()
+        self.router.get_rag_context = AsyncMock(return_value="")  # type: ignore[method-assign]
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.stub.stop()
+
+    def _collect(self, goal):
+        from openai import AsyncOpenAI
+
+        async def scenario():
+            self.router.client = AsyncOpenAI(api_key="stub", base_url=self.stub.openai_base_url, max_retries=0)
+            try:
+                return [event async for event in self.router.route_goal_stream(goal)]
+            finally:
+                await self.router.client.close()
+        return asyncio.run(scenario())
+
+    def test_decision_precedes_result(self):
+        """Test that the decision arrives early and the result carries the rest."""
+        decision, result = self._collect("Add a column to the users table")
+
+        self.assertEqual(decision["event"], "decision")
+        self.assertEqual((decision["agent"], decision["confidence"]), ("db", 0.82))
+        self.assertNotIn("steps", decision)
+        self.assertLess(decision["elapsed_sec"], result["elapsed_sec"])
+        self.assertEqual(result["event"], "result")
+        self.assertEqual(result["steps"], DECISION["steps"])
+
+    def test_result_is_cached(self):
+        """Test that a streamed result is served from the cache next time."""
+        self._collect("Add a column to the users table")
+        events = self._collect("add a column to the users table")
+
+        self.assertEqual(self.stub.requests, 1)
+        self.assertEqual([e["agent"] for e in events], ["db", "db"])
+
+    def test_stream_error_falls_back(self):
+        """Test that provider errors produce a rule-based decision and result."""
+        self.stub.behavior = StubBehavior(error_rate=1.0)
+        events = self._collect("Add a column to the users table")
+
+        self.assertEqual([e["event"] for e in events], ["decision", "result"])
+        self.assertEqual(events[1]["agent"], AgentType.DB.value)
+        self.assertTrue(events[1]["reasoning"].startswith("Rule-based"))
+
+
+if __name__ == '__main__':
+    unittest.main()
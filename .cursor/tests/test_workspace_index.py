@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the workspace file index and MoE file-context features.
+"""
+
+import os
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+# Add current directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mcp.moe import MoERouter
+from mcp.workspace_index import WorkspaceIndex, context_paths, is_test_file
+
+CURSOR_DIR = Path(__file__).resolve().parents[1]
+
+
+def touch(root, *paths):
+    """Create empty files (and their directories)."""
+    for path in paths:
+        target = Path(root) / path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.touch()
+
+
+def bump_mtime(path):
+    """Move a directory's mtime forward so the change is seen on coarse clocks."""
+    stamp = time.time() + 5
+    os.utime(path, (stamp, stamp))
+
+
+class TestWorkspaceIndex(unittest.TestCase):
+    """Test WorkspaceIndex functionality."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        touch(self.root, "src/app.ts", "src/util.ts", "src/app.spec.ts", "api/main.py",
+              "api/tests/test_main.py", "README.md", "node_modules/lib/index.js")
+        self.index = WorkspaceIndex(self.root)
+
+    def tearDown(self):
+        self.index.stop()
+        self.tmp.cleanup()
+
+    def test_restart_after_stop(self):
+        """Test that a stopped index can be started again and keeps refreshing."""
+        self.index.start(0.01)
+        self.index.stop()
+        self.index.start(0.01)
+        touch(self.root, "src/new.ts")
+        bump_mtime(self.root / "src")
+        deadline = time.monotonic() + 5
+        while self.index.snapshot.describe(["src"]).extensions.get("ts") != 4 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.index.snapshot.describe(["src"]).extensions.get("ts"), 4)
+
+    def test_is_test_file(self):
+        """Test test-file detection by name and directory."""
+        for path in ["test_x.py", "x_test.go", "src/x.spec.ts", "a/tests/helpers.py", "x.test.js"]:
+            self.assertTrue(is_test_file(path), path)
+        for path in ["contest.py", "tests/data.json", "latest.ts"]:
+            self.assertFalse(is_test_file(path), path)
+
+    def test_context_paths(self):
+        """Test that paths are read from every supported meta key."""
+        meta = {"path": "a.py", "open_files": ["b.ts", 3], "files": ("c.go",), "other": "d.rs"}
+        self.assertEqual(context_paths(meta), ["b.ts", "c.go", "a.py"])
+        self.assertEqual(context_paths(None), [])
+
+    def test_summary(self):
+        """Test extension counts, test files and language mix, skipping vendored dirs."""
+        self.assertTrue(self.index.refresh())
+        workspace = self.index.snapshot.workspace
+
+        self.assertEqual(workspace.extensions, {"ts": 3, "py": 2, "md": 1})
+        self.assertEqual(workspace.test_files, 2)
+        self.assertEqual(workspace.primary_extension(), "ts")
+        self.assertEqual(workspace.languages(), {"typescript": 0.6, "python": 0.4})
+        self.assertNotIn("node_modules", self.index.snapshot.subtrees)
+
+    def test_describe(self):
+        """Test profiles of files and known directories, relative or absolute."""
+        self.index.refresh()
+        snapshot = self.index.snapshot
+
+        api = snapshot.describe(["api"])
+        self.assertEqual((api.extensions, api.test_files), ({"py": 2}, 1))
+        absolute = snapshot.describe([str(self.root / "src")])
+        self.assertEqual(absolute.extensions, {"ts": 3})
+        files = snapshot.describe(["lib/x.rs", "lib/x_test.rs", "Makefile"])
+        self.assertEqual((files.extensions, files.test_files), ({"rs": 2}, 1))
+
+    def test_incremental_refresh(self):
+        """Test that only directories whose mtime changed are re-listed."""
+        self.index.refresh()
+        self.assertFalse(self.index.refresh())
+        self.assertEqual(self.index.rescanned_dirs, 0)
+
+        touch(self.root, "api/routes.py", "api/more/x.py")
+        bump_mtime(self.root / "api")
+        self.assertTrue(self.index.refresh())
+        self.assertEqual(self.index.rescanned_dirs, 2)
+        self.assertEqual(self.index.snapshot.workspace.extensions["py"], 4)
+
+        (self.root / "api" / "more" / "x.py").unlink()
+        (self.root / "api" / "more").rmdir()
+        bump_mtime(self.root / "api")
+        self.assertTrue(self.index.refresh())
+        self.assertNotIn("api/more", self.index.snapshot.subtrees)
+        self.assertEqual(self.index.snapshot.workspace.extensions["py"], 3)
+
+    def test_background_refresh(self):
+        """Test that start() indexes in a background thread."""
+        self.index.start(interval_sec=0.05)
+        deadline = time.time() + 2
+        while not self.index.snapshot.indexed_at and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.index.snapshot.workspace.test_files, 2)
+
+
+class TestFileContextFeatures(unittest.TestCase):
+    """Test MoERouter file features from request meta and the workspace index."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        touch(self.tmp.name, "web/app.ts", "web/view.tsx", "web/app.test.ts", "tools/build.go")
+        self.index = WorkspaceIndex(self.tmp.name)
+        self.index.refresh()
+        self.router = MoERouter(str(CURSOR_DIR / "rules" / "moe.yml"), workspace_index=self.index)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_features_from_meta_paths(self):
+        """Test that the named files decide file_ext, language and test presence."""
+        features = self.router._extract_features("fix the bug", {"open_files": ["lib/a.go", "lib/a_test.go"]})
+        self.assertEqual((features["file_ext"], features["language"]), ("go", "go"))
+        self.assertTrue(features["test_presence"])
+
+        features = self.router._extract_features("fix the bug", {"paths": ["web"]})
+        self.assertEqual(features["file_ext"], "ts")
+        self.assertEqual(features["languages"], "typescript")
+
+    def test_workspace_fallback(self):
+        """Test that without file context the workspace decides."""
+        features = self.router._extract_features("fix the bug", {"paths": ["notes.txt"]})
+        self.assertEqual(features["file_ext"], "ts")
+        self.assertEqual(features["languages"], "typescript,go")
+        self.assertTrue(features["workspace_has_tests"])
+        self.assertFalse(features["test_presence"])
+
+        plain = MoERouter(str(CURSOR_DIR / "rules" / "moe.yml"))
+        self.assertEqual(plain._extract_features("fix the bug")["file_ext"], "py")
+
+    def test_file_type_rule(self):
+        """Test that the file_ext routing rule now follows the client's files."""
+        goal = "fix the crash"
+        self.assertEqual(self.router.route_task(goal, {"open_files": ["main.py"]})["candidates"], ["coder", "tester"])
+        # No rule fires for Go files: the default pick only
+        self.assertEqual(self.router.route_task(goal, {"open_files": ["main.go"]})["candidates"], ["coder"])
+
+    def test_no_filesystem_access_per_request(self):
+        """Test that extracting features never walks or stats the tree."""
+        with mock.patch("os.scandir") as scandir, mock.patch("os.stat") as stat:
+            self.router._extract_features("fix the bug", {"paths": ["web", "tools/build.go"]})
+        scandir.assert_not_called()
+        stat.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()